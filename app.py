@@ -3,29 +3,99 @@ CryptoMine Pro - Professional Mining Pool Interface
 A legitimate mining pool management system with real-time statistics and payouts
 """
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, flash
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user, UserMixin
-from datetime import datetime, timedelta
+from sqlalchemy.orm import make_transient_to_detached
+from datetime import datetime, timedelta, timezone
 import hashlib
+import math
 import secrets
 import requests
 import threading
 import time
 import json
-from crypto_api import price_api, mining_calculator, pool_statistics, start_background_updates
+import os
+from crypto_api import price_api, mining_calculator, pool_statistics, start_background_updates, updater_health
+from query_counter import install_query_counter, reset_query_count, get_query_count
+from pool_aggregates import PoolAggregates, worker_state
+from earnings_engine import batch_earnings, earnings_grid
+from user_rollups import increment_rollups
+from pool_timeseries import PoolTimeSeries, PoolHistoryRecorder
+from worker_sweeper import WorkerSweeper, register_metrics as register_worker_sweeper_metrics
+from response_cache import ResponseCache, register_metrics as register_response_cache_metrics
+from profitability import parse_axis, parse_rig_cost, iter_csv, iter_ndjson, break_even_summary
+from metrics import install_metrics, instrument_price_api, register_loop
+from live_stats import StatsBroker, TooManyStreams
+from auth_executor import AuthExecutor, AuthBusy, register_metrics as register_auth_metrics
+from identity_cache import IdentityCache, register_metrics as register_user_cache_metrics
+from shared_cache import backend_from_env
+from db_engine import database_url, engine_options, configure_engine
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = secrets.token_hex(16)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///mining_pool.db'
+# DATABASE_URL picks the backend; pool sizes, timeouts and SQLite pragmas come from db_engine
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['POOL_AGGREGATE_RECONCILE_SECONDS'] = 60
+# Poll price/network APIs in the background (one elected process per deployment when SHARED_CACHE_URL is set)
+app.config['BACKGROUND_PRICE_UPDATES'] = os.environ.get('BACKGROUND_PRICE_UPDATES') == '1'
+# Bearer token required to scrape /metrics (open when unset)
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+# Live stats streams: seconds between periodic pushes, and open streams allowed per process. Each open
+# stream holds a gunicorn thread, so keep the cap below --threads (16 in the Procfile) or nothing else gets served
+app.config['LIVE_STATS_TICK_SECONDS'] = 10
+app.config['LIVE_STATS_MAX_STREAMS'] = int(os.environ.get('LIVE_STATS_MAX_STREAMS', 8))
+# bcrypt work factor (existing hashes are upgraded on the next login) and the auth process pool:
+# AUTH_WORKERS processes (default: cores / WEB_CONCURRENCY, 0 = hash inline), AUTH_MAX_PENDING queued or running before answering 503
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+app.config['AUTH_WORKERS'] = int(os.environ['AUTH_WORKERS']) if os.environ.get('AUTH_WORKERS') else None
+app.config['AUTH_MAX_PENDING'] = int(os.environ['AUTH_MAX_PENDING']) if os.environ.get('AUTH_MAX_PENDING') else None
+# Seconds a process may serve a cached user row; with SHARED_CACHE_URL writes also invalidate other processes at once
+app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', 30))
+app.config['USER_CACHE_SIZE'] = 4096
+# Seconds between pool history samples (0 disables recording); see pool_timeseries for retention
+app.config['POOL_HISTORY_INTERVAL'] = int(os.environ.get('POOL_HISTORY_INTERVAL', 30))
+app.config['POOL_HISTORY_MAX_POINTS'] = 1000
+# Seconds without a sign of life before a worker is marked offline and its session closed (0 disables),
+# and seconds between sweeps
+app.config['WORKER_TIMEOUT_SECONDS'] = int(os.environ.get('WORKER_TIMEOUT_SECONDS', 600))
+app.config['WORKER_SWEEP_SECONDS'] = 30
+# Public JSON responses: seconds served from this process's cache and allowed in downstream caches
+app.config['POOL_STATS_CACHE_SECONDS'] = 5
+app.config['EARNINGS_CALCULATOR_CACHE_SECONDS'] = 300
+# Most coin x hashrate x period combinations one /api/earnings_calculator/batch call may ask for
+app.config['EARNINGS_BATCH_MAX_ROWS'] = 5000
+# Most grid points one /api/profitability/sweep call may evaluate
+app.config['PROFITABILITY_MAX_POINTS'] = 1000000
 
 db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
+with app.app_context():
+    configure_engine(db.engine)
+auth_executor = AuthExecutor(
+    max_workers=app.config['AUTH_WORKERS'],
+    max_pending=app.config['AUTH_MAX_PENDING'],
+    rounds=app.config['BCRYPT_LOG_ROUNDS'],
+    prefix=app.config.get('BCRYPT_HASH_PREFIX', '2b'),
+    handle_long_passwords=app.config.get('BCRYPT_HANDLE_LONG_PASSWORDS', False)
+)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
+install_query_counter()
+install_metrics(app, token=app.config['METRICS_TOKEN'])
+instrument_price_api(price_api)
+register_loop('crypto_updater', updater_health)
+register_auth_metrics(auth_executor)
+user_cache = IdentityCache(
+    maxsize=app.config['USER_CACHE_SIZE'],
+    ttl=app.config['USER_CACHE_TTL'],
+    versions=backend_from_env()
+)
+register_user_cache_metrics(user_cache)
+response_cache = ResponseCache()
+register_response_cache_metrics(response_cache)
 
 # Database Models
 class User(UserMixin, db.Model):
@@ -53,6 +123,11 @@ class Worker(db.Model):
     shares_submitted = db.Column(db.Integer, default=0)
     shares_accepted = db.Column(db.Integer, default=0)
     cryptocurrency = db.Column(db.String(10), default='BTC')
+    
+    __table_args__ = (
+        db.Index('ix_worker_status_cryptocurrency', 'status', 'cryptocurrency'),
+        db.Index('ix_worker_user_id_name', 'user_id', 'name'),
+    )
 
 class MiningSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -64,6 +139,14 @@ class MiningSession(db.Model):
     shares = db.Column(db.Integer, default=0)
     earnings = db.Column(db.Float, default=0.0)
     status = db.Column(db.String(20), default='active')
+    
+    __table_args__ = (
+        db.Index('ix_mining_session_user_status_crypto', 'user_id', 'status', 'cryptocurrency'),
+        # Partial index: only the (small) set of active sessions is indexed
+        db.Index('ix_mining_session_active', 'user_id', 'cryptocurrency',
+                 sqlite_where=db.text("status = 'active'"),
+                 postgresql_where=db.text("status = 'active'")),
+    )
 
 class Payout(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -75,6 +158,22 @@ class Payout(db.Model):
     status = db.Column(db.String(20), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     processed_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_payout_user_created_at', 'user_id', 'created_at'),
+    )
+
+class UserCoinRollup(db.Model):
+    # Running per-user, per-coin totals; maintained by stop_mining() and the
+    # share counter flush, rebuilt with `python user_rollups.py backfill`
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    cryptocurrency = db.Column(db.String(10), primary_key=True)
+    total_earnings = db.Column(db.Float, default=0.0, nullable=False)
+    total_mining_seconds = db.Column(db.Float, default=0.0, nullable=False)
+    completed_sessions = db.Column(db.Integer, default=0, nullable=False)
+    shares_submitted = db.Column(db.Integer, default=0, nullable=False)
+    shares_accepted = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class PoolStats(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -88,9 +187,63 @@ class PoolStats(db.Model):
     pool_fee = db.Column(db.Float, default=1.0)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class PoolStatsSample(db.Model):
+    # Raw pool history points (Unix seconds), written by the pool history recorder
+    cryptocurrency = db.Column(db.String(10), primary_key=True)
+    ts = db.Column(db.Integer, primary_key=True)
+    pool_hashrate = db.Column(db.Float, nullable=False)
+    active_miners = db.Column(db.Float, nullable=False)
+    network_hashrate = db.Column(db.Float, nullable=False)
+    difficulty = db.Column(db.Float, nullable=False)
+
+class PoolStatsRollup(db.Model):
+    # 1m/1h/1d buckets of PoolStatsSample, maintained as samples are written
+    resolution = db.Column(db.String(4), primary_key=True)
+    cryptocurrency = db.Column(db.String(10), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)
+    samples = db.Column(db.Integer, nullable=False)
+    pool_hashrate_sum = db.Column(db.Float, nullable=False)
+    pool_hashrate_min = db.Column(db.Float, nullable=False)
+    pool_hashrate_max = db.Column(db.Float, nullable=False)
+    active_miners_sum = db.Column(db.Float, nullable=False)
+    active_miners_min = db.Column(db.Float, nullable=False)
+    active_miners_max = db.Column(db.Float, nullable=False)
+    network_hashrate_sum = db.Column(db.Float, nullable=False)
+    network_hashrate_min = db.Column(db.Float, nullable=False)
+    network_hashrate_max = db.Column(db.Float, nullable=False)
+    difficulty_sum = db.Column(db.Float, nullable=False)
+    difficulty_min = db.Column(db.Float, nullable=False)
+    difficulty_max = db.Column(db.Float, nullable=False)
+
+USER_COLUMNS = [column.key for column in User.__table__.columns]
+
+def _load_user_row(user_id):
+    user = db.session.get(User, user_id)
+    return {key: getattr(user, key) for key in USER_COLUMNS} if user is not None else None
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    """Session user from the identity cache; one SELECT only on a miss"""
+    user_id = int(user_id)
+    row = user_cache.get_or_load(user_id, lambda: _load_user_row(user_id))
+    if row is None:
+        return None
+    # Attach a clean copy to this request's session without querying, so writes still work
+    user = User(**row)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+@app.before_request
+def start_query_budget():
+    """Start a fresh SQL statement count for this request"""
+    reset_query_count()
+
+@app.after_request
+def report_query_budget(response):
+    """Expose the request's SQL statement count when enabled"""
+    if app.config.get('EXPOSE_QUERY_COUNT'):
+        response.headers['X-Query-Count'] = str(get_query_count())
+    return response
 
 # Cryptocurrency configuration
 SUPPORTED_CRYPTOS = {
@@ -128,6 +281,136 @@ SUPPORTED_CRYPTOS = {
     }
 }
 
+def load_pool_totals():
+    """Active miners and summed hashrate of online workers, per coin, in one query"""
+    rows = db.session.query(
+        Worker.cryptocurrency,
+        db.func.count(Worker.id),
+        db.func.sum(Worker.hashrate)
+    ).filter(Worker.status == 'online').group_by(Worker.cryptocurrency).all()
+    
+    return {
+        crypto: {'active_miners': int(count), 'pool_hashrate': float(hashrate or 0)}
+        for crypto, count, hashrate in rows
+    }
+
+def load_pool_metadata():
+    """Network-side pool stats (difficulty, block height, fee...) per coin"""
+    metadata = {}
+    rows = PoolStats.query.filter(
+        PoolStats.cryptocurrency.in_(list(SUPPORTED_CRYPTOS))
+    ).order_by(PoolStats.id).all()
+    for pool_stat in rows:
+        metadata.setdefault(pool_stat.cryptocurrency, {
+            'network_hashrate': pool_stat.network_hashrate,
+            'difficulty': pool_stat.difficulty,
+            'block_height': pool_stat.block_height,
+            'pool_fee': pool_stat.pool_fee,
+            'last_block_time': pool_stat.last_block_time.isoformat() if pool_stat.last_block_time else None
+        })
+    return metadata
+
+def persist_pool_totals(totals):
+    """Write reconciled counters back to the PoolStats rows"""
+    now = datetime.utcnow()
+    for pool_stat in PoolStats.query.filter(PoolStats.cryptocurrency.in_(list(totals))).all():
+        values = totals[pool_stat.cryptocurrency]
+        pool_stat.active_miners = values['active_miners']
+        pool_stat.pool_hashrate = values['pool_hashrate']
+        pool_stat.updated_at = now
+    db.session.commit()
+
+pool_aggregates = PoolAggregates(
+    SUPPORTED_CRYPTOS,
+    load_totals=load_pool_totals,
+    load_metadata=load_pool_metadata,
+    persist=persist_pool_totals,
+    reconcile_interval=app.config['POOL_AGGREGATE_RECONCILE_SECONDS']
+)
+
+register_loop('pool_aggregates', pool_aggregates.health)
+# Worker transitions and reconciliation change /api/pool_stats
+pool_aggregates.listeners.append(lambda: response_cache.invalidate('get_pool_stats'))
+
+pool_history = PoolTimeSeries(
+    PoolStatsSample.__table__,
+    PoolStatsRollup.__table__,
+    interval=app.config['POOL_HISTORY_INTERVAL'] or 30
+)
+
+def record_pool_history(at):
+    """Sample the current pool aggregates into the history tables"""
+    pool_history.record(db.session, pool_aggregates.snapshot(), at)
+    db.session.commit()
+
+def prune_pool_history(now):
+    """Drop history points past their resolution's retention"""
+    pool_history.prune(db.session, now)
+    db.session.commit()
+
+pool_history_recorder = PoolHistoryRecorder(
+    record_pool_history,
+    prune_pool_history,
+    interval=pool_history.interval
+)
+register_loop('pool_history', pool_history_recorder.health)
+
+@app.before_request
+def start_pool_history():
+    """Start recording pool history once the app is serving requests"""
+    if app.config['POOL_HISTORY_INTERVAL']:
+        pool_history_recorder.start(app)
+
+def compute_live_stats(user_ids):
+    """Stats snapshots for every user with an open live stream"""
+    heartbeat_workers(user_ids)
+    users = User.query.filter(User.id.in_(user_ids)).all()
+    return compute_user_stats(users)
+
+live_stats = StatsBroker(
+    compute_live_stats,
+    tick_interval=app.config['LIVE_STATS_TICK_SECONDS'],
+    max_streams=app.config['LIVE_STATS_MAX_STREAMS']
+)
+register_loop('live_stats', live_stats.health)
+
+worker_sweeper = WorkerSweeper(
+    lambda: db.engine.begin(),
+    Worker.__table__,
+    MiningSession.__table__,
+    User.__table__,
+    UserCoinRollup.__table__,
+    timeout=app.config['WORKER_TIMEOUT_SECONDS'] or 600,
+    interval=app.config['WORKER_SWEEP_SECONDS']
+)
+register_loop('worker_sweeper', worker_sweeper.health)
+register_worker_sweeper_metrics(worker_sweeper)
+
+def apply_worker_sweep(result):
+    """Reflect a committed sweep in this process's aggregates, user cache and live streams"""
+    for worker in result['expired']:
+        pool_aggregates.worker_changed((worker['cryptocurrency'], worker['hashrate']), None)
+    for user_id in {closed['user_id'] for closed in result['closed_sessions']}:
+        user_cache.invalidate(user_id)
+    for user_id in {worker['user_id'] for worker in result['expired']}:
+        live_stats.notify(user_id)
+
+worker_sweeper.listeners.append(apply_worker_sweep)
+
+def heartbeat_workers(user_ids):
+    """Keep dashboard-started workers of users watching their stats from being swept"""
+    if app.config['WORKER_TIMEOUT_SECONDS'] and worker_sweeper.heartbeat(db.session, user_ids):
+        db.session.commit()
+
+@app.before_request
+def start_worker_sweeper():
+    """Start sweeping stale workers once the app is serving requests"""
+    if app.config['WORKER_TIMEOUT_SECONDS']:
+        worker_sweeper.start(app)
+
+if app.config['BACKGROUND_PRICE_UPDATES']:
+    start_background_updates()
+
 # Routes
 @app.route('/')
 def index():
@@ -135,33 +418,73 @@ def index():
     if not current_user.is_authenticated:
         return redirect(url_for('login'))
     
-    # Get user's active mining sessions
+    dashboard = load_dashboard_data(current_user.id)
+    
+    return render_template('dashboard.html', 
+                         active_sessions=dashboard['active_sessions'],
+                         workers=dashboard['workers'],
+                         recent_payouts=dashboard['recent_payouts'],
+                         pool_stats=dashboard['pool_stats'],
+                         cryptos=SUPPORTED_CRYPTOS)
+
+def load_dashboard_data(user_id):
+    """Load everything the dashboard renders in a fixed number of queries
+    
+    Workers, active sessions and the most recent payouts are one query each
+    and pool stats for every supported coin come from one ``IN`` query. The
+    statement count does not grow with the number of coins, workers or
+    sessions.
+    """
+    workers = Worker.query.filter_by(user_id=user_id).order_by(Worker.id).all()
+    
+    # A query of its own: filtering the User.mining_sessions collection would
+    # leave only the active sessions in it for the rest of the request
     active_sessions = MiningSession.query.filter_by(
-        user_id=current_user.id, 
+        user_id=user_id,
         status='active'
-    ).all()
+    ).order_by(MiningSession.id).all()
     
-    # Get user's workers
-    workers = Worker.query.filter_by(user_id=current_user.id).all()
-    
-    # Get recent payouts
-    recent_payouts = Payout.query.filter_by(user_id=current_user.id).order_by(
+    recent_payouts = Payout.query.filter_by(user_id=user_id).order_by(
         Payout.created_at.desc()
     ).limit(5).all()
     
-    # Get pool statistics
     pool_stats = {}
-    for crypto in SUPPORTED_CRYPTOS:
-        stats = PoolStats.query.filter_by(cryptocurrency=crypto).first()
-        if stats:
-            pool_stats[crypto] = stats
+    rows = PoolStats.query.filter(
+        PoolStats.cryptocurrency.in_(list(SUPPORTED_CRYPTOS))
+    ).order_by(PoolStats.id).all()
+    for stats in rows:
+        pool_stats.setdefault(stats.cryptocurrency, stats)
     
-    return render_template('dashboard.html', 
-                         active_sessions=active_sessions,
-                         workers=workers,
-                         recent_payouts=recent_payouts,
-                         pool_stats=pool_stats,
-                         cryptos=SUPPORTED_CRYPTOS)
+    return {
+        'active_sessions': active_sessions,
+        'workers': workers,
+        'recent_payouts': recent_payouts,
+        'pool_stats': pool_stats
+    }
+
+def auth_busy_response():
+    """503 for register/login while the auth pool is saturated"""
+    if request.is_json:
+        return jsonify({'error': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
+    flash('Server busy, please try again in a moment', 'error')
+    return render_template(request.endpoint + '.html'), 503, {'Retry-After': '1'}
+
+def schedule_password_rehash(user, password):
+    """Upgrade a hash made with an old work factor, off the request path"""
+    engine = db.engine
+    user_id, old_hash = user.id, user.password_hash
+    
+    def store(new_hash):
+        # Compare-and-set: leave the row alone if the password changed meanwhile
+        with engine.begin() as conn:
+            conn.execute(
+                User.__table__.update()
+                .where(User.__table__.c.id == user_id, User.__table__.c.password_hash == old_hash)
+                .values(password_hash=new_hash)
+            )
+        user_cache.invalidate(user_id)
+    
+    auth_executor.rehash_async(password, store)
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -184,8 +507,11 @@ def register():
         if User.query.filter_by(email=email).first():
             return jsonify({'error': 'Email already registered'}), 400
         
-        # Create new user
-        password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        # Create new user (hashed on the auth pool, not this worker)
+        try:
+            password_hash = auth_executor.hash_password(password)
+        except AuthBusy:
+            return auth_busy_response()
         user = User(
             username=username,
             email=email,
@@ -217,7 +543,16 @@ def login():
         
         user = User.query.filter_by(username=username).first()
         
-        if user and bcrypt.check_password_hash(user.password_hash, password):
+        valid = False
+        if user:
+            try:
+                valid, needs_rehash = auth_executor.check_password(user.password_hash, password)
+            except AuthBusy:
+                return auth_busy_response()
+            if valid and needs_rehash:
+                schedule_password_rehash(user, password)
+        
+        if valid:
             login_user(user)
             
             if request.is_json:
@@ -280,6 +615,7 @@ def start_mining():
             cryptocurrency=crypto
         )
     
+    worker_before = worker_state(worker)
     worker.status = 'online'
     worker.cryptocurrency = crypto
     worker.last_seen = datetime.utcnow()
@@ -288,6 +624,9 @@ def start_mining():
     db.session.add(session)
     db.session.add(worker)
     db.session.commit()
+    worker_sweeper.schedule(worker.id, worker.last_seen)
+    pool_aggregates.worker_changed(worker_before, worker_state(worker))
+    live_stats.notify(current_user.id)
     
     return jsonify({
         'success': True,
@@ -313,26 +652,43 @@ def stop_mining():
         return jsonify({'error': 'No active mining session found'}), 404
     
     # Calculate earnings
-    mining_time = (datetime.utcnow() - session.start_time).total_seconds() / 3600  # hours
+    end_time = datetime.utcnow()
+    mining_seconds = (end_time - session.start_time).total_seconds()
+    mining_time = mining_seconds / 3600  # hours
     earnings = calculate_earnings(crypto, session.hashrate, mining_time, current_user.is_premium)
     
-    session.end_time = datetime.utcnow()
+    session.end_time = end_time
     session.status = 'completed'
     session.earnings = earnings
     
-    # Update user's total mined
-    current_user.total_mined += earnings
+    # Roll the session into the user's per-coin totals in the same transaction
+    increment_rollups(db.session, UserCoinRollup.__table__, [{
+        'user_id': current_user.id,
+        'cryptocurrency': crypto,
+        'total_earnings': earnings,
+        'total_mining_seconds': mining_seconds,
+        'completed_sessions': 1
+    }])
+    
+    # Update user's total mined (in SQL: the cached row may lag another process's update)
+    current_user.total_mined = User.total_mined + earnings
     
     # Update worker status
     worker = Worker.query.filter_by(
         user_id=current_user.id,
         cryptocurrency=crypto
     ).first()
+    worker_before = worker_state(worker)
     if worker:
         worker.status = 'offline'
         worker.hashrate = 0.0
     
     db.session.commit()
+    user_cache.invalidate(current_user.id)
+    if worker:
+        worker_sweeper.discard(worker.id)
+    pool_aggregates.worker_changed(worker_before, worker_state(worker))
+    live_stats.notify(current_user.id)
     
     return jsonify({
         'success': True,
@@ -344,37 +700,74 @@ def stop_mining():
 @login_required
 def get_stats():
     """Get real-time mining statistics"""
-    active_sessions = MiningSession.query.filter_by(
-        user_id=current_user.id,
-        status='active'
-    ).all()
+    heartbeat_workers([current_user.id])
+    return jsonify(compute_user_stats([current_user])[current_user.id])
+
+@app.route('/api/stats/stream')
+@login_required
+def stream_stats():
+    """Push real-time mining statistics as Server-Sent Events (see live_stats)"""
+    live_stats.start(app)
+    try:
+        stream = live_stats.subscribe(current_user.id)
+    except TooManyStreams:
+        # Clients fall back to polling /api/stats
+        return jsonify({'error': 'Too many live connections'}), 503, {'Retry-After': '30'}
+    
+    def events():
+        try:
+            yield from stream.sse()
+        finally:
+            stream.close()
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def compute_user_stats(users):
+    """Stats for each user's active sessions: {user_id: stats}
+    
+    One query loads the active sessions of every user and one vectorized
+    call prices them all, so the cost is the same for one user or many.
+    """
+    users = {user.id: user for user in users}
+    active_sessions = MiningSession.query.filter(
+        MiningSession.user_id.in_(list(users)),
+        MiningSession.status == 'active'
+    ).all() if users else []
     
     stats = {
-        'active_sessions': len(active_sessions),
-        'total_hashrate': sum(s.hashrate for s in active_sessions),
-        'total_mined': current_user.total_mined,
-        'sessions': []
+        user_id: {
+            'active_sessions': 0,
+            'total_hashrate': 0.0,
+            'total_mined': user.total_mined,
+            'sessions': []
+        }
+        for user_id, user in users.items()
     }
     
-    for session in active_sessions:
-        mining_time = (datetime.utcnow() - session.start_time).total_seconds() / 3600
-        current_earnings = calculate_earnings(
-            session.cryptocurrency, 
-            session.hashrate, 
-            mining_time, 
-            current_user.is_premium
-        )
-        
-        stats['sessions'].append({
+    now = datetime.utcnow()
+    mining_times = [(now - session.start_time).total_seconds() / 3600 for session in active_sessions]
+    current_earnings = batch_earnings(
+        [session.cryptocurrency for session in active_sessions],
+        [session.hashrate for session in active_sessions],
+        mining_times,
+        [users[session.user_id].is_premium for session in active_sessions]
+    ) if active_sessions else []
+    
+    for session, mining_time, earnings in zip(active_sessions, mining_times, current_earnings):
+        user_stats = stats[session.user_id]
+        user_stats['active_sessions'] += 1
+        user_stats['total_hashrate'] += session.hashrate
+        user_stats['sessions'].append({
             'id': session.id,
             'cryptocurrency': session.cryptocurrency,
             'hashrate': session.hashrate,
             'mining_time': mining_time,
-            'current_earnings': current_earnings,
+            'current_earnings': float(earnings),
             'start_time': session.start_time.isoformat()
         })
     
-    return jsonify(stats)
+    return stats
 
 def calculate_base_hashrate(crypto, is_premium=False):
     """Calculate base hashrate for a cryptocurrency"""
@@ -389,64 +782,91 @@ def calculate_base_hashrate(crypto, is_premium=False):
     return base_rates.get(crypto, 50.0) * multiplier
 
 @app.route('/api/pool_stats')
+@response_cache.cached(app.config['POOL_STATS_CACHE_SECONDS'], stale_while_revalidate=30)
 def get_pool_stats():
     """Get current pool statistics for all cryptocurrencies"""
-    stats = {}
+    # Served from incrementally maintained counters; reconciliation against
+    # the Worker table (and the PoolStats write-back) happens in the background
+    pool_aggregates.start(app)
+    return jsonify(pool_aggregates.snapshot())
+
+def parse_timestamp(value, default):
+    """Unix seconds from a query parameter given as seconds or ISO 8601"""
+    if value is None or value == '':
+        return default
+    try:
+        return int(float(value))
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        # Naive times are UTC, like every other timestamp in this app
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return int(parsed.timestamp())
+
+@app.route('/api/pool_stats/history')
+def get_pool_stats_history():
+    """Pool stats over a time range, at the finest resolution that fits max_points"""
+    crypto = request.args.get('cryptocurrency', 'BTC')
+    if crypto not in SUPPORTED_CRYPTOS:
+        return jsonify({'error': 'Unsupported cryptocurrency'}), 400
     
-    for crypto in SUPPORTED_CRYPTOS:
-        # Get pool stats from database
-        pool_stat = PoolStats.query.filter_by(cryptocurrency=crypto).first()
-        
-        # Get active miners count
-        active_miners = db.session.query(User).join(Worker).filter(
-            Worker.status == 'online',
-            Worker.cryptocurrency == crypto
-        ).count()
-        
-        # Get total pool hashrate
-        total_hashrate = db.session.query(db.func.sum(Worker.hashrate)).filter(
-            Worker.status == 'online',
-            Worker.cryptocurrency == crypto
-        ).scalar() or 0
-        
-        if pool_stat:
-            pool_stat.active_miners = active_miners
-            pool_stat.pool_hashrate = total_hashrate
-            pool_stat.updated_at = datetime.utcnow()
-            
-            stats[crypto] = {
-                'pool_hashrate': total_hashrate,
-                'active_miners': active_miners,
-                'network_hashrate': pool_stat.network_hashrate,
-                'difficulty': pool_stat.difficulty,
-                'block_height': pool_stat.block_height,
-                'pool_fee': pool_stat.pool_fee,
-                'last_block_time': pool_stat.last_block_time.isoformat() if pool_stat.last_block_time else None
-            }
+    try:
+        end = parse_timestamp(request.args.get('end'), int(time.time()))
+        start = parse_timestamp(request.args.get('start'), end - 86400)
+        max_points = min(int(request.args.get('max_points', 500)), app.config['POOL_HISTORY_MAX_POINTS'])
+    except ValueError:
+        return jsonify({'error': 'start/end must be Unix seconds or ISO 8601, max_points an integer'}), 400
     
-    db.session.commit()
-    return jsonify(stats)
+    resolution = request.args.get('resolution')
+    if resolution is not None and resolution not in pool_history.by_name:
+        return jsonify({'error': f'resolution must be one of {sorted(pool_history.by_name)}'}), 400
+    if start >= end or max_points < 1:
+        return jsonify({'error': 'start must be before end and max_points positive'}), 400
+    
+    return jsonify(pool_history.query(db.session, crypto, start, end, max_points, resolution))
+
+TIME_PERIOD_HOURS = {
+    'hour': 1,
+    'day': 24,
+    'week': 168,
+    'month': 720
+}
+
+def earnings_calculator_input():
+    """(crypto, hashrate, time_period) from the query string (GET) or JSON body (POST)"""
+    data = request.args if request.method == 'GET' else request.get_json()
+    return (
+        data.get('cryptocurrency', 'BTC'),
+        float(data.get('hashrate', 0)),
+        data.get('time_period', 'day')  # hour, day, week, month
+    )
+
+def earnings_calculator_cache_key():
+    """Inputs as the cache key; None (no caching) when they don't parse"""
+    try:
+        key = earnings_calculator_input()
+        hash(key)
+        return key
+    except (TypeError, ValueError, AttributeError):
+        return None
 
-@app.route('/api/earnings_calculator', methods=['POST'])
+@app.route('/api/earnings_calculator', methods=['GET', 'POST'])
+@response_cache.cached(app.config['EARNINGS_CALCULATOR_CACHE_SECONDS'], key=earnings_calculator_cache_key)
 def earnings_calculator():
-    """Calculate estimated earnings for given hashrate"""
-    data = request.get_json()
-    crypto = data.get('cryptocurrency', 'BTC')
-    hashrate = float(data.get('hashrate', 0))
-    time_period = data.get('time_period', 'day')  # hour, day, week, month
+    """Calculate estimated earnings for given hashrate (GET is cacheable by proxies and CDNs)"""
+    try:
+        crypto, hashrate, time_period = earnings_calculator_input()
+        if not isinstance(crypto, str) or not isinstance(time_period, str):
+            raise TypeError('not a string')
+        if not math.isfinite(hashrate):
+            raise ValueError('not finite')
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'error': 'cryptocurrency and time_period must be strings; hashrate numeric'}), 400
     
     if crypto not in SUPPORTED_CRYPTOS:
         return jsonify({'error': 'Unsupported cryptocurrency'}), 400
     
-    # Calculate hours based on time period
-    hours_map = {
-        'hour': 1,
-        'day': 24,
-        'week': 168,
-        'month': 720
-    }
-    
-    hours = hours_map.get(time_period, 24)
+    hours = TIME_PERIOD_HOURS.get(time_period, 24)
     
     # Calculate earnings (basic calculation)
     base_earnings = calculate_earnings(crypto, hashrate, hours, False)
@@ -467,37 +887,135 @@ def earnings_calculator():
         }
     })
 
+def earnings_batch_input():
+    """(cryptos, hashrates, periods) lists from a JSON body, or comma-separated query parameters on GET"""
+    if request.method == 'GET':
+        def values(name):
+            raw = request.args.get(name, '')
+            return [value.strip() for value in raw.split(',') if value.strip()]
+        return values('cryptocurrencies'), values('hashrates'), values('time_periods') or ['day']
+    data = request.get_json()
+    return data.get('cryptocurrencies'), data.get('hashrates'), data.get('time_periods', ['day'])
+
+def earnings_batch_cache_key():
+    """Inputs as the cache key; None (no caching) when they are not lists"""
+    try:
+        key = tuple(tuple(values) for values in earnings_batch_input())
+        hash(key)
+        return key
+    except (TypeError, AttributeError):
+        return None
+
+@app.route('/api/earnings_calculator/batch', methods=['GET', 'POST'])
+@response_cache.cached(app.config['EARNINGS_CALCULATOR_CACHE_SECONDS'], key=earnings_batch_cache_key)
+def earnings_calculator_batch():
+    """Earnings for every coin x hashrate x period combination, as flat columns
+    
+    Columns are in coin-major, then hashrate, then period order, i.e. row
+    ((c * len(hashrates)) + h) * len(time_periods) + p.
+    """
+    try:
+        cryptos, hashrates, periods = earnings_batch_input()
+        if not all(isinstance(values, list) for values in (cryptos, hashrates, periods)):
+            raise TypeError('not a list')
+        if not all(isinstance(value, str) for value in cryptos + periods):
+            raise TypeError('not a string')
+        hashrates = [float(hashrate) for hashrate in hashrates]
+        if not all(math.isfinite(hashrate) for hashrate in hashrates):
+            raise ValueError('not finite')
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'error': 'cryptocurrencies, hashrates and time_periods must be lists; hashrates numeric'}), 400
+    
+    if not cryptos or not hashrates or not periods:
+        return jsonify({'error': 'cryptocurrencies, hashrates and time_periods must be non-empty'}), 400
+    unsupported = sorted({crypto for crypto in cryptos if crypto not in SUPPORTED_CRYPTOS})
+    if unsupported:
+        return jsonify({'error': f'Unsupported cryptocurrency: {", ".join(map(str, unsupported))}'}), 400
+    unknown = sorted({period for period in periods if period not in TIME_PERIOD_HOURS})
+    if unknown:
+        return jsonify({'error': f'time_periods must be among {list(TIME_PERIOD_HOURS)}'}), 400
+    
+    rows = len(cryptos) * len(hashrates) * len(periods)
+    if rows > app.config['EARNINGS_BATCH_MAX_ROWS']:
+        return jsonify({'error': f"Batch of {rows} rows exceeds the limit of {app.config['EARNINGS_BATCH_MAX_ROWS']}"}), 413
+    
+    hours = [TIME_PERIOD_HOURS[period] for period in periods]
+    prices = {crypto: get_crypto_price_estimate(crypto) for crypto in set(cryptos)}
+    grid = earnings_grid(cryptos, hashrates, hours, prices)
+    
+    return jsonify({
+        'cryptocurrencies': cryptos,
+        'hashrates': hashrates,
+        'time_periods': periods,
+        'hours': hours,
+        'shape': [len(cryptos), len(hashrates), len(periods)],
+        'free_account': {
+            'earnings': grid['free'].tolist(),
+            'earnings_usd': grid['free_usd'].tolist()
+        },
+        'premium_account': {
+            'earnings': grid['premium'].tolist(),
+            'earnings_usd': grid['premium_usd'].tolist()
+        }
+    })
+
+@app.route('/api/profitability/sweep', methods=['GET', 'POST'])
+def profitability_sweep():
+    """Expected daily profit and ROI over hashrate x power x electricity-cost grids
+    
+    Axes (``hashrates``, ``power_watts``, ``electricity_costs``) are lists,
+    {"start", "stop", "num"} objects, or "a,b,c" / "start:stop:num" strings.
+    ``format`` is csv or ndjson (streamed rows, see profitability.COLUMNS)
+    or summary (break-even contours and best ROI as JSON).
+    """
+    data = request.args if request.method == 'GET' else (request.get_json() or {})
+    crypto = data.get('cryptocurrency', 'BTC')
+    output_format = data.get('format', 'csv')
+    max_points = app.config['PROFITABILITY_MAX_POINTS']
+    
+    if crypto not in SUPPORTED_CRYPTOS:
+        return jsonify({'error': 'Unsupported cryptocurrency'}), 400
+    if output_format not in ('csv', 'ndjson', 'summary'):
+        return jsonify({'error': 'format must be csv, ndjson or summary'}), 400
+    try:
+        hashrates = parse_axis(data.get('hashrates'), max_points)
+        power_watts = parse_axis(data.get('power_watts', 0), max_points)
+        electricity_costs = parse_axis(data.get('electricity_costs', 0.1), max_points)
+        rig_cost = parse_rig_cost(data.get('rig_cost', 1000))
+    except (TypeError, ValueError, KeyError) as e:
+        return jsonify({'error': f'Invalid sweep parameters: {e}'}), 400
+    
+    points = hashrates.size * power_watts.size * electricity_costs.size
+    if points > max_points:
+        return jsonify({'error': f'Sweep of {points} points exceeds the limit of {max_points}'}), 413
+    
+    grid = mining_calculator.profitability_sweep(crypto, hashrates, power_watts, electricity_costs, rig_cost)
+    if grid is None:
+        return jsonify({'error': f'No {crypto} price available, try again shortly'}), 503, {'Retry-After': '30'}
+    
+    if output_format == 'summary':
+        return jsonify(break_even_summary(grid))
+    if output_format == 'ndjson':
+        return Response(iter_ndjson(grid), mimetype='application/x-ndjson')
+    return Response(iter_csv(grid), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename="{crypto.lower()}-profitability.csv"'})
+
 @app.route('/api/user_profile')
 @login_required
 def get_user_profile():
     """Get user profile information"""
-    # Calculate total earnings by cryptocurrency
-    earnings_by_crypto = db.session.query(
-        MiningSession.cryptocurrency,
-        db.func.sum(MiningSession.earnings)
-    ).filter_by(
-        user_id=current_user.id,
-        status='completed'
-    ).group_by(MiningSession.cryptocurrency).all()
-    
-    # Get total mining time
-    total_sessions = MiningSession.query.filter_by(
-        user_id=current_user.id,
-        status='completed'
-    ).all()
-    
-    total_mining_time = sum(
-        (session.end_time - session.start_time).total_seconds() / 3600
-        for session in total_sessions
-        if session.end_time
-    )
+    # Single indexed lookup of the maintained per-coin rollups
+    rollups = UserCoinRollup.query.filter_by(user_id=current_user.id).all()
     
-    # Get worker statistics
-    worker_stats = db.session.query(
-        Worker.cryptocurrency,
-        db.func.sum(Worker.shares_submitted),
-        db.func.sum(Worker.shares_accepted)
-    ).filter_by(user_id=current_user.id).group_by(Worker.cryptocurrency).all()
+    total_mining_time = sum(rollup.total_mining_seconds for rollup in rollups) / 3600
+    earnings_by_crypto = [
+        (rollup.cryptocurrency, rollup.total_earnings)
+        for rollup in rollups if rollup.completed_sessions
+    ]
+    worker_stats = [
+        (rollup.cryptocurrency, rollup.shares_submitted, rollup.shares_accepted)
+        for rollup in rollups if rollup.shares_submitted
+    ]
     
     return jsonify({
         'user_id': current_user.id,
@@ -522,16 +1040,8 @@ def get_user_profile():
 
 def calculate_earnings(crypto, hashrate, hours, is_premium=False):
     """Calculate mining earnings based on hashrate and time"""
-    # Simplified earnings calculation
-    base_rates = {
-        'BTC': 0.00001,
-        'ETH': 0.0001,
-        'LTC': 0.001,
-        'XMR': 0.01
-    }
-    
-    premium_bonus = 1.5 if is_premium else 1.0
-    return base_rates.get(crypto, 0.00001) * hashrate * hours * premium_bonus
+    # Single-row call into the vectorized engine (see earnings_engine.POOL_RATES)
+    return float(batch_earnings(crypto, hashrate, hours, is_premium)[0])
 
 @app.route('/premium')
 @login_required
@@ -561,7 +1071,15 @@ def simulate_premium_purchase():
         current_user.premium_expires = datetime.utcnow() + timedelta(days=30)
     
     db.session.commit()
+    user_cache.invalidate(current_user.id)
+    live_stats.notify(current_user.id)
     
+    return jsonify({
+        'success': True,
+        'is_premium': True,
+        'premium_expires': current_user.premium_expires.isoformat()
+    })
+
 def get_crypto_price_estimate(crypto):
     """Get estimated crypto price (placeholder function)"""
     # Simplified price estimates (in a real app, fetch from API)
@@ -584,7 +1102,8 @@ def get_crypto_price_estimate(crypto):
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        from migrations import upgrade
+        upgrade(db.engine, db.metadata)
         
         # Create sample pool statistics
         for crypto in SUPPORTED_CRYPTOS:
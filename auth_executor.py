@@ -0,0 +1,226 @@
+"""
+bcrypt hashing on a dedicated process pool, off the web worker's CPU
+
+Hashes are compatible with Flask-Bcrypt (same prefix, rounds and optional
+SHA-256 pre-hashing of long passwords), so existing rows keep working.
+Submissions beyond ``max_pending`` are rejected immediately with
+``AuthBusy`` instead of queueing behind a login burst.
+"""
+
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+
+HASH_DURATION = REGISTRY.histogram(
+    'auth_hash_duration_seconds', 'bcrypt CPU time per operation', ('operation',), HASH_BUCKETS)
+QUEUE_WAIT = REGISTRY.histogram(
+    'auth_queue_wait_seconds', 'Time auth work waited for a pool process', ('operation',), HASH_BUCKETS)
+REJECTED = REGISTRY.counter(
+    'auth_rejected_total', 'Auth operations rejected because the pool was saturated', ('operation',))
+
+
+class AuthBusy(Exception):
+    """The auth pool is saturated; the client should retry shortly"""
+
+
+def _password_bytes(password, handle_long_passwords):
+    password = password.encode('utf-8') if isinstance(password, str) else password
+    if handle_long_passwords:
+        password = hashlib.sha256(password).hexdigest().encode('utf-8')
+    return password
+
+
+def _hash(password, rounds, prefix, handle_long_passwords):
+    """Runs in a pool process: (hash, cpu seconds)"""
+    import bcrypt
+    started = time.perf_counter()
+    salt = bcrypt.gensalt(rounds=rounds, prefix=prefix.encode('utf-8'))
+    password_hash = bcrypt.hashpw(_password_bytes(password, handle_long_passwords), salt).decode('utf-8')
+    return password_hash, time.perf_counter() - started
+
+
+def _check(password_hash, password, handle_long_passwords):
+    """Runs in a pool process: (matches, cpu seconds)"""
+    import bcrypt
+    started = time.perf_counter()
+    try:
+        expected = password_hash.encode('utf-8')
+        matches = hmac.compare_digest(bcrypt.hashpw(_password_bytes(password, handle_long_passwords), expected), expected)
+    except ValueError:
+        # Malformed stored hash
+        matches = False
+    return matches, time.perf_counter() - started
+
+
+def default_workers():
+    """This process's share of the cores: CPU count / WEB_CONCURRENCY (gunicorn's worker count), at least 1"""
+    try:
+        web_workers = max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+    except ValueError:
+        web_workers = 1
+    return max(1, (os.cpu_count() or 1) // web_workers)
+
+
+def hash_rounds(password_hash):
+    """Work factor encoded in a bcrypt hash ('$2b$12$...' -> 12), or None"""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class AuthExecutor:
+    """Bounded process pool for bcrypt hashing and verification
+
+    ``max_workers=0`` runs everything inline on the calling thread (for
+    development and tests). The default splits the cores between the
+    gunicorn workers (see ``default_workers``), so N web processes never
+    start N x cores bcrypt processes between them.
+    """
+
+    def __init__(self, max_workers=None, max_pending=None, rounds=12, prefix='2b',
+                 handle_long_passwords=False, timeout=30.0):
+        self.max_workers = default_workers() if max_workers is None else max_workers
+        self.max_pending = max_pending if max_pending is not None else max(1, self.max_workers) * 4
+        self.rounds = rounds
+        self.prefix = prefix
+        self.handle_long_passwords = handle_long_passwords
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pending = 0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: never fork a process that is already running threads
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _reset_pool(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def pending(self):
+        """Operations queued or running"""
+        return self._pending
+
+    def _submit(self, operation, fn, *args):
+        """(future for ``fn(*args)``, the pool running it); raises AuthBusy when ``max_pending`` are outstanding"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                REJECTED.inc(1, operation)
+                raise AuthBusy(f'{self._pending} auth operations pending')
+            self._pending += 1
+
+        submitted = time.perf_counter()
+        try:
+            pool = self._get_pool()
+            try:
+                future = pool.submit(fn, *args)
+            except BrokenProcessPool:
+                # A pool process died; start a fresh pool and try once more
+                self._reset_pool(pool)
+                pool = self._get_pool()
+                future = pool.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        def done(finished):
+            with self._lock:
+                self._pending -= 1
+            if not finished.cancelled() and finished.exception() is None:
+                seconds = finished.result()[1]
+                HASH_DURATION.observe(seconds, operation)
+                QUEUE_WAIT.observe(max(0.0, time.perf_counter() - submitted - seconds), operation)
+
+        future.add_done_callback(done)
+        return future, pool
+
+    def _run(self, operation, fn, *args):
+        if self.max_workers == 0:
+            value, seconds = fn(*args)
+            HASH_DURATION.observe(seconds, operation)
+            return value
+        future, pool = self._submit(operation, fn, *args)
+        try:
+            return future.result(timeout=self.timeout)[0]
+        except FutureTimeout:
+            # Stuck behind a backlog: drop it if it has not started and answer like a full pool
+            future.cancel()
+            REJECTED.inc(1, operation)
+            raise AuthBusy(f'{operation} did not finish within {self.timeout}s')
+        except BrokenProcessPool:
+            # A pool process died mid-operation; the next call gets a fresh pool
+            logger.error(f"Auth pool broke during {operation}; restarting it")
+            self._reset_pool(pool)
+            REJECTED.inc(1, operation)
+            raise AuthBusy(f'{operation} lost its pool process')
+
+    def hash_password(self, password, rounds=None):
+        """bcrypt hash (str) of ``password`` at the configured work factor"""
+        if not password:
+            raise ValueError('Password must be non-empty.')
+        return self._run('hash', _hash, password, rounds or self.rounds, self.prefix, self.handle_long_passwords)
+
+    def check_password(self, password_hash, password):
+        """(matches, needs_rehash): needs_rehash when the hash's work factor differs from the configured one"""
+        if not password_hash or not password:
+            return False, False
+        matches = self._run('check', _check, password_hash, password, self.handle_long_passwords)
+        return matches, matches and hash_rounds(password_hash) != self.rounds
+
+    def rehash_async(self, password, on_done):
+        """Hash ``password`` in the background and call ``on_done(new_hash)``; skipped when saturated"""
+        if self.max_workers == 0:
+            on_done(self.hash_password(password))
+            return True
+        try:
+            future, _ = self._submit('rehash', _hash, password, self.rounds, self.prefix, self.handle_long_passwords)
+        except AuthBusy:
+            return False
+
+        def finished(done):
+            if done.cancelled() or done.exception() is not None:
+                logger.error(f"Password rehash failed: {done.exception() if not done.cancelled() else 'cancelled'}")
+                return
+            try:
+                on_done(done.result()[0])
+            except Exception as e:
+                logger.error(f"Error storing rehashed password: {e}")
+
+        future.add_done_callback(finished)
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+def register_metrics(executor):
+    """Queue depth gauge for an executor"""
+
+    def collect():
+        yield ('auth_pending_operations', 'gauge', 'Auth operations queued or running', [({}, executor.pending())])
+        yield ('auth_pool_capacity', 'gauge', 'Auth operations allowed in flight before rejecting', [({}, executor.max_pending)])
+
+    REGISTRY.register_collector(collect)
@@ -0,0 +1,170 @@
+"""
+Write throughput under concurrent writers for each database engine profile
+
+Several processes (like gunicorn workers), each with a few threads, run
+stop_mining-shaped transactions (read the worker, insert a completed
+session, update the worker) against a fresh database per profile and
+report commits/s, lock errors and commit latency.
+
+Profiles:
+    sqlite-default   stock SQLAlchemy engine, rollback journal
+    sqlite-tuned     db_engine profile: WAL, synchronous=NORMAL, busy timeout, mmap
+    postgres         db_engine profile against --postgres-url (pooling, pre-ping, statement timeout)
+
+Usage:
+    python benchmarks/db_write_benchmark.py [--processes 4] [--threads 4] [--seconds 10]
+        [--profiles sqlite-default,sqlite-tuned] [--postgres-url URL] [--output results.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from db_engine import database_url, make_engine
+
+SEED_USERS = 1000
+
+
+def build_engine(profile, url):
+    if profile == 'sqlite-default':
+        return create_engine(url)
+    return make_engine(url)
+
+
+def prepare(profile, url):
+    """Fresh schema with one user and one worker per user"""
+    from app import db
+    from migrations import upgrade
+
+    engine = build_engine(profile, url)
+    upgrade(engine, db.metadata)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(db.metadata.tables['user'].insert(), [
+            {'id': i, 'username': f'bench{i}', 'email': f'bench{i}@example.com', 'password_hash': 'x',
+             'created_at': now, 'total_mined': 0.0, 'is_premium': False}
+            for i in range(1, SEED_USERS + 1)
+        ])
+        conn.execute(db.metadata.tables['worker'].insert(), [
+            {'id': i, 'user_id': i, 'name': f'worker_{i}', 'status': 'online', 'hashrate': 50.0,
+             'last_seen': now, 'shares_submitted': 0, 'shares_accepted': 0, 'cryptocurrency': 'BTC'}
+            for i in range(1, SEED_USERS + 1)
+        ])
+    engine.dispose()
+
+
+def write_transaction(conn, user_id, rng):
+    now = datetime.utcnow()
+    conn.execute(text('SELECT hashrate FROM worker WHERE id = :id'), {'id': user_id}).scalar()
+    conn.execute(text(
+        "INSERT INTO mining_session (user_id, cryptocurrency, start_time, end_time, hashrate, shares, earnings, status) "
+        "VALUES (:user_id, 'BTC', :now, :now, :hashrate, 0, :earnings, 'completed')"
+    ), {'user_id': user_id, 'now': now, 'hashrate': 50.0, 'earnings': rng.random() * 1e-6})
+    conn.execute(text(
+        "UPDATE worker SET hashrate = :hashrate, last_seen = :now WHERE id = :id"
+    ), {'hashrate': rng.uniform(10, 100), 'now': now, 'id': user_id})
+
+
+def run_process(profile, url, threads, seconds, seed):
+    """One 'gunicorn worker': ``threads`` writers sharing an engine; returns latencies and error counts"""
+    engine = build_engine(profile, url)
+    deadline = time.monotonic() + seconds
+    results = []
+
+    def writer(index):
+        rng = random.Random(seed * 1000 + index)
+        latencies, errors = [], 0
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    write_transaction(conn, rng.randint(1, SEED_USERS), rng)
+                latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                # "database is locked" on SQLite, timeouts on PostgreSQL
+                errors += 1
+        results.append((latencies, errors))
+
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    engine.dispose()
+    return [latency for latencies, _ in results for latency in latencies], sum(errors for _, errors in results)
+
+
+def measure(profile, url, processes, threads, seconds):
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes) as pool:
+        outcomes = pool.starmap(run_process, [(profile, url, threads, seconds, seed) for seed in range(processes)])
+
+    latencies = sorted(latency for process_latencies, _ in outcomes for latency in process_latencies)
+    errors = sum(process_errors for _, process_errors in outcomes)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) >= 2 else [0.0] * 99
+    return {
+        'commits': len(latencies),
+        'errors': errors,
+        # Every process writes for exactly ``seconds``; process start-up is not counted
+        'commits_per_second': len(latencies) / seconds,
+        'p50_ms': quantiles[49] * 1000,
+        'p99_ms': quantiles[98] * 1000,
+        'max_ms': (latencies[-1] if latencies else 0.0) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent write benchmark per database engine profile')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help='Writer threads per process')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--profiles', default=None, help='Comma-separated (default: both SQLite profiles, plus postgres with --postgres-url)')
+    parser.add_argument('--postgres-url', default=None, help='Empty PostgreSQL database for the postgres profile')
+    parser.add_argument('--output', default=None, help='Write results as JSON to this file')
+    args = parser.parse_args()
+
+    profiles = args.profiles.split(',') if args.profiles else ['sqlite-default', 'sqlite-tuned'] + (['postgres'] if args.postgres_url else [])
+    if 'postgres' in profiles and not args.postgres_url:
+        parser.error('the postgres profile needs --postgres-url')
+
+    results = {}
+    for profile in profiles:
+        workdir = None
+        if profile == 'postgres':
+            url = database_url({'DATABASE_URL': args.postgres_url})
+        else:
+            workdir = tempfile.mkdtemp(prefix='db_write_bench_')
+            url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        try:
+            prepare(profile, url)
+            print(f"{profile}: {args.processes} processes x {args.threads} threads for {args.seconds:.0f}s")
+            results[profile] = measure(profile, url, args.processes, args.threads, args.seconds)
+        finally:
+            if workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+        result = results[profile]
+        print(f"  {result['commits_per_second']:.0f} commits/s  errors {result['errors']}  "
+              f"p50 {result['p50_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms  max {result['max_ms']:.0f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\nWrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
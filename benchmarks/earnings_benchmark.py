@@ -0,0 +1,111 @@
+"""
+Compare per-row scalar earnings calls with the vectorized batch engine
+
+Usage:
+    python benchmarks/earnings_benchmark.py [--sizes 1000 100000 1000000] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+from earnings_engine import COINS, batch_earnings, batch_mining_rewards, coin_indices
+
+
+def scalar_earnings(crypto, hashrate, hours, is_premium=False):
+    """Pre-batch pure-Python implementation of app.calculate_earnings"""
+    base_rates = {
+        'BTC': 0.00001,
+        'ETH': 0.0001,
+        'LTC': 0.001,
+        'XMR': 0.01
+    }
+    premium_bonus = 1.5 if is_premium else 1.0
+    return base_rates.get(crypto, 0.00001) * hashrate * hours * premium_bonus
+
+
+def make_rows(size, rng):
+    cryptos = rng.choice(np.array(COINS), size=size)
+    hashrates = rng.lognormal(mean=4.0, sigma=1.5, size=size)
+    hours = rng.exponential(scale=6.0, size=size)
+    premium = rng.random(size) < 0.1
+    return cryptos, hashrates, hours, premium
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def run(size, rng, repeat, scalar_limit):
+    cryptos, hashrates, hours, premium = make_rows(size, rng)
+    row_lists = (cryptos.tolist(), hashrates.tolist(), hours.tolist(), premium.tolist())
+
+    batch_seconds, batch_result = timed(lambda: batch_earnings(cryptos, hashrates, hours, premium), repeat)
+    codes = coin_indices(cryptos)
+    encoded_seconds, _ = timed(lambda: batch_earnings(codes, hashrates, hours, premium), repeat)
+    rewards_seconds, _ = timed(
+        lambda: batch_mining_rewards(cryptos, hashrates, hours, premium, prices={'BTC': 45000.0}),
+        repeat
+    )
+
+    result = {
+        'rows': size,
+        'batch_earnings_seconds': batch_seconds,
+        'batch_encoded_seconds': encoded_seconds,
+        'batch_rewards_seconds': rewards_seconds,
+        'batch_rows_per_second': size / batch_seconds if batch_seconds else None
+    }
+
+    if size <= scalar_limit:
+        scalar_seconds, scalar_result = timed(
+            lambda: [scalar_earnings(*row) for row in zip(*row_lists)], 1
+        )
+        assert np.allclose(scalar_result, batch_result)
+        result.update({
+            'scalar_seconds': scalar_seconds,
+            'scalar_rows_per_second': size / scalar_seconds,
+            'speedup': scalar_seconds / batch_seconds if batch_seconds else None
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scalar vs batch earnings benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scalar-limit', type=int, default=1000000,
+                        help='Skip the scalar loop above this many rows')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    results = []
+    print(f"{'rows':>10} {'scalar s':>10} {'batch s':>10} {'encoded s':>10} {'rewards s':>10} {'speedup':>8}")
+    for size in args.sizes:
+        result = run(size, rng, args.repeat, args.scalar_limit)
+        results.append(result)
+        scalar = f"{result['scalar_seconds']:.4f}" if 'scalar_seconds' in result else '-'
+        speedup = f"{result['speedup']:.0f}x" if 'speedup' in result else '-'
+        print(f"{size:>10} {scalar:>10} {result['batch_earnings_seconds']:>10.4f} "
+              f"{result['batch_encoded_seconds']:>10.4f} {result['batch_rewards_seconds']:>10.4f} {speedup:>8}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Benchmark the hot-filter indexes: seed a large dataset, then compare query
+plans and latencies before and after migration 0002_hot_filter_indexes
+
+Usage:
+    python benchmarks/index_benchmark.py [--sessions 1000000] [--database-url URL]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import create_engine, text
+
+from app import db, SUPPORTED_CRYPTOS
+from migrations import upgrade
+
+CHUNK_SIZE = 10000
+
+QUERIES = {
+    'start_mining_active_lookup': (
+        "SELECT id FROM mining_session "
+        "WHERE user_id = :user_id AND cryptocurrency = :crypto AND status = 'active' LIMIT 1"
+    ),
+    'get_stats_active_sessions': (
+        "SELECT id, cryptocurrency, hashrate, start_time FROM mining_session "
+        "WHERE user_id = :user_id AND status = 'active'"
+    ),
+    'pool_stats_online_workers': (
+        "SELECT count(id), sum(hashrate) FROM worker "
+        "WHERE status = 'online' AND cryptocurrency = :crypto"
+    ),
+    'start_mining_worker_lookup': (
+        "SELECT id FROM worker WHERE user_id = :user_id AND name = :name LIMIT 1"
+    ),
+    'dashboard_recent_payouts': (
+        "SELECT id, amount, cryptocurrency, created_at FROM payout "
+        "WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 5"
+    ),
+}
+
+
+def chunked_insert(conn, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK_SIZE:
+            conn.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+
+
+def seed(engine, users, sessions, payouts, rng):
+    """Bulk-load users, one worker per user, sessions and payouts"""
+    tables = db.metadata.tables
+    cryptos = list(SUPPORTED_CRYPTOS)
+    now = datetime.utcnow()
+
+    with engine.begin() as conn:
+        chunked_insert(conn, tables['user'], (
+            {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com',
+             'password_hash': 'x', 'created_at': now, 'total_mined': 0.0, 'is_premium': False}
+            for i in range(1, users + 1)
+        ))
+        chunked_insert(conn, tables['worker'], (
+            {'id': i, 'user_id': i, 'name': f'worker_{i}',
+             'status': 'online' if rng.random() < 0.2 else 'offline',
+             'hashrate': rng.uniform(10, 5000), 'last_seen': now,
+             'shares_submitted': 0, 'shares_accepted': 0, 'cryptocurrency': rng.choice(cryptos)}
+            for i in range(1, users + 1)
+        ))
+
+    with engine.begin() as conn:
+        def session_rows():
+            for i in range(1, sessions + 1):
+                start = now - timedelta(minutes=rng.randint(1, 525600))
+                active = rng.random() < 0.01
+                yield {
+                    'id': i, 'user_id': rng.randint(1, users), 'cryptocurrency': rng.choice(cryptos),
+                    'start_time': start, 'end_time': None if active else start + timedelta(hours=1),
+                    'hashrate': 50.0, 'shares': 0, 'earnings': 0.001,
+                    'status': 'active' if active else 'completed'
+                }
+        chunked_insert(conn, tables['mining_session'], session_rows())
+
+    with engine.begin() as conn:
+        chunked_insert(conn, tables['payout'], (
+            {'id': i, 'user_id': rng.randint(1, users), 'amount': 0.01,
+             'cryptocurrency': rng.choice(cryptos), 'wallet_address': 'wallet',
+             'status': 'completed', 'created_at': now - timedelta(minutes=rng.randint(1, 525600))}
+            for i in range(1, payouts + 1)
+        ))
+
+
+def query_plan(conn, sql, params):
+    if conn.dialect.name == 'sqlite':
+        rows = conn.execute(text('EXPLAIN QUERY PLAN ' + sql), params).fetchall()
+        return [row[-1] for row in rows]
+    rows = conn.execute(text('EXPLAIN ' + sql), params).fetchall()
+    return [row[0] for row in rows]
+
+
+def measure(engine, users, iterations, rng):
+    """Plan and latency (ms) for every hot query"""
+    results = {}
+    cryptos = list(SUPPORTED_CRYPTOS)
+
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            def params():
+                user_id = rng.randint(1, users)
+                return {'user_id': user_id, 'crypto': rng.choice(cryptos), 'name': f'worker_{user_id}'}
+
+            plan = query_plan(conn, sql, params())
+            timings = []
+            for _ in range(iterations):
+                bound = params()
+                started = time.perf_counter()
+                conn.execute(text(sql), bound).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[name] = {
+                'plan': plan,
+                'p50_ms': statistics.median(timings),
+                'p95_ms': timings[int(len(timings) * 0.95) - 1],
+                'mean_ms': statistics.fmean(timings)
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hot-filter index benchmark')
+    parser.add_argument('--sessions', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--payouts', type=int, default=100000)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--database-url', default=None, help='Empty database to use (default: temp SQLite file)')
+    parser.add_argument('--output', default=None, help='Write results as JSON to this file')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workdir = None
+    url = args.database_url
+    if url is None:
+        workdir = tempfile.mkdtemp(prefix='index_bench_')
+        url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    engine = create_engine(url)
+
+    print(f"Creating schema (version 1, no indexes) at {url}")
+    upgrade(engine, db.metadata, target=1)
+
+    started = time.perf_counter()
+    seed(engine, args.users, args.sessions, args.payouts, rng)
+    print(f"Seeded {args.users} users, {args.sessions} sessions, {args.payouts} payouts "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    before = measure(engine, args.users, args.iterations, rng)
+
+    started = time.perf_counter()
+    upgrade(engine, db.metadata)
+    print(f"Built indexes in {time.perf_counter() - started:.1f}s")
+    with engine.begin() as conn:
+        conn.execute(text('ANALYZE'))
+
+    after = measure(engine, args.users, args.iterations, rng)
+
+    for name in QUERIES:
+        print(f"\n{name}")
+        print(f"  before: p50 {before[name]['p50_ms']:.3f} ms  p95 {before[name]['p95_ms']:.3f} ms")
+        for line in before[name]['plan']:
+            print(f"          {line}")
+        print(f"  after:  p50 {after[name]['p50_ms']:.3f} ms  p95 {after[name]['p95_ms']:.3f} ms")
+        for line in after[name]['plan']:
+            print(f"          {line}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'before': before, 'after': after}, f, indent=2)
+        print(f"\nWrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
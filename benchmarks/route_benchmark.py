@@ -0,0 +1,338 @@
+"""
+Load benchmark for the Flask routes: seed a dataset, stub every upstream API,
+then drive each route from concurrent logged-in clients over real HTTP
+
+Usage:
+    python benchmarks/route_benchmark.py [--users 1000] [--clients 16] [--requests 2000]
+        [--route /api/stats ...] [--output results.json] [--compare baseline.json]
+
+Reports throughput and p50/p95/p99 latency per route. Results are written as
+JSON (tagged with the git commit) so runs can be compared across commits with
+``--compare``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import requests
+
+BENCH_PASSWORD = 'benchmark-password'
+
+# Canned upstream payloads, matched by URL prefix
+UPSTREAM_RESPONSES = {
+    'https://api.coingecko.com/': {
+        'bitcoin': {'usd': 45000.0, 'usd_24h_change': 1.2, 'usd_24h_vol': 2.5e10},
+        'ethereum': {'usd': 3200.0, 'usd_24h_change': -0.4, 'usd_24h_vol': 1.1e10},
+        'litecoin': {'usd': 150.0, 'usd_24h_change': 0.3, 'usd_24h_vol': 4.0e8},
+        'monero': {'usd': 280.0, 'usd_24h_change': 0.8, 'usd_24h_vol': 9.0e7}
+    },
+    'https://api.blockchain.info/': {
+        'difficulty': 7.2e13, 'hash_rate': 5.1e8, 'n_blocks_total': 820000, 'n_tx_mempool': 15000
+    },
+    'https://api.blockchair.com/': {
+        'data': {'difficulty': 7.2e13, 'hashrate_24h': '5.1e20', 'blocks': 820000, 'mempool_transactions': 15000}
+    },
+    'https://api.etherscan.io/': {'result': '0x12a05f2'},
+    'https://api.coinbase.com/': {'data': {'currency': 'BTC', 'rates': {'USD': '45000.00'}}},
+    'https://api.blockcypher.com/': {'height': 2600000, 'hash': '00' * 32},
+    'https://localmonero.co/': {'height': 3100000, 'difficulty': 2.4e11}
+}
+
+
+class _StubResponse:
+    def __init__(self, url, payload):
+        self.url = url
+        self.status_code = 200
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(json.dumps(self._payload))
+
+
+def install_upstream_stubs(latency=0.0):
+    """Answer every external HTTP call from UPSTREAM_RESPONSES; local traffic passes through
+
+    Unknown external URLs raise, so a benchmark can never touch the network.
+    """
+    original = requests.Session.request
+
+    def request(session, method, url, *args, **kwargs):
+        if urlsplit(url).hostname in ('127.0.0.1', 'localhost'):
+            return original(session, method, url, *args, **kwargs)
+        for prefix, payload in UPSTREAM_RESPONSES.items():
+            if url.startswith(prefix):
+                if latency:
+                    time.sleep(latency)
+                return _StubResponse(url, payload)
+        raise RuntimeError(f'Benchmark attempted an unstubbed external request: {url}')
+
+    requests.Session.request = request
+
+
+def chunked_insert(conn, table, rows, chunk_size=5000):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            conn.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+
+
+def seed(app, users, workers_per_user, sessions, payouts, rng):
+    """Bulk-load the dataset; every user can log in with BENCH_PASSWORD"""
+    from app import db, auth_executor, SUPPORTED_CRYPTOS, PoolStats
+    from user_rollups import backfill
+
+    cryptos = list(SUPPORTED_CRYPTOS)
+    now = datetime.utcnow()
+    password_hash = auth_executor.hash_password(BENCH_PASSWORD)
+
+    with app.app_context():
+        tables = db.metadata.tables
+        with db.engine.begin() as conn:
+            chunked_insert(conn, tables['user'], (
+                {'id': i, 'username': f'bench{i}', 'email': f'bench{i}@example.com',
+                 'password_hash': password_hash, 'wallet_address': f'wallet{i}',
+                 'created_at': now, 'total_mined': 0.0, 'is_premium': i % 10 == 0}
+                for i in range(1, users + 1)
+            ))
+            chunked_insert(conn, tables['worker'], (
+                {'user_id': user_id, 'name': f'worker_{user_id}' if n == 0 else f'rig_{user_id}_{n}',
+                 'status': 'online' if rng.random() < 0.3 else 'offline',
+                 'hashrate': rng.uniform(10, 5000), 'last_seen': now,
+                 'shares_submitted': 1000, 'shares_accepted': 990, 'cryptocurrency': rng.choice(cryptos)}
+                for user_id in range(1, users + 1) for n in range(workers_per_user)
+            ))
+            chunked_insert(conn, tables['mining_session'], (
+                {'user_id': rng.randint(1, users), 'cryptocurrency': rng.choice(cryptos),
+                 'start_time': start, 'end_time': start + timedelta(hours=1),
+                 'hashrate': 50.0, 'shares': 0, 'earnings': 0.001, 'status': 'completed'}
+                for start in (now - timedelta(minutes=rng.randint(60, 525600)) for _ in range(sessions))
+            ))
+            chunked_insert(conn, tables['payout'], (
+                {'user_id': rng.randint(1, users), 'amount': 0.01, 'cryptocurrency': rng.choice(cryptos),
+                 'wallet_address': 'wallet', 'status': 'completed',
+                 'created_at': now - timedelta(minutes=rng.randint(1, 525600))}
+                for _ in range(payouts)
+            ))
+
+        for crypto in cryptos:
+            db.session.add(PoolStats(cryptocurrency=crypto, pool_hashrate=1000000, network_hashrate=100000000,
+                                     difficulty=25000000000000, active_miners=0, pool_fee=1.0))
+        db.session.commit()
+
+    backfill(app)
+
+
+def install_template_stubs(app):
+    """Minimal stand-ins for templates missing from this checkout
+
+    They touch the same attributes the real dashboard does, so lazy loads
+    still show up in the measurements.
+    """
+    from jinja2 import ChoiceLoader, DictLoader
+
+    dashboard = (
+        '{% for s in active_sessions %}{{ s.cryptocurrency }} {{ s.hashrate }}\n{% endfor %}'
+        '{% for w in workers %}{{ w.name }} {{ w.status }} {{ w.hashrate }}\n{% endfor %}'
+        '{% for p in recent_payouts %}{{ p.amount }} {{ p.cryptocurrency }}\n{% endfor %}'
+        '{% for c, s in pool_stats.items() %}{{ c }} {{ s.pool_hashrate }}\n{% endfor %}'
+    )
+    app.jinja_loader = ChoiceLoader([app.jinja_loader, DictLoader({
+        'dashboard.html': dashboard, 'login.html': 'login', 'register.html': 'register'
+    })])
+    app.jinja_env.loader = app.jinja_loader
+
+
+class Client:
+    """One logged-in user with its own cookie jar and keep-alive connection"""
+
+    def __init__(self, base_url, user_id):
+        self.base_url = base_url
+        self.user_id = user_id
+        self.http = requests.Session()
+        response = self.http.post(f'{base_url}/login', json={'username': f'bench{user_id}', 'password': BENCH_PASSWORD})
+        response.raise_for_status()
+
+    def call(self, method, path, body=None):
+        started = time.perf_counter()
+        response = self.http.request(method, self.base_url + path, json=body)
+        elapsed = time.perf_counter() - started
+        return response.status_code, elapsed
+
+
+def _request_plan(route, rng):
+    """(method, path, body) steps for one iteration of a route"""
+    crypto = rng.choice(['BTC', 'ETH', 'LTC', 'XMR'])
+    if route == '/api/earnings_calculator':
+        return [('POST', route, {'cryptocurrency': crypto, 'hashrate': rng.uniform(1, 1000),
+                                 'time_period': rng.choice(['hour', 'day', 'week', 'month'])})]
+    if route == 'mining_cycle':
+        return [('POST', '/api/start_mining', {'cryptocurrency': crypto}),
+                ('POST', '/api/stop_mining', {'cryptocurrency': crypto})]
+    return [('GET', route, None)]
+
+
+ROUTES = ['/', '/api/stats', '/api/pool_stats', '/api/user_profile', '/api/earnings_calculator', 'mining_cycle']
+
+
+def summarize(latencies, errors, wall_seconds):
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p * len(ordered))) - 1))] * 1000 if ordered else None
+
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': len(ordered) / wall_seconds if wall_seconds > 0 else 0.0,
+        'mean_ms': statistics.fmean(ordered) * 1000 if ordered else None,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'max_ms': ordered[-1] * 1000 if ordered else None
+    }
+
+
+def run_route(clients, route, total_requests, seed_value):
+    """Split ``total_requests`` iterations of ``route`` across all clients concurrently"""
+    results = {}
+    lock = threading.Lock()
+    per_client = max(1, total_requests // len(clients))
+
+    def drive(index, client):
+        rng = random.Random(seed_value * 1000 + index)
+        local = {}
+        for _ in range(per_client):
+            for method, path, body in _request_plan(route, rng):
+                status, elapsed = client.call(method, path, body)
+                timings, errors = local.setdefault(path, ([], [0]))
+                timings.append(elapsed)
+                if status >= 400:
+                    errors[0] += 1
+        with lock:
+            for path, (timings, errors) in local.items():
+                merged = results.setdefault(path, ([], [0]))
+                merged[0].extend(timings)
+                merged[1][0] += errors[0]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        list(executor.map(lambda pair: drive(*pair), enumerate(clients)))
+    wall = time.perf_counter() - started
+
+    return {path: summarize(timings, errors[0], wall) for path, (timings, errors) in results.items()}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {str(baseline.get('commit'))[:10]})")
+    for path, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(path)
+        if not previous or not previous.get('p95_ms') or not current.get('p95_ms'):
+            continue
+        p95_change = (current['p95_ms'] / previous['p95_ms'] - 1) * 100
+        rps_change = (current['throughput_rps'] / previous['throughput_rps'] - 1) * 100 if previous['throughput_rps'] else 0.0
+        print(f"  {path:28s} p95 {previous['p95_ms']:8.2f} -> {current['p95_ms']:8.2f} ms ({p95_change:+.1f}%)  "
+              f"throughput {rps_change:+.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Route load benchmark')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--workers-per-user', type=int, default=2)
+    parser.add_argument('--sessions', type=int, default=50000)
+    parser.add_argument('--payouts', type=int, default=10000)
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent logged-in clients')
+    parser.add_argument('--requests', type=int, default=2000, help='Iterations per route, split across clients')
+    parser.add_argument('--route', action='append', choices=ROUTES, help='Limit to these routes (repeatable)')
+    parser.add_argument('--upstream-latency', type=float, default=0.0, help='Seconds added to each stubbed upstream call')
+    parser.add_argument('--database-url', default=None, help='Empty database to use (default: temp SQLite file)')
+    parser.add_argument('--output', default=None, help='Write results as JSON to this file')
+    parser.add_argument('--compare', default=None, help='Baseline JSON from an earlier run')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    url = args.database_url
+    if url is None:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='route_bench_'), 'bench.db')}"
+    # The app binds its engine at import time
+    os.environ['DATABASE_URL'] = url
+    install_upstream_stubs(args.upstream_latency)
+
+    from werkzeug.serving import make_server
+    from app import app, db
+    from migrations import upgrade
+
+    with app.app_context():
+        upgrade(db.engine, db.metadata)
+    started = time.perf_counter()
+    seed(app, args.users, args.workers_per_user, args.sessions, args.payouts, random.Random(args.seed))
+    print(f"Seeded {args.users} users, {args.users * args.workers_per_user} workers, {args.sessions} sessions, "
+          f"{args.payouts} payouts in {time.perf_counter() - started:.1f}s ({url})")
+
+    install_template_stubs(app)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    client_count = min(args.clients, args.users)
+    with ThreadPoolExecutor(max_workers=client_count) as executor:
+        clients = list(executor.map(lambda user_id: Client(base_url, user_id), range(1, client_count + 1)))
+
+    routes = {}
+    for index, route in enumerate(args.route or ROUTES):
+        route_results = run_route(clients, route, args.requests, args.seed + index)
+        for path, summary in route_results.items():
+            routes[path] = summary
+            print(f"{path:28s} {summary['throughput_rps']:8.1f} req/s  p50 {summary['p50_ms']:7.2f} ms  "
+                  f"p95 {summary['p95_ms']:7.2f} ms  p99 {summary['p99_ms']:7.2f} ms  errors {summary['errors']}")
+
+    server.shutdown()
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'database': url.split(':', 1)[0],
+        'args': vars(args),
+        'routes': routes
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote results to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
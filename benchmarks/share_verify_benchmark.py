@@ -0,0 +1,140 @@
+"""
+Verified SHA-256d shares per second: one core inline, the raw process pool, and ShareVerifier end to end
+
+Modes:
+    inline     verify_batch on this process (single-core baseline)
+    pool       verify_batch chunks mapped over a process pool (hashing throughput)
+    verifier   ShareVerifier driven from an event loop with --concurrency shares
+               in flight, as the Stratum server uses it (includes the structural
+               checks, batching and future resolution on the event loop)
+
+Usage:
+    python benchmarks/share_verify_benchmark.py [--shares 200000] [--workers N] [--batch 256]
+        [--concurrency 4096] [--merkle-depth 12] [--difficulty D] [--modes inline,pool,verifier]
+"""
+
+import argparse
+import asyncio
+import inspect
+import multiprocessing
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from share_verifier import SHARE, BLOCK, ShareVerifier, job_template, share_target, verify_batch
+from stratum_server import StratumError, SyntheticJobSource
+
+EXTRANONCE1 = '0000abcd'
+EXTRANONCE2_SIZE = 4
+
+
+def make_job(merkle_depth):
+    job = SyntheticJobSource().next_job(clean_jobs=True)
+    job.merkle_branch = [secrets.token_hex(32) for _ in range(merkle_depth)]
+    return job
+
+
+def make_submissions(job, count):
+    """(extranonce2, ntime, nonce) hex triples, unique per share"""
+    return [(format(i // (1 << 32), '08x'), job.ntime, format(i % (1 << 32), '08x')) for i in range(count)]
+
+
+def run_inline(job, submissions, difficulty):
+    template = job_template(job)
+    target = share_target(difficulty)
+    shares = [(0, EXTRANONCE1, extranonce2, ntime, nonce, target) for extranonce2, ntime, nonce in submissions]
+    started = time.perf_counter()
+    statuses = verify_batch({0: template}, shares)
+    return time.perf_counter() - started, sum(1 for status in statuses if status in (SHARE, BLOCK))
+
+
+def run_pool(job, submissions, difficulty, workers, batch):
+    templates = {0: job_template(job)}
+    target = share_target(difficulty)
+    shares = [(0, EXTRANONCE1, extranonce2, ntime, nonce, target) for extranonce2, ntime, nonce in submissions]
+    chunks = [shares[i:i + batch] for i in range(0, len(shares), batch)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        # Start every process before timing
+        list(pool.map(verify_batch, [templates] * workers, [chunks[0]] * workers))
+        started = time.perf_counter()
+        results = list(pool.map(verify_batch, [templates] * len(chunks), chunks))
+        seconds = time.perf_counter() - started
+    return seconds, sum(1 for statuses in results for status in statuses if status in (SHARE, BLOCK))
+
+
+async def _drive_verifier(verifier, job, submissions, difficulty, concurrency):
+    accepted = 0
+    pending = iter(submissions)
+
+    async def connection():
+        nonlocal accepted
+        for extranonce2, ntime, nonce in pending:
+            try:
+                result = verifier(job, EXTRANONCE1, extranonce2, ntime, nonce, difficulty, EXTRANONCE2_SIZE)
+                if inspect.isawaitable(result):
+                    await result
+                accepted += 1
+            except StratumError:
+                pass
+
+    await asyncio.gather(*(connection() for _ in range(concurrency)))
+    return accepted
+
+
+def run_verifier(job, submissions, difficulty, workers, batch, concurrency):
+    verifier = ShareVerifier(max_workers=workers, batch_size=batch)
+
+    async def main():
+        # Start every process before timing
+        await _drive_verifier(verifier, job, submissions[:workers * batch], difficulty, concurrency)
+        started = time.perf_counter()
+        accepted = await _drive_verifier(verifier, job, submissions, difficulty, concurrency)
+        return time.perf_counter() - started, accepted
+
+    try:
+        seconds, accepted = asyncio.run(main())
+    finally:
+        verifier.shutdown()
+    return seconds, accepted, verifier.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SHA-256d share verification throughput')
+    parser.add_argument('--shares', type=int, default=200000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch', type=int, default=256)
+    parser.add_argument('--concurrency', type=int, default=4096, help='Shares in flight (connections) in verifier mode')
+    parser.add_argument('--merkle-depth', type=int, default=12, help='Merkle branch length (log2 of block transactions)')
+    parser.add_argument('--difficulty', type=float, default=2 ** -24, help='Share difficulty (default: about 1 in 256 shares meets it)')
+    parser.add_argument('--modes', default='inline,pool,verifier')
+    args = parser.parse_args()
+
+    job = make_job(args.merkle_depth)
+    submissions = make_submissions(job, args.shares)
+    print(f"{args.shares} shares, merkle depth {args.merkle_depth}, {args.workers} workers, batch {args.batch}")
+
+    for mode in args.modes.split(','):
+        extra = ''
+        if mode == 'inline':
+            # The single core runs a tenth of the shares; the rate is what matters
+            seconds, accepted = run_inline(job, submissions[:max(1, args.shares // 10)], args.difficulty)
+            count = max(1, args.shares // 10)
+        elif mode == 'pool':
+            seconds, accepted = run_pool(job, submissions, args.difficulty, args.workers, args.batch)
+            count = args.shares
+        elif mode == 'verifier':
+            seconds, accepted, stats = run_verifier(job, submissions, args.difficulty, args.workers,
+                                                    args.batch, args.concurrency)
+            count = args.shares
+            extra = f"  avg batch {stats['avg_batch_size']:.0f}"
+        else:
+            parser.error(f'unknown mode {mode}')
+        print(f"  {mode:9s} {count / seconds:>10,.0f} shares/s  ({accepted} met the share target){extra}")
+
+
+if __name__ == "__main__":
+    main()
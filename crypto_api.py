@@ -8,6 +8,12 @@ import time
 from datetime import datetime, timedelta
 import threading
 import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from earnings_engine import batch_mining_rewards, profitability_grid
+from upstream_fetcher import UpstreamFetcher, Source
+from ttl_cache import TTLCache
+from shared_cache import LeaderElection, backend_from_env
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,34 +21,44 @@ logger = logging.getLogger(__name__)
 class CryptoPriceAPI:
     """Handle cryptocurrency price and network data fetching"""
     
-    def __init__(self):
-        self.cache = {}
+    # Coin symbol -> CoinGecko id
+    COINGECKO_IDS = {
+        'BTC': 'bitcoin',
+        'ETH': 'ethereum', 
+        'LTC': 'litecoin',
+        'XMR': 'monero'
+    }
+    
+    # Seconds a cached value counts as fresh, per key prefix
+    CACHE_TTLS = {
+        'prices': 300,    # 5 minutes
+        'network': 600    # 10 minutes
+    }
+    # Seconds past its TTL that a value is still served while it is refreshed
+    STALE_TTL = 3600
+    # With a shared backend, how long each process trusts its local copy before re-reading
+    SHARED_LOCAL_TTL = 30
+    # Seconds between background refreshes
+    UPDATE_INTERVAL = 300
+    
+    def __init__(self, fetcher=None, timeout=(3.05, 5.0), hedge_deadline=8.0, cache=None, shared=None):
         self.cache_duration = 300  # 5 minutes
-        self.last_update = {}
+        self.cache = cache if cache is not None else TTLCache(maxsize=256, ttl=self.cache_duration, stale_ttl=self.STALE_TTL)
+        # Cross-process cache (Redis in production) filled by the elected updater
+        self.shared = shared if shared is not None else backend_from_env()
+        # Keep-alive connection pools, per-source circuit breakers and latency stats
+        self.fetcher = fetcher or UpstreamFetcher()
+        self.timeout = timeout
+        self.hedge_deadline = hedge_deadline
+        self._refresh_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='refresh')
+    
+    def _price_source(self, symbols):
+        ids = self.COINGECKO_IDS
+        reverse_ids = {v: k for k, v in ids.items()}
         
-    def get_crypto_prices(self, symbols=['BTC', 'ETH', 'LTC', 'XMR']):
-        """Get current cryptocurrency prices"""
-        try:
-            # Use CoinGecko API for reliable price data
-            ids = {
-                'BTC': 'bitcoin',
-                'ETH': 'ethereum', 
-                'LTC': 'litecoin',
-                'XMR': 'monero'
-            }
-            
-            coin_ids = ','.join([ids.get(symbol) or symbol.lower() for symbol in symbols])
-            url = f"https://api.coingecko.com/api/v3/simple/price?ids={coin_ids}&vs_currencies=usd&include_24hr_change=true&include_24hr_vol=true"
-            
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
+        def parse(data):
             # Convert back to symbol format
             prices = {}
-            reverse_ids = {v: k for k, v in ids.items()}
-            
             for coin_id, price_data in data.items():
                 symbol = reverse_ids.get(coin_id, coin_id.upper())
                 prices[symbol] = {
@@ -50,9 +66,125 @@ class CryptoPriceAPI:
                     'change_24h': price_data.get('usd_24h_change', 0),
                     'volume_24h': price_data.get('usd_24h_vol', 0)
                 }
-            
             return prices
-            
+        
+        coin_ids = ','.join([ids.get(symbol) or symbol.lower() for symbol in symbols])
+        return Source(
+            'coingecko',
+            "https://api.coingecko.com/api/v3/simple/price",
+            params={
+                'ids': coin_ids,
+                'vs_currencies': 'usd',
+                'include_24hr_change': 'true',
+                'include_24hr_vol': 'true'
+            },
+            timeout=self.timeout,
+            parse=parse
+        )
+    
+    def _bitcoin_sources(self):
+        def parse_blockchain_info(data):
+            if 'difficulty' not in data:
+                return None
+            return {
+                'difficulty': data.get('difficulty', 0),
+                'network_hashrate': data.get('hash_rate', 0) * 1000000000,  # Convert to H/s
+                'block_height': data.get('n_blocks_total', 0),
+                'mempool_size': data.get('n_tx_mempool', 0)
+            }
+        
+        def parse_blockchair(data):
+            stats = data.get('data') or {}
+            if 'difficulty' not in stats:
+                return None
+            return {
+                'difficulty': stats.get('difficulty', 0),
+                'network_hashrate': float(stats.get('hashrate_24h', 0) or 0),  # Already H/s
+                'block_height': stats.get('blocks', 0),
+                'mempool_size': stats.get('mempool_transactions', 0)
+            }
+        
+        # Redundant sources, queried concurrently; the first good answer wins
+        return [
+            Source('blockchain.info', "https://api.blockchain.info/stats",
+                   timeout=self.timeout, parse=parse_blockchain_info),
+            Source('blockchair', "https://api.blockchair.com/bitcoin/stats",
+                   timeout=self.timeout, parse=parse_blockchair)
+        ]
+    
+    def _ethereum_source(self):
+        api_key = "YourEtherscanAPIKey"  # Replace with actual API key
+        
+        def parse(block_data):
+            return {
+                'block_height': int(block_data.get('result', '0x0'), 16),
+                'difficulty': 0,  # ETH 2.0 doesn't use PoW difficulty
+                'network_hashrate': 0
+            }
+        
+        # Get latest block
+        return Source(
+            'etherscan',
+            "https://api.etherscan.io/api",
+            params={
+                'module': 'proxy',
+                'action': 'eth_blockNumber',
+                'apikey': api_key
+            },
+            timeout=self.timeout,
+            parse=parse
+        )
+    
+    def _price_loader(self, symbols):
+        """Cache key and loader for a price table covering ``symbols``
+        
+        Every request is widened to the default coins so callers asking for
+        different subsets share one cache entry and one upstream call.
+        """
+        wanted = sorted(set(self.COINGECKO_IDS) | set(symbols))
+        return 'prices:' + ','.join(wanted), lambda: self.fetcher.fetch(self._price_source(wanted))
+    
+    def _bitcoin_loader(self):
+        return 'network:BTC', lambda: self.fetcher.fetch_first(self._bitcoin_sources(), deadline=self.hedge_deadline)[1]
+    
+    def _ethereum_loader(self):
+        return 'network:ETH', lambda: self.fetcher.fetch(self._ethereum_source())
+    
+    def _publish(self, key, value, ttl):
+        """Share a freshly fetched value with every other process"""
+        if self.shared is not None:
+            try:
+                # Outlive the TTL by one update interval so readers never see a gap between refreshes
+                self.shared.set(key, value, ttl + self.UPDATE_INTERVAL)
+            except Exception as e:
+                logger.error(f"Error publishing {key} to shared cache: {e}")
+        return value
+    
+    def _get_or_load(self, key, loader, ttl):
+        """Local cache, then the shared cache, then the upstream itself"""
+        if self.shared is None:
+            return self.cache.get_or_load(key, loader, ttl=ttl)
+        
+        def load():
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                logger.error(f"Error reading {key} from shared cache: {e}")
+                value = None
+            if value is None:
+                # Nothing published yet (or the updater is down): fetch and share it
+                value = self._publish(key, loader(), ttl)
+            return value
+        
+        return self.cache.get_or_load(key, load, ttl=min(ttl, self.SHARED_LOCAL_TTL))
+    
+    def get_crypto_prices(self, symbols=['BTC', 'ETH', 'LTC', 'XMR']):
+        """Get current cryptocurrency prices"""
+        try:
+            # Use CoinGecko API for reliable price data
+            key, loader = self._price_loader(symbols)
+            prices = self._get_or_load(key, loader, self.CACHE_TTLS['prices'])
+            return {symbol: prices[symbol] for symbol in symbols if symbol in prices}
         except Exception as e:
             logger.error(f"Error fetching crypto prices: {e}")
             return {}
@@ -60,30 +192,8 @@ class CryptoPriceAPI:
     def get_bitcoin_network_stats(self):
         """Get Bitcoin network statistics"""
         try:
-            # Multiple APIs for redundancy
-            apis = [
-                "https://api.blockchain.info/stats",
-                "https://blockchair.com/bitcoin/stats"
-            ]
-            
-            for api_url in apis:
-                try:
-                    response = requests.get(api_url, timeout=10)
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    if 'difficulty' in data:
-                        return {
-                            'difficulty': data.get('difficulty', 0),
-                            'network_hashrate': data.get('hash_rate', 0) * 1000000000,  # Convert to H/s
-                            'block_height': data.get('n_blocks_total', 0),
-                            'mempool_size': data.get('n_tx_mempool', 0)
-                        }
-                except:
-                    continue
-                    
-            return {}
-            
+            key, loader = self._bitcoin_loader()
+            return dict(self._get_or_load(key, loader, self.CACHE_TTLS['network']))
         except Exception as e:
             logger.error(f"Error fetching Bitcoin network stats: {e}")
             return {}
@@ -92,43 +202,52 @@ class CryptoPriceAPI:
         """Get Ethereum network statistics"""
         try:
             # Use Etherscan API
-            api_key = "YourEtherscanAPIKey"  # Replace with actual API key
-            base_url = "https://api.etherscan.io/api"
-            
-            # Get latest block
-            params = {
-                'module': 'proxy',
-                'action': 'eth_blockNumber',
-                'apikey': api_key
-            }
-            
-            response = requests.get(base_url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            block_data = response.json()
-            block_height = int(block_data.get('result', '0x0'), 16)
-            
-            return {
-                'block_height': block_height,
-                'difficulty': 0,  # ETH 2.0 doesn't use PoW difficulty
-                'network_hashrate': 0
-            }
-            
+            key, loader = self._ethereum_loader()
+            return dict(self._get_or_load(key, loader, self.CACHE_TTLS['network']))
         except Exception as e:
             logger.error(f"Error fetching Ethereum network stats: {e}")
             return {}
     
+    def _refresh(self, name, key, loader, ttl):
+        try:
+            local_ttl = ttl if self.shared is None else min(ttl, self.SHARED_LOCAL_TTL)
+            return self.cache.refresh(key, lambda: self._publish(key, loader(), ttl), ttl=local_ttl)
+        except Exception as e:
+            # Readers keep getting the previous value until it goes stale
+            logger.error(f"Error refreshing {name}: {e}")
+            return {}
+    
+    def refresh_all(self, symbols=['BTC', 'ETH', 'LTC', 'XMR']):
+        """Re-fetch prices and network stats from every upstream at once and update the cache
+        
+        Total time is bounded by the slowest source's deadline rather than
+        the sum of all of them.
+        """
+        futures = {
+            'prices': self._refresh_executor.submit(
+                self._refresh, 'prices', *self._price_loader(symbols), self.CACHE_TTLS['prices']),
+            'BTC': self._refresh_executor.submit(
+                self._refresh, 'BTC network stats', *self._bitcoin_loader(), self.CACHE_TTLS['network']),
+            'ETH': self._refresh_executor.submit(
+                self._refresh, 'ETH network stats', *self._ethereum_loader(), self.CACHE_TTLS['network'])
+        }
+        return {key: future.result() for key, future in futures.items()}
+    
+    def upstream_stats(self):
+        """Per-source latency, error counts and circuit breaker state"""
+        return self.fetcher.source_stats()
+    
+    def cache_stats(self):
+        """Hit/miss counters for the price and network stats cache"""
+        return self.cache.stats()
+    
     def get_cached_data(self, key):
         """Get cached data if still valid"""
-        if key in self.cache and key in self.last_update:
-            if datetime.now() - self.last_update[key] < timedelta(seconds=self.cache_duration):
-                return self.cache[key]
-        return None
+        return self.cache.get(key)
     
     def set_cached_data(self, key, data):
         """Set cached data with timestamp"""
-        self.cache[key] = data
-        self.last_update[key] = datetime.now()
+        self.cache.set(key, data)
 
 class MiningCalculator:
     """Calculate mining profitability and earnings"""
@@ -138,38 +257,10 @@ class MiningCalculator:
     
     def calculate_mining_reward(self, crypto, hashrate, hours, is_premium=False):
         """Calculate mining reward based on hashrate and time"""
+        rewards = self.calculate_mining_rewards([crypto], [hashrate], [hours], [is_premium])
         
-        # Get current crypto price
-        prices = self.price_api.get_crypto_prices([crypto])
-        crypto_price = prices.get(crypto, {}).get('price', 0)
-        
-        # Base mining rates (coins per TH/s per hour)
-        base_rates = {
-            'BTC': 0.00000156,  # Realistic BTC mining rate
-            'ETH': 0.000012,    # ETH mining rate (pre-merge for simulation)
-            'LTC': 0.000098,    # Litecoin mining rate
-            'XMR': 0.0008       # Monero mining rate
-        }
-        
-        # Difficulty adjustment factor (simulates network difficulty)
-        difficulty_factors = {
-            'BTC': 1.0,
-            'ETH': 0.8,
-            'LTC': 1.2,
-            'XMR': 1.5
-        }
-        
-        base_rate = base_rates.get(crypto, 0.00000156)
-        difficulty_factor = difficulty_factors.get(crypto, 1.0)
-        premium_multiplier = 2.0 if is_premium else 1.0
-        
-        # Calculate coins earned
-        coins_earned = base_rate * hashrate * hours * difficulty_factor * premium_multiplier
-        
-        # Add some randomness to simulate real mining variance
-        import random
-        variance = random.uniform(0.85, 1.15)
-        coins_earned *= variance
+        coins_earned = float(rewards['coins'][0])
+        crypto_price = float(rewards['crypto_price'][0])
         
         return {
             'coins': coins_earned,
@@ -177,7 +268,23 @@ class MiningCalculator:
             'crypto_price': crypto_price
         }
     
-    def get_mining_profitability(self, crypto, hashrate, power_consumption=0, electricity_cost=0.1):
+    def calculate_mining_rewards(self, cryptos, hashrates, hours, is_premium=False, variance=True, rng=None):
+        """Calculate rewards for many (coin, hashrate, hours, premium) rows at once
+        
+        Prices are fetched once for the distinct coins in the batch; the
+        reward math runs in a single NumPy pass (see earnings_engine).
+        """
+        symbols = sorted({str(crypto) for crypto in np.unique(np.asarray(cryptos))})
+        prices = self.price_api.get_crypto_prices(symbols)
+        
+        return batch_mining_rewards(
+            cryptos, hashrates, hours, is_premium,
+            prices={symbol: data.get('price', 0) for symbol, data in prices.items()},
+            variance=variance,
+            rng=rng
+        )
+    
+    def get_mining_profitability(self, crypto, hashrate, power_consumption=0, electricity_cost=0.1, rig_cost=1000):
         """Calculate mining profitability"""
         
         # Calculate daily rewards
@@ -194,8 +301,19 @@ class MiningCalculator:
             'daily_costs': daily_power_cost,
             'daily_profit': daily_profit,
             'daily_coins': daily_reward['coins'],
-            'roi_days': (1000 / daily_profit) if daily_profit > 0 else float('inf')  # Assuming $1000 mining rig
+            'roi_days': (rig_cost / daily_profit) if daily_profit > 0 else float('inf')
         }
+    
+    def profitability_sweep(self, crypto, hashrates, power_watts, electricity_costs, rig_cost=1000):
+        """Expected profitability over a whole parameter grid with a single price lookup
+        
+        Returns the earnings_engine.profitability_grid() arrays, or None when
+        no price is available.
+        """
+        price = self.price_api.get_crypto_prices([crypto]).get(crypto, {}).get('price')
+        if not price:
+            return None
+        return profitability_grid(crypto, hashrates, power_watts, electricity_costs, price, rig_cost)
 
 class PoolStatistics:
     """Manage mining pool statistics"""
@@ -253,30 +371,62 @@ price_api = CryptoPriceAPI()
 mining_calculator = MiningCalculator(price_api)
 pool_statistics = PoolStatistics(price_api)
 
-def start_background_updates():
-    """Start background thread to update cryptocurrency data"""
+# Background updater state, for monitoring
+_updater = {'thread': None, 'election': None, 'iterations': 0, 'errors': 0, 'last_success': None}
+
+def updater_health():
+    """Background updater status: running, iterations, errors, seconds_since_success, leader"""
+    thread = _updater['thread']
+    election = _updater['election']
+    last_success = _updater['last_success']
+    return {
+        'running': thread is not None and thread.is_alive(),
+        'iterations': _updater['iterations'],
+        'errors': _updater['errors'],
+        'seconds_since_success': time.monotonic() - last_success if last_success is not None else None,
+        'leader': election.is_leader if election is not None else thread is not None
+    }
+
+def start_background_updates(election_ttl=30.0):
+    """Start background thread to update cryptocurrency data
+    
+    Safe to call in every worker process: with a shared cache backend only
+    the process holding the updater lease polls upstream, and the others
+    read its results from the shared cache. The lease is renewed every
+    ``election_ttl / 3`` seconds and taken over when it lapses.
+    """
+    interval = price_api.UPDATE_INTERVAL
+    election = None
+    if price_api.shared is not None:
+        election = LeaderElection(price_api.shared, 'crypto-updater', ttl=election_ttl)
+    _updater['election'] = election
     
     def update_crypto_data():
+        last_refresh = None
         while True:
             try:
-                # Update prices every 5 minutes
-                logger.info("Updating cryptocurrency prices...")
-                prices = price_api.get_crypto_prices()
-                logger.info(f"Updated prices for {len(prices)} cryptocurrencies")
-                
-                # Update network stats every 10 minutes
-                logger.info("Updating network statistics...")
-                btc_stats = price_api.get_bitcoin_network_stats()
-                eth_stats = price_api.get_ethereum_network_stats()
+                if election is None or election.try_acquire():
+                    if last_refresh is None or time.monotonic() - last_refresh >= interval:
+                        # Update prices and network stats every 5 minutes, all sources concurrently
+                        logger.info("Updating cryptocurrency prices and network statistics...")
+                        results = price_api.refresh_all()
+                        last_refresh = time.monotonic()
+                        logger.info(f"Updated prices for {len(results['prices'])} cryptocurrencies")
+                else:
+                    last_refresh = None
+                _updater['iterations'] += 1
+                _updater['last_success'] = time.monotonic()
                 
-                time.sleep(300)  # Sleep for 5 minutes
+                time.sleep(election_ttl / 3 if election else interval)
                 
             except Exception as e:
+                _updater['errors'] += 1
                 logger.error(f"Error in background update: {e}")
                 time.sleep(60)  # Sleep for 1 minute on error
     
     # Start background thread
     update_thread = threading.Thread(target=update_crypto_data, daemon=True)
+    _updater['thread'] = update_thread
     update_thread.start()
     logger.info("Started background cryptocurrency data updates")
 
@@ -0,0 +1,316 @@
+"""
+Synthetic data generator for production-sized local databases
+
+Usage:
+    python datagen.py [--users 1000000] [--sessions 8000000] [--payouts 500000]
+        [--database-url URL] [--chunk-size 50000] [--rollups]
+
+Rows are generated in NumPy chunks and streamed into the database with the
+fastest bulk path available: DBAPI ``executemany`` on SQLite and ``COPY``
+on PostgreSQL. Memory stays bounded by the chunk size (plus one float per
+user for the activity weights). Activity is heavy-tailed: a few users own
+most sessions and payouts, as on a real pool. Every generated user can log
+in with the password given by --password.
+"""
+
+import argparse
+import csv
+import io
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from earnings_engine import COINS, batch_earnings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Share of activity per coin, in earnings_engine.COINS order
+COIN_WEIGHTS = [0.5, 0.25, 0.15, 0.1]
+# Median hashrate per coin in the unit stored for it (see app.calculate_base_hashrate)
+COIN_HASHRATES = np.array([50.0, 500.0, 2500.0, 5000.0])
+# Median payout per coin
+COIN_PAYOUTS = np.array([0.002, 0.03, 0.3, 0.2])
+
+PREMIUM_FRACTION = 0.08
+WALLET_FRACTION = 0.9
+ONLINE_FRACTION = 0.2
+ACTIVE_SESSION_FRACTION = 0.01
+# Pareto shape for per-user activity; lower means a heavier tail
+ACTIVITY_SHAPE = 1.2
+PAYOUT_STATUSES = ['completed', 'pending', 'failed']
+PAYOUT_STATUS_WEIGHTS = [0.95, 0.03, 0.02]
+
+
+def _timestamps(now, seconds_ago):
+    """'YYYY-MM-DD HH:MM:SS.ffffff' strings, the format SQLAlchemy stores on SQLite"""
+    stamps = np.datetime64(now, 'us') - (np.asarray(seconds_ago) * 1e6).astype('timedelta64[us]')
+    return np.char.replace(np.datetime_as_string(stamps, unit='us'), 'T', ' ')
+
+
+class Generator:
+    """Streams chunks of column arrays for each table"""
+
+    def __init__(self, users, first_user_id, days=365, seed=42, password_hash='x'):
+        self.rng = np.random.default_rng(seed)
+        self.users = users
+        self.first_user_id = first_user_id
+        self.horizon = days * 86400
+        self.password_hash = password_hash
+        self.now = datetime.utcnow()
+        # Heavy-tailed activity weight per user, as a CDF for fast sampling
+        weights = self.rng.pareto(ACTIVITY_SHAPE, users) + 1.0
+        self._activity_cdf = np.cumsum(weights / weights.sum())
+        self._premium = self.rng.random(users) < PREMIUM_FRACTION
+        # user index * len(COINS) + coin of every active session so far
+        self._active_keys = np.empty(0, dtype=np.int64)
+
+    def _pick_users(self, size):
+        """Activity-weighted user indices"""
+        return np.minimum(np.searchsorted(self._activity_cdf, self.rng.random(size)), self.users - 1)
+
+    def _coins(self, size):
+        return self.rng.choice(len(COINS), size=size, p=COIN_WEIGHTS)
+
+    def users_chunks(self, chunk_size):
+        for start in range(0, self.users, chunk_size):
+            size = min(chunk_size, self.users - start)
+            ids = np.arange(start, start + size) + self.first_user_id
+            has_wallet = self.rng.random(size) < WALLET_FRACTION
+            premium = self._premium[start:start + size]
+            premium_expires = _timestamps(self.now, -self.rng.uniform(86400, 30 * 86400, size))
+            yield {
+                'id': ids,
+                'username': np.char.add('user', ids.astype(str)),
+                'email': np.char.add(np.char.add('user', ids.astype(str)), '@example.com'),
+                'password_hash': np.full(size, self.password_hash, dtype=object),
+                'wallet_address': np.where(has_wallet, np.char.add('wallet', ids.astype(str)), None),
+                'created_at': _timestamps(self.now, self.rng.uniform(0, self.horizon, size)),
+                'total_mined': np.zeros(size),
+                'is_premium': premium,
+                'premium_expires': np.where(premium, premium_expires, None)
+            }
+
+    def workers_chunks(self, chunk_size, mean_workers):
+        # Geometric worker counts with the requested mean (at least one per user)
+        p = 1.0 / max(mean_workers, 1.0)
+        for start in range(0, self.users, chunk_size):
+            size = min(chunk_size, self.users - start)
+            counts = self.rng.geometric(p, size)
+            owners = np.repeat(np.arange(start, start + size), counts)
+            ordinal = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts)
+            user_ids = owners + self.first_user_id
+            total = len(owners)
+            coins = self._coins(total)
+            online = self.rng.random(total) < ONLINE_FRACTION
+            submitted = self.rng.poisson(self.rng.lognormal(6, 1.5, total))
+            yield {
+                'user_id': user_ids,
+                'name': np.where(ordinal == 0, np.char.add('worker_', user_ids.astype(str)),
+                                 np.char.add(np.char.add(np.char.add('rig_', user_ids.astype(str)), '_'), ordinal.astype(str))),
+                'status': np.where(online, 'online', 'offline'),
+                'hashrate': np.where(online, COIN_HASHRATES[coins] * self.rng.lognormal(0, 0.5, total), 0.0),
+                'last_seen': _timestamps(self.now, np.where(online, self.rng.uniform(0, 300, total),
+                                                            self.rng.uniform(0, self.horizon, total))),
+                'shares_submitted': submitted,
+                'shares_accepted': self.rng.binomial(submitted, 0.98),
+                'cryptocurrency': np.array(COINS, dtype=object)[coins]
+            }
+
+    def _active(self, users, coins, candidates):
+        """Candidates thinned to at most one active session per (user, coin), as start_mining allows"""
+        keys = users.astype(np.int64) * len(COINS) + coins
+        rows = np.flatnonzero(candidates)
+        rows = rows[np.unique(keys[rows], return_index=True)[1]]
+        rows = rows[~np.isin(keys[rows], self._active_keys)]
+        self._active_keys = np.concatenate([self._active_keys, keys[rows]])
+        active = np.zeros(len(users), dtype=bool)
+        active[rows] = True
+        return active
+
+    def sessions_chunks(self, chunk_size, sessions):
+        for start in range(0, sessions, chunk_size):
+            size = min(chunk_size, sessions - start)
+            users = self._pick_users(size)
+            coins = self._coins(size)
+            premium = self._premium[users]
+            active = self._active(users, coins, self.rng.random(size) < ACTIVE_SESSION_FRACTION)
+            # Sessions last minutes to days, median about two hours
+            hours = np.minimum(self.rng.lognormal(np.log(2), 1.2, size), 72.0)
+            started_ago = np.where(active, self.rng.uniform(0, 86400, size),
+                                   self.rng.uniform(hours * 3600, self.horizon + hours * 3600))
+            hashrate = COIN_HASHRATES[coins] * np.where(premium, 2.0, 1.0)
+            earnings = batch_earnings(coins, hashrate, hours, premium)
+            yield {
+                'user_id': users + self.first_user_id,
+                'cryptocurrency': np.array(COINS, dtype=object)[coins],
+                'start_time': _timestamps(self.now, started_ago),
+                'end_time': np.where(active, None, _timestamps(self.now, started_ago - hours * 3600)),
+                'hashrate': hashrate,
+                'shares': self.rng.poisson(hours * 120),
+                'earnings': np.where(active, 0.0, earnings),
+                'status': np.where(active, 'active', 'completed')
+            }
+
+    def payouts_chunks(self, chunk_size, payouts):
+        for start in range(0, payouts, chunk_size):
+            size = min(chunk_size, payouts - start)
+            users = self._pick_users(size)
+            user_ids = users + self.first_user_id
+            coins = self._coins(size)
+            status = np.array(PAYOUT_STATUSES, dtype=object)[
+                self.rng.choice(len(PAYOUT_STATUSES), size=size, p=PAYOUT_STATUS_WEIGHTS)]
+            created_ago = self.rng.uniform(0, self.horizon, size)
+            completed = status == 'completed'
+            hashes = np.char.add(np.char.mod('%016x', self.rng.integers(0, 2 ** 63, size)),
+                                 np.char.mod('%016x', self.rng.integers(0, 2 ** 63, size)))
+            yield {
+                'user_id': user_ids,
+                'amount': COIN_PAYOUTS[coins] * self.rng.lognormal(0, 0.7, size),
+                'cryptocurrency': np.array(COINS, dtype=object)[coins],
+                'wallet_address': np.char.add('wallet', user_ids.astype(str)),
+                'transaction_hash': np.where(completed, hashes, None),
+                'status': status,
+                'created_at': _timestamps(self.now, created_ago),
+                'processed_at': np.where(completed, _timestamps(self.now, np.maximum(created_ago - 600, 0)), None)
+            }
+
+
+def _rows(columns):
+    """Column arrays -> list of row tuples of plain Python values"""
+    return list(zip(*[np.asarray(values).tolist() for values in columns.values()]))
+
+
+class BulkWriter:
+    """Bulk insert path for the engine's dialect"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.connection = engine.raw_connection()
+        if self.dialect == 'sqlite':
+            cursor = self.connection.cursor()
+            # Loading a scratch database: durability can wait until the end. The journal stays in the
+            # WAL mode db_engine set; leaving it needs the only connection, and the app holds others
+            cursor.execute('PRAGMA synchronous = OFF')
+            cursor.close()
+
+    def write(self, table, columns):
+        """Insert one chunk and commit; returns the row count"""
+        rows = _rows(columns)
+        names = ', '.join(f'"{name}"' for name in columns)
+        cursor = self.connection.cursor()
+        try:
+            if self.dialect == 'postgresql':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in rows:
+                    writer.writerow(['\\N' if value is None else value for value in row])
+                buffer.seek(0)
+                cursor.copy_expert(f'COPY "{table}" ({names}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')', buffer)
+            else:
+                placeholder = '?' if self.dialect == 'sqlite' else '%s'
+                cursor.executemany(
+                    f'INSERT INTO "{table}" ({names}) VALUES ({", ".join([placeholder] * len(columns))})', rows)
+            self.connection.commit()
+        finally:
+            cursor.close()
+        return len(rows)
+
+    def finish(self, tables):
+        """Move PostgreSQL id sequences past the generated rows"""
+        if self.dialect == 'postgresql':
+            cursor = self.connection.cursor()
+            for table in tables:
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM \"{table}\"), 1))")
+            self.connection.commit()
+            cursor.close()
+        self.connection.close()
+
+
+def _load(writer, table, chunks):
+    started = time.perf_counter()
+    total = 0
+    for columns in chunks:
+        total += writer.write(table, columns)
+        logger.info(f"{table}: {total} rows ({total / (time.perf_counter() - started):,.0f} rows/s)")
+    return total, time.perf_counter() - started
+
+
+def generate(flask_app, users, workers_per_user, sessions, payouts, chunk_size=50000, days=365, seed=42,
+             password='datagen-password', rollups=False):
+    """Append a synthetic dataset; returns {table: (rows, seconds)}"""
+    from app import db, auth_executor, SUPPORTED_CRYPTOS, User, PoolStats
+    from migrations import upgrade
+
+    with flask_app.app_context():
+        upgrade(db.engine, db.metadata)
+        first_user_id = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+
+        # One bcrypt hash shared by every generated user
+        generator = Generator(users, first_user_id, days=days, seed=seed,
+                              password_hash=auth_executor.hash_password(password))
+        writer = BulkWriter(db.engine)
+        report = {}
+        try:
+            report['user'] = _load(writer, 'user', generator.users_chunks(chunk_size))
+            report['worker'] = _load(writer, 'worker', generator.workers_chunks(chunk_size, workers_per_user))
+            report['mining_session'] = _load(writer, 'mining_session', generator.sessions_chunks(chunk_size, sessions))
+            report['payout'] = _load(writer, 'payout', generator.payouts_chunks(chunk_size, payouts))
+        finally:
+            writer.finish(['user', 'worker', 'mining_session', 'payout'])
+
+        existing = {crypto for (crypto,) in db.session.query(PoolStats.cryptocurrency)}
+        missing = [crypto for crypto in SUPPORTED_CRYPTOS if crypto not in existing]
+        if missing:
+            db.session.execute(db.insert(PoolStats), [
+                {'cryptocurrency': crypto, 'pool_hashrate': 1000000, 'network_hashrate': 100000000,
+                 'difficulty': 25000000000000, 'active_miners': 0, 'pool_fee': 1.0}
+                for crypto in missing
+            ])
+            db.session.commit()
+
+    if rollups:
+        from user_rollups import backfill
+        started = time.perf_counter()
+        report['user_coin_rollup'] = (backfill(flask_app, chunk_size=10000), time.perf_counter() - started)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic mining pool dataset')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--workers-per-user', type=float, default=1.5, help='Mean workers per user')
+    parser.add_argument('--sessions', type=int, default=1000000)
+    parser.add_argument('--payouts', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=365, help='History spread over this many days')
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--password', default='datagen-password', help='Login password for every generated user')
+    parser.add_argument('--rollups', action='store_true', help='Rebuild per-user rollups afterwards')
+    parser.add_argument('--database-url', default=None, help='Target database (default: DATABASE_URL / app default)')
+    args = parser.parse_args()
+
+    if args.database_url:
+        # The app binds its engine at import time
+        os.environ['DATABASE_URL'] = args.database_url
+    from app import app
+
+    started = time.perf_counter()
+    report = generate(app, args.users, args.workers_per_user, args.sessions, args.payouts,
+                      chunk_size=args.chunk_size, days=args.days, seed=args.seed,
+                      password=args.password, rollups=args.rollups)
+    total_rows = 0
+    for table, (rows, seconds) in report.items():
+        total_rows += rows
+        print(f"{table:18s} {rows:>12,} rows in {seconds:7.1f}s ({rows / seconds if seconds else 0:,.0f} rows/s)")
+    print(f"{'total':18s} {total_rows:>12,} rows in {time.perf_counter() - started:7.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Database engine profiles chosen from DATABASE_URL and tuned through environment variables
+
+Only SQLite and PostgreSQL are supported: rollups and pool history are
+maintained with their ON CONFLICT upserts, so any other backend is refused
+when the engine options are built, i.e. at startup.
+
+PostgreSQL (one pool per process, so a deployment holds up to
+workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections):
+
+    DB_POOL_SIZE              persistent connections per process (5)
+    DB_MAX_OVERFLOW           extra connections under burst (10)
+    DB_POOL_TIMEOUT           seconds to wait for a free connection (10)
+    DB_POOL_RECYCLE           reconnect connections older than this many seconds (1800)
+    DB_STATEMENT_TIMEOUT_MS   server-side cap on any single statement (15000)
+
+SQLite (pragmas applied to every new connection through a connect event):
+
+    SQLITE_BUSY_TIMEOUT_MS    how long a writer waits for the lock before failing (5000)
+    SQLITE_MMAP_SIZE          bytes of the file to memory-map for reads (268435456)
+
+WAL mode lets readers run alongside the single writer and turns each
+commit into an append, and synchronous=NORMAL skips the fsync on every
+commit (a power loss can drop the last transactions but never corrupts
+the database).
+"""
+
+import os
+import logging
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL = 'sqlite:///mining_pool.db'
+SUPPORTED_BACKENDS = ('sqlite', 'postgresql')
+
+
+def _env_int(env, name, default):
+    value = env.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def database_url(env=os.environ):
+    """DATABASE_URL, with Heroku-style postgres:// URLs pointed at the psycopg2 driver we ship"""
+    url = env.get('DATABASE_URL', DEFAULT_URL)
+    for prefix in ('postgres://', 'postgresql://'):
+        if url.startswith(prefix):
+            # Spell the driver out: newer SQLAlchemy releases default to psycopg 3
+            return 'postgresql+psycopg2://' + url[len(prefix):]
+    return url
+
+
+def engine_options(url, env=os.environ):
+    """create_engine() keyword arguments for the URL's backend (SQLALCHEMY_ENGINE_OPTIONS)"""
+    backend = make_url(url).get_backend_name()
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(f"Unsupported database backend '{backend}' in DATABASE_URL: use SQLite or PostgreSQL")
+    if backend == 'postgresql':
+        return {
+            'pool_size': _env_int(env, 'DB_POOL_SIZE', 5),
+            'max_overflow': _env_int(env, 'DB_MAX_OVERFLOW', 10),
+            'pool_timeout': _env_int(env, 'DB_POOL_TIMEOUT', 10),
+            'pool_recycle': _env_int(env, 'DB_POOL_RECYCLE', 1800),
+            # Drop connections the server or a proxy closed while they sat idle
+            'pool_pre_ping': True,
+            'connect_args': {
+                'options': f"-c statement_timeout={_env_int(env, 'DB_STATEMENT_TIMEOUT_MS', 15000)}",
+                'application_name': env.get('DYNO') or 'cryptomine'
+            }
+        }
+    # SQLite: the driver's own lock wait, in seconds; the pragma below covers connections it didn't open
+    return {'connect_args': {'timeout': _env_int(env, 'SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000}}
+
+
+def sqlite_pragmas(url, env=os.environ):
+    """PRAGMA statements for each new SQLite connection (none for in-memory databases)"""
+    database = make_url(url).database
+    if not database or database == ':memory:':
+        return []
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={_env_int(env, 'SQLITE_BUSY_TIMEOUT_MS', 5000)}",
+        f"PRAGMA mmap_size={_env_int(env, 'SQLITE_MMAP_SIZE', 256 * 1024 * 1024)}",
+        'PRAGMA temp_store=MEMORY'
+    ]
+
+
+def configure_engine(engine, env=os.environ):
+    """Attach the per-connection setup for the engine's backend; call once, before first use"""
+    if engine.dialect.name != 'sqlite':
+        return engine
+    pragmas = sqlite_pragmas(engine.url, env)
+    if not pragmas:
+        return engine
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    return engine
+
+
+def make_engine(url=None, env=os.environ, **overrides):
+    """Engine with this module's profile for ``url`` (default: DATABASE_URL), for scripts outside the app"""
+    url = url or database_url(env)
+    return configure_engine(create_engine(url, **dict(engine_options(url, env), **overrides)), env)
+
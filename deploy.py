@@ -12,7 +12,8 @@ def create_production_config():
     """Create production configuration files"""
     
     # Heroku Procfile
-    procfile_content = """web: gunicorn app:app
+    procfile_content = """release: python migrations.py upgrade
+web: gunicorn app:app --worker-class gthread --threads 16
 worker: python crypto_api.py"""
     
     with open('Procfile', 'w') as f:
@@ -31,6 +32,7 @@ Flask-Login==0.6.3
 requests==2.31.0
 python-dotenv==1.0.0
 Werkzeug==2.3.7
+numpy==1.26.4
 gunicorn==21.2.0
 psycopg2-binary==2.9.7
 redis==5.0.0"""
@@ -160,7 +162,7 @@ def create_deployment_guide():
 4. **Deploy**
    ```bash
    git push heroku main
-   heroku run python -c "from app import db; db.create_all()"
+   heroku run python migrations.py upgrade
    ```
 
 ## DigitalOcean Deployment
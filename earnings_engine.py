@@ -0,0 +1,150 @@
+"""
+Vectorized earnings math shared by the web app, payout runs and reports
+
+Every function takes array-likes of equal length (or scalars, which are
+broadcast) and evaluates the whole batch in a single NumPy pass.
+"""
+
+import numpy as np
+
+COINS = ['BTC', 'ETH', 'LTC', 'XMR']
+COIN_INDEX = {coin: i for i, coin in enumerate(COINS)}
+# Unknown symbols fall back to the BTC rates, matching the old dict.get() defaults
+DEFAULT_COIN_INDEX = COIN_INDEX['BTC']
+
+# Pool earnings rates (coins per hashrate unit per hour), see app.calculate_earnings
+POOL_RATES = np.array([0.00001, 0.0001, 0.001, 0.01])
+POOL_PREMIUM_BONUS = 1.5
+
+# Reward model used by MiningCalculator (coins per TH/s per hour)
+REWARD_RATES = np.array([0.00000156, 0.000012, 0.000098, 0.0008])
+DIFFICULTY_FACTORS = np.array([1.0, 0.8, 1.2, 1.5])
+REWARD_PREMIUM_MULTIPLIER = 2.0
+VARIANCE_RANGE = (0.85, 1.15)
+
+
+def coin_indices(cryptos, size=None):
+    """Map coin symbols (or pre-encoded integer codes) to rate-table indices"""
+    cryptos = np.asarray(cryptos)
+    if cryptos.dtype.kind in 'iu':
+        indices = cryptos.astype(np.intp)
+    elif cryptos.ndim == 0:
+        indices = np.array(COIN_INDEX.get(str(cryptos), DEFAULT_COIN_INDEX), dtype=np.intp)
+    else:
+        # One vectorized comparison per known coin instead of a dict lookup per row
+        indices = np.full(cryptos.shape, DEFAULT_COIN_INDEX, dtype=np.intp)
+        for coin, index in COIN_INDEX.items():
+            if index != DEFAULT_COIN_INDEX:
+                indices[cryptos == coin] = index
+    if size is not None:
+        indices = np.broadcast_to(indices, (size,))
+    return indices
+
+
+def _batch_size(*values):
+    return int(np.broadcast(*[np.asarray(v) for v in values]).size)
+
+
+def batch_earnings(cryptos, hashrates, hours, is_premium=False):
+    """Pool earnings for each (coin, hashrate, hours, premium) row"""
+    size = _batch_size(hashrates, hours, is_premium, cryptos)
+    rates = POOL_RATES[coin_indices(cryptos, size)]
+    bonus = np.where(np.asarray(is_premium, dtype=bool), POOL_PREMIUM_BONUS, 1.0)
+    earnings = rates * np.asarray(hashrates, dtype=np.float64) * np.asarray(hours, dtype=np.float64) * bonus
+    return np.broadcast_to(earnings, (size,))
+
+
+def batch_mining_rewards(cryptos, hashrates, hours, is_premium=False, prices=None, variance=True, rng=None):
+    """Coins and USD value for each row under the MiningCalculator reward model
+
+    ``prices`` maps coin symbol to USD price; missing coins are valued at 0.
+    ``variance`` applies the simulated +/-15% mining luck per row (drawn from
+    ``rng``, a ``numpy.random.Generator``, for reproducible runs).
+    """
+    size = _batch_size(hashrates, hours, is_premium, cryptos)
+    indices = coin_indices(cryptos, size)
+    multiplier = np.where(np.asarray(is_premium, dtype=bool), REWARD_PREMIUM_MULTIPLIER, 1.0)
+
+    coins = (REWARD_RATES[indices] * np.asarray(hashrates, dtype=np.float64)
+             * np.asarray(hours, dtype=np.float64) * DIFFICULTY_FACTORS[indices] * multiplier)
+    coins = np.broadcast_to(coins, (size,))
+
+    if variance:
+        rng = rng or np.random.default_rng()
+        coins = coins * rng.uniform(VARIANCE_RANGE[0], VARIANCE_RANGE[1], size=size)
+
+    price_table = np.zeros(len(COINS))
+    for coin, price in (prices or {}).items():
+        if coin in COIN_INDEX:
+            price_table[COIN_INDEX[coin]] = price or 0
+    crypto_price = price_table[indices]
+
+    return {
+        'coins': coins,
+        'usd_value': coins * crypto_price,
+        'crypto_price': crypto_price
+    }
+
+
+def earnings_grid(cryptos, hashrates, hours, prices=None):
+    """Pool earnings for every (coin, hashrate, hours) combination in one pass
+
+    Results are flat arrays of ``len(cryptos) * len(hashrates) * len(hours)``
+    rows in coin-major, then hashrate, then hours order. ``prices`` maps coin
+    symbol to USD price and is looked up once per coin.
+    """
+    rates = POOL_RATES[coin_indices(np.asarray(cryptos, dtype=str))]
+    free = (rates[:, None, None]
+            * np.asarray(hashrates, dtype=np.float64)[None, :, None]
+            * np.asarray(hours, dtype=np.float64)[None, None, :])
+    price = np.array([(prices or {}).get(coin) or 0.0 for coin in cryptos], dtype=np.float64)[:, None, None]
+
+    return {
+        'free': free.ravel(),
+        'premium': (free * POOL_PREMIUM_BONUS).ravel(),
+        'free_usd': (free * price).ravel(),
+        'premium_usd': (free * POOL_PREMIUM_BONUS * price).ravel()
+    }
+
+
+def profitability_grid(crypto, hashrates, power_watts, electricity_costs, price, rig_cost=1000.0):
+    """Expected daily profitability over a hashrate x power x electricity-cost grid
+
+    Uses the MiningCalculator reward model without luck variance. Revenue
+    depends only on hashrate and costs only on (power, electricity), so
+    each is computed on its own axis and broadcast into the (H, P, E)
+    profit and ROI surfaces. Break-even contours are exact because revenue
+    is linear in hashrate and cost is linear in both power and price.
+    """
+    index = coin_indices(crypto)
+    hashrates = np.asarray(hashrates, dtype=np.float64)
+    power_watts = np.asarray(power_watts, dtype=np.float64)
+    electricity_costs = np.asarray(electricity_costs, dtype=np.float64)
+
+    # Coins per hashrate unit per day, and USD per kWh-day of a 1 W rig
+    coins_per_unit = REWARD_RATES[index] * DIFFICULTY_FACTORS[index] * 24
+    daily_coins = coins_per_unit * hashrates
+    daily_revenue = daily_coins * price
+    daily_cost = power_watts[:, None] / 1000 * 24 * electricity_costs[None, :]
+    daily_profit = daily_revenue[:, None, None] - daily_cost[None, :, :]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi_days = np.where(daily_profit > 0, rig_cost / daily_profit, np.inf)
+        break_even_hashrate = (daily_cost / (coins_per_unit * price)) if price > 0 else np.full(daily_cost.shape, np.inf)
+        # Electricity price at which each (hashrate, power) pair stops paying for itself
+        break_even_electricity_cost = daily_revenue[:, None] / (power_watts[None, :] / 1000 * 24)
+
+    return {
+        'hashrates': hashrates,
+        'power_watts': power_watts,
+        'electricity_costs': electricity_costs,
+        'price': float(price),
+        'rig_cost': float(rig_cost),
+        'daily_coins': daily_coins,
+        'daily_revenue': daily_revenue,
+        'daily_cost': daily_cost,
+        'daily_profit': daily_profit,
+        'roi_days': roi_days,
+        'break_even_hashrate': break_even_hashrate,
+        'break_even_electricity_cost': break_even_electricity_cost
+    }
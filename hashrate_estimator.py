@@ -0,0 +1,223 @@
+"""
+Share-derived rolling hashrate estimates with fixed-size, array-backed windows
+"""
+
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import case, func, select
+
+# Expected hashes per share of difficulty 1
+DIFF1_HASHES = 2 ** 32
+COIN_DIFF1_HASHES = {
+    'BTC': 2 ** 32,
+    'ETH': 2 ** 32,
+    'LTC': 2 ** 16,
+    'XMR': 1
+}
+
+# Hashes per second in the unit stored for each coin (see app.calculate_base_hashrate)
+HASHRATE_UNITS = {
+    'BTC': 1e12,    # TH/s
+    'ETH': 1e6,     # MH/s
+    'LTC': 1e6,     # MH/s
+    'XMR': 1.0      # H/s
+}
+
+# name -> (window seconds, buckets)
+DEFAULT_WINDOWS = {
+    '5m': (300, 10),
+    '1h': (3600, 12),
+    '24h': (86400, 24)
+}
+
+
+class _Window:
+    """Ring of time buckets for every worker slot: one float32 row per worker"""
+
+    def __init__(self, seconds, buckets, capacity):
+        self.seconds = seconds
+        self.buckets = buckets
+        self.bucket_seconds = seconds / buckets
+        self.sums = np.zeros((capacity, buckets), dtype=np.float32)
+        self.epochs = np.full(capacity, -1, dtype=np.int64)
+
+    def grow(self, capacity):
+        sums = np.zeros((capacity, self.buckets), dtype=np.float32)
+        sums[:len(self.sums)] = self.sums
+        epochs = np.full(capacity, -1, dtype=np.int64)
+        epochs[:len(self.epochs)] = self.epochs
+        self.sums, self.epochs = sums, epochs
+
+    def add(self, slot, now, difficulty):
+        epoch = int(now // self.bucket_seconds)
+        last = self.epochs[slot]
+        if epoch != last:
+            # Clear buckets skipped since the last share (at most one full turn)
+            row = self.sums[slot]
+            if last < 0 or epoch - last >= self.buckets:
+                row[:] = 0.0
+            else:
+                for skipped in range(last + 1, epoch + 1):
+                    row[skipped % self.buckets] = 0.0
+            self.epochs[slot] = epoch
+        self.sums[slot, epoch % self.buckets] += difficulty
+
+    def totals(self, slots, now):
+        """Difficulty summed over the live buckets of each slot (vectorized, read-only)"""
+        epoch = int(now // self.bucket_seconds)
+        last = self.epochs[slots][:, None]
+        bucket = np.arange(self.buckets)[None, :]
+        # Epoch each bucket was last written in, given the slot's last write epoch
+        bucket_epoch = last - ((last - bucket) % self.buckets)
+        live = (last >= 0) & (bucket_epoch > epoch - self.buckets)
+        return np.where(live, self.sums[slots], 0.0).sum(axis=1, dtype=np.float64)
+
+    def elapsed(self, now):
+        """Seconds covered by the window right now (the newest bucket is partial)"""
+        current_start = (now // self.bucket_seconds) * self.bucket_seconds
+        return (self.buckets - 1) * self.bucket_seconds + (now - current_start)
+
+
+class HashrateEstimator:
+    """Effective hashrate per worker from accepted share difficulty
+
+    Each worker owns one row in preallocated NumPy arrays (a few hundred bytes
+    across all windows), so memory is bounded by the worker count and
+    ``record()`` is O(1) per share regardless of share rate.
+    """
+
+    def __init__(self, windows=None, capacity=1024, diff1_hashes=DIFF1_HASHES, clock=time.time):
+        self.window_specs = dict(windows or DEFAULT_WINDOWS)
+        self.diff1_hashes = diff1_hashes
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._free = []
+        self._capacity = capacity
+        self._first_seen = np.zeros(capacity, dtype=np.float64)
+        self._windows = {
+            name: _Window(seconds, buckets, capacity)
+            for name, (seconds, buckets) in self.window_specs.items()
+        }
+
+    def __len__(self):
+        return len(self._slots)
+
+    def _grow(self):
+        capacity = self._capacity * 2
+        first_seen = np.zeros(capacity, dtype=np.float64)
+        first_seen[:self._capacity] = self._first_seen
+        self._first_seen = first_seen
+        for window in self._windows.values():
+            window.grow(capacity)
+        self._capacity = capacity
+
+    def _slot(self, worker_id, now):
+        slot = self._slots.get(worker_id)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._slots)
+                if slot >= self._capacity:
+                    self._grow()
+            self._slots[worker_id] = slot
+            self._first_seen[slot] = now
+            for window in self._windows.values():
+                window.sums[slot] = 0.0
+                window.epochs[slot] = -1
+        return slot
+
+    def record(self, worker_id, difficulty, now=None):
+        """Account one accepted share of ``difficulty`` for a worker"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            slot = self._slot(worker_id, now)
+            for window in self._windows.values():
+                window.add(slot, now, difficulty)
+
+    def remove(self, worker_id):
+        """Forget a worker and recycle its slot"""
+        with self._lock:
+            slot = self._slots.pop(worker_id, None)
+            if slot is not None:
+                self._free.append(slot)
+
+    def _rates(self, slots, window, now):
+        totals = window.totals(slots, now)
+        covered = np.minimum(window.elapsed(now), now - self._first_seen[slots])
+        covered = np.maximum(covered, 1.0)
+        return totals * self.diff1_hashes / covered
+
+    def estimate(self, worker_id, window='5m', now=None):
+        """Hashes per second for one worker over a window (0.0 if unknown)"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            slot = self._slots.get(worker_id)
+            if slot is None:
+                return 0.0
+            return float(self._rates(np.array([slot]), self._windows[window], now)[0])
+
+    def estimate_all(self, window='5m', now=None):
+        """(worker_ids, hashes per second) arrays for every tracked worker"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            if not self._slots:
+                return np.zeros(0, dtype=np.int64), np.zeros(0)
+            worker_ids = np.fromiter(self._slots.keys(), dtype=np.int64, count=len(self._slots))
+            slots = np.fromiter(self._slots.values(), dtype=np.intp, count=len(self._slots))
+            return worker_ids, self._rates(slots, self._windows[window], now)
+
+    def memory_bytes(self):
+        """Bytes held by the backing arrays"""
+        total = self._first_seen.nbytes
+        for window in self._windows.values():
+            total += window.sums.nbytes + window.epochs.nbytes
+        return total
+
+
+def persist_hashrates(engine, worker_table, session_table, worker_ids, hashrates,
+                      cryptocurrency=None, chunk_size=500, unit=1.0):
+    """Write estimates to Worker.hashrate and roll them up into active sessions
+
+    ``unit`` converts hashes per second into the unit stored for the coin
+    (e.g. 1e12 for BTC's TH/s, as used by calculate_base_hashrate()).
+    """
+    rows = [(int(worker_id), float(rate) / unit) for worker_id, rate in zip(worker_ids, hashrates)]
+    if not rows:
+        return 0
+
+    worker = worker_table
+    user_ids = set()
+    with engine.begin() as conn:
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            worker_ids = [worker_id for worker_id, _ in chunk]
+            conn.execute(
+                worker.update()
+                .where(worker.c.id.in_(worker_ids))
+                .values(hashrate=case(dict(chunk), value=worker.c.id, else_=worker.c.hashrate))
+            )
+            user_ids.update(conn.execute(select(worker.c.user_id).distinct().where(worker.c.id.in_(worker_ids))).scalars())
+
+        # Active session hashrate = sum of the user's online workers on that coin. Only the owners of
+        # these workers: other sessions (e.g. started from the dashboard) keep the hashrate they were given
+        session = session_table
+        online_sum = (
+            select(func.coalesce(func.sum(worker.c.hashrate), 0.0))
+            .where(worker.c.user_id == session.c.user_id,
+                   worker.c.cryptocurrency == session.c.cryptocurrency,
+                   worker.c.status == 'online')
+            .scalar_subquery()
+        )
+        user_ids = sorted(user_ids)
+        for i in range(0, len(user_ids), chunk_size):
+            statement = session.update().where(
+                session.c.status == 'active', session.c.user_id.in_(user_ids[i:i + chunk_size])
+            ).values(hashrate=online_sum)
+            if cryptocurrency is not None:
+                statement = statement.where(session.c.cryptocurrency == cryptocurrency)
+            conn.execute(statement)
+    return len(rows)
@@ -0,0 +1,112 @@
+"""
+Per-process cache of logged-in users' rows, so ``load_user`` skips its SELECT
+
+Entries are plain column dicts, never ORM instances, so they can be shared
+between requests and threads. Writers call ``invalidate(user_id)`` after
+committing. Other processes see the change either through a version stamp
+in the shared cache backend (checked on every hit, when one is configured)
+or, without one, once their copy's short TTL runs out.
+"""
+
+import threading
+import uuid
+import logging
+
+from metrics import REGISTRY
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class IdentityCache:
+    """LRU/TTL cache of user rows keyed by id, with optional cross-process version stamps"""
+
+    def __init__(self, maxsize=4096, ttl=30.0, versions=None):
+        self.ttl = ttl
+        self.versions = versions
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_versions = 0
+        self.invalidations = 0
+
+    def _version_key(self, user_id):
+        return f'user-version:{user_id}'
+
+    def _current_version(self, user_id):
+        if self.versions is None:
+            return None
+        try:
+            return self.versions.get(self._version_key(user_id))
+        except Exception as e:
+            logger.error(f"Error reading user version from shared cache: {e}")
+            return False
+
+    def get_or_load(self, user_id, loader):
+        """Cached row for ``user_id``, else ``loader()`` (a row dict or None), cached on success"""
+        version = self._current_version(user_id)
+        entry = self._cache.get(user_id)
+        if entry is not None and version is not False:
+            if entry[1] == version:
+                with self._lock:
+                    self.hits += 1
+                return entry[0]
+            with self._lock:
+                self.stale_versions += 1
+
+        with self._lock:
+            self.misses += 1
+        # The version was read before loading: a write landing in between leaves
+        # this entry with the old stamp, so the next lookup reloads it
+        row = loader()
+        if row is not None and version is not False:
+            self._cache.set(user_id, (row, version))
+        return row
+
+    def invalidate(self, user_id):
+        """Drop a user's row here and, with a shared backend, in every other process"""
+        self._cache.invalidate(user_id)
+        with self._lock:
+            self.invalidations += 1
+        if self.versions is not None:
+            try:
+                # Outlives every entry stamped with the previous version
+                self.versions.set(self._version_key(user_id), uuid.uuid4().hex, self.ttl + 60)
+            except Exception as e:
+                logger.error(f"Error publishing user version to shared cache: {e}")
+
+    def clear(self):
+        self._cache.invalidate()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._cache),
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale_versions': self.stale_versions,
+                'invalidations': self.invalidations,
+                'evictions': self._cache.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+def register_metrics(cache):
+    """Hit/miss counters and size for an IdentityCache"""
+
+    def collect():
+        stats = cache.stats()
+        yield ('user_cache_requests_total', 'counter', 'load_user lookups by result', [
+            ({'result': 'hit'}, stats['hits']),
+            ({'result': 'miss'}, stats['misses'])
+        ])
+        yield ('user_cache_stale_versions_total', 'counter', 'Cached users reloaded because another process changed them', [({}, stats['stale_versions'])])
+        yield ('user_cache_invalidations_total', 'counter', 'Users invalidated after a write', [({}, stats['invalidations'])])
+        yield ('user_cache_evictions_total', 'counter', 'Users evicted from the cache', [({}, stats['evictions'])])
+        yield ('user_cache_entries', 'gauge', 'Users in the cache', [({}, stats['size'])])
+        yield ('user_cache_hit_ratio', 'gauge', 'Share of load_user calls served from cache', [({}, stats['hit_rate'])])
+
+    REGISTRY.register_collector(collect)
@@ -0,0 +1,242 @@
+"""
+Server-push mining stats: one snapshot per user, fanned out to all of that user's open streams
+
+Stream protocol (Server-Sent Events):
+
+    event: snapshot   full stats, same shape as /api/stats
+    event: delta      {"changed": {...top-level fields...},
+                       "sessions": {"updated": [...], "removed": [ids]}}
+
+A stream gets a snapshot when it connects and again whenever it fell too
+far behind; otherwise it only gets deltas. Snapshots are recomputed when
+``notify(user_id)`` is called (e.g. after start/stop mining) and on a
+low-frequency tick, since earnings grow with time.
+
+Each process serves its own streams, so long-lived connections need a
+threaded or async gunicorn worker class (``--worker-class gthread``).
+Changes made by other processes reach streams on the next tick.
+"""
+
+import json
+import queue
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TooManyStreams(Exception):
+    """The per-process stream cap has been reached"""
+
+
+class StatsStream:
+    """One open stream: a small bounded queue the broker never blocks on"""
+
+    def __init__(self, broker, user_id, queue_size):
+        self.broker = broker
+        self.user_id = user_id
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.needs_snapshot = True
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, event, data):
+        """Enqueue without blocking; on overflow discard the backlog and resync with a snapshot"""
+        try:
+            self._queue.put_nowait((event, data))
+            return True
+        except queue.Full:
+            pass
+        while True:
+            try:
+                self._queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                break
+        self.needs_snapshot = True
+        return False
+
+    def events(self, heartbeat=15.0):
+        """Yield (event, data) pairs; (None, None) after ``heartbeat`` idle seconds"""
+        while not self.closed:
+            try:
+                yield self._queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield None, None
+
+    def sse(self, heartbeat=15.0, retry_ms=5000):
+        """Server-Sent Events body: keep-alive comments between events"""
+        yield f'retry: {retry_ms}\n\n'
+        for event, data in self.events(heartbeat):
+            if event is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broker._unsubscribe(self)
+
+
+def stats_delta(previous, current):
+    """Changed top-level fields plus updated/removed sessions between two snapshots"""
+    delta = {}
+    changed = {key: value for key, value in current.items()
+               if key != 'sessions' and previous.get(key) != value}
+    if changed:
+        delta['changed'] = changed
+
+    before = {session['id']: session for session in previous.get('sessions', [])}
+    after = {session['id']: session for session in current.get('sessions', [])}
+    updated = [session for session_id, session in after.items() if before.get(session_id) != session]
+    removed = [session_id for session_id in before if session_id not in after]
+    if updated or removed:
+        delta['sessions'] = {'updated': updated, 'removed': removed}
+    return delta
+
+
+class StatsBroker:
+    """Computes per-user stats snapshots and fans them out to that user's streams
+
+    ``compute(user_ids)`` returns {user_id: snapshot} for a batch of users and
+    runs on the broker thread inside an app context.
+    """
+
+    def __init__(self, compute, tick_interval=10.0, max_streams=8, queue_size=16):
+        self.compute = compute
+        self.tick_interval = tick_interval
+        self.max_streams = max_streams
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._streams = {}
+        self._stream_count = 0
+        self._dirty = set()
+        self._snapshots = {}
+        self._thread = None
+        self._stopping = False
+        self.computed = 0
+        self.resyncs = 0
+        self.iterations = 0
+        self.errors = 0
+        self._last_success = None
+
+    def stream_count(self):
+        return self._stream_count
+
+    def subscribe(self, user_id):
+        """Open a stream for a user; raises TooManyStreams at the cap"""
+        with self._lock:
+            if self._stream_count >= self.max_streams:
+                raise TooManyStreams(f'{self._stream_count} streams open')
+            stream = StatsStream(self, user_id, self.queue_size)
+            self._streams.setdefault(user_id, set()).add(stream)
+            self._stream_count += 1
+            snapshot = self._snapshots.get(user_id)
+            if snapshot is not None:
+                stream.needs_snapshot = False
+                stream.offer('snapshot', snapshot)
+            else:
+                self._dirty.add(user_id)
+                self._wake.notify()
+        return stream
+
+    def _unsubscribe(self, stream):
+        with self._lock:
+            streams = self._streams.get(stream.user_id)
+            if streams and stream in streams:
+                streams.discard(stream)
+                self._stream_count -= 1
+                if not streams:
+                    del self._streams[stream.user_id]
+                    self._snapshots.pop(stream.user_id, None)
+
+    def notify(self, user_id):
+        """Mark a user's stats as changed; cheap no-op when nobody is watching"""
+        with self._lock:
+            if user_id in self._streams:
+                self._dirty.add(user_id)
+                self._wake.notify()
+
+    def _publish(self, snapshots):
+        with self._lock:
+            for user_id, snapshot in snapshots.items():
+                streams = self._streams.get(user_id)
+                if not streams:
+                    continue
+                previous = self._snapshots.get(user_id)
+                self._snapshots[user_id] = snapshot
+                delta = stats_delta(previous, snapshot) if previous is not None else None
+                for stream in streams:
+                    if stream.needs_snapshot or delta is None:
+                        stream.needs_snapshot = False
+                        stream.offer('snapshot', snapshot)
+                    elif delta and not stream.offer('delta', delta):
+                        # Slow reader: its backlog was discarded, resync it right away
+                        self.resyncs += 1
+                        stream.needs_snapshot = False
+                        stream.offer('snapshot', snapshot)
+
+    def run_once(self, user_ids):
+        snapshots = self.compute(list(user_ids))
+        self.computed += len(snapshots)
+        self._publish(snapshots)
+
+    def start(self, app):
+        """Start the broker thread (once per process)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._loop, args=(app,), daemon=True)
+        self._thread.start()
+        logger.info("Started live stats broker")
+
+    def _loop(self, app):
+        next_tick = time.monotonic() + self.tick_interval
+        while True:
+            with self._lock:
+                while not self._dirty and not self._stopping and time.monotonic() < next_tick:
+                    self._wake.wait(timeout=max(0.0, next_tick - time.monotonic()))
+                if self._stopping:
+                    return
+                if time.monotonic() >= next_tick:
+                    # Tick: everyone with an open stream
+                    user_ids = set(self._streams)
+                    next_tick = time.monotonic() + self.tick_interval
+                else:
+                    user_ids = set(self._dirty)
+                self._dirty.clear()
+
+            if not user_ids:
+                continue
+            try:
+                with app.app_context():
+                    self.run_once(user_ids)
+                self.iterations += 1
+                self._last_success = time.monotonic()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error computing live stats: {e}")
+
+    def health(self):
+        """Broker loop status for monitoring"""
+        last = self._last_success
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'iterations': self.iterations,
+            'errors': self.errors,
+            'seconds_since_success': time.monotonic() - last if last is not None else None,
+            'streams': self._stream_count,
+            'resyncs': self.resyncs
+        }
+
+    def stop(self):
+        with self._lock:
+            self._stopping = True
+            self._wake.notify()
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
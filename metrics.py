@@ -0,0 +1,355 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format
+
+Counters and histograms are updated inline (a dict lookup and a lock per
+observation); anything that already keeps its own counters (caches,
+circuit breakers, background loops) is read through collectors at scrape
+time instead, so it costs nothing on the request path.
+"""
+
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flask import Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from query_counter import get_query_count
+
+# Seconds; tuned for web requests and SQL statements
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+            for labels, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = 'gauge'
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+            for labels, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Observations counted into fixed cumulative buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                # Per-bucket (non-cumulative) counts plus +Inf, then the sum
+                series = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        lines = self.header()
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Metrics plus scrape-time collectors"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collect):
+        """``collect()`` is called at scrape time and returns an iterable of
+        ``(name, kind, documentation, [(labels_dict, value), ...])``"""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        # Several collectors may report the same family (e.g. one per loop); emit each family once
+        families = {}
+        for collect in collectors:
+            try:
+                collected = list(collect())
+            except Exception as e:
+                lines.append(f'# collector {getattr(collect, "__name__", collect)} failed: {_escape(e)}')
+                continue
+            for name, kind, documentation, samples in collected:
+                families.setdefault(name, (kind, documentation, []))[2].extend(samples)
+
+        for name, (kind, documentation, samples) in families.items():
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                if value is None:
+                    continue
+                lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests', ('method', 'endpoint', 'status'))
+REQUEST_QUERIES = REGISTRY.histogram(
+    'http_request_sql_queries', 'SQL statements issued per HTTP request', ('endpoint',), QUERY_COUNT_BUCKETS)
+SQL_DURATION = REGISTRY.histogram(
+    'sql_statement_duration_seconds', 'SQL statement execution time', ('operation',))
+SQL_ERRORS = REGISTRY.counter(
+    'sql_statement_errors_total', 'SQL statements that raised', ('operation',))
+UPSTREAM_DURATION = REGISTRY.histogram(
+    'upstream_fetch_duration_seconds', 'Upstream API fetch time', ('source', 'outcome'), UPSTREAM_BUCKETS)
+
+_install_lock = threading.Lock()
+_sql_installed = False
+
+
+def _operation(statement):
+    """First SQL keyword, upper-cased (SELECT, INSERT, ...), for low-cardinality labels"""
+    head = statement.lstrip()[:16].split(None, 1)
+    return head[0].upper() if head else 'UNKNOWN'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_metrics_started')
+    if started:
+        SQL_DURATION.observe(time.perf_counter() - started.pop(), _operation(statement))
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None:
+        started = conn.info.get('_metrics_started')
+        if started:
+            started.pop()
+    SQL_ERRORS.inc(1, _operation(exception_context.statement or ''))
+
+
+def install_sql_metrics():
+    """Time every statement on every SQLAlchemy engine (idempotent)"""
+    global _sql_installed
+    with _install_lock:
+        if not _sql_installed:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+            _sql_installed = True
+
+
+def install_metrics(flask_app, path='/metrics', token=None):
+    """Time requests, count their SQL statements and serve ``path``
+
+    When ``token`` is set, scrapes must send ``Authorization: Bearer <token>``.
+    """
+    install_sql_metrics()
+
+    @flask_app.before_request
+    def start_request_timer():
+        g._metrics_started = time.perf_counter()
+
+    def observe(status):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            # Route pattern, not the raw path, keeps label cardinality bounded
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUEST_DURATION.observe(time.perf_counter() - started, request.method, endpoint, status)
+            REQUEST_QUERIES.observe(get_query_count(), endpoint)
+
+    @flask_app.after_request
+    def observe_request(response):
+        observe(str(response.status_code))
+        return response
+
+    @flask_app.teardown_request
+    def observe_failed_request(exception):
+        # after_request is skipped when a view raises; those requests become 500s
+        if exception is not None:
+            observe('500')
+
+    def metrics_endpoint():
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+    flask_app.add_url_rule(path, 'metrics', metrics_endpoint)
+
+
+def serve_metrics(host, port, token=None):
+    """Serve the registry at /metrics from a daemon thread, for processes without a Flask app
+
+    Same format and bearer-token check as ``install_metrics``; returns the server.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                status, body, content_type = 404, b'Not found\n', 'text/plain'
+            elif token and self.headers.get('Authorization') != f'Bearer {token}':
+                status, body, content_type = 401, b'Unauthorized\n', 'text/plain'
+            else:
+                status, body, content_type = 200, REGISTRY.render().encode('utf-8'), 'text/plain; version=0.0.4'
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def instrument_price_api(price_api):
+    """Upstream fetch histograms plus cache, breaker and updater state for a CryptoPriceAPI"""
+
+    def observe_fetch(source, seconds, error):
+        UPSTREAM_DURATION.observe(seconds, source, 'error' if error is not None else 'ok')
+
+    price_api.fetcher.listeners.append(observe_fetch)
+
+    def collect():
+        cache = price_api.cache_stats()
+        yield ('price_cache_requests_total', 'counter', 'Price cache lookups by result', [
+            ({'result': 'hit'}, cache['hits']),
+            ({'result': 'stale'}, cache['stale_hits']),
+            ({'result': 'miss'}, cache['misses'])
+        ])
+        yield ('price_cache_coalesced_total', 'counter', 'Lookups that waited on an in-flight load', [({}, cache['coalesced'])])
+        yield ('price_cache_load_errors_total', 'counter', 'Failed price cache loads', [({}, cache['load_errors'])])
+        yield ('price_cache_evictions_total', 'counter', 'Entries evicted from the price cache', [({}, cache['evictions'])])
+        yield ('price_cache_entries', 'gauge', 'Entries in the price cache', [({}, cache['size'])])
+        yield ('price_cache_hit_ratio', 'gauge', 'Share of lookups served from cache', [({}, cache['hit_rate'])])
+
+        sources = price_api.upstream_stats()
+        yield ('upstream_circuit_open', 'gauge', 'Whether a source\'s circuit breaker is open (0.5 half-open)', [
+            ({'source': name}, {'closed': 0, 'half-open': 0.5, 'open': 1}[stats['breaker']])
+            for name, stats in sources.items()
+        ])
+        yield ('upstream_rejected_total', 'counter', 'Requests skipped by an open circuit breaker', [
+            ({'source': name}, stats['rejected_by_breaker']) for name, stats in sources.items()
+        ])
+
+    REGISTRY.register_collector(collect)
+
+
+def register_loop(name, health):
+    """Expose a background loop's ``health()`` dict: running, iterations, errors, seconds_since_success"""
+
+    def collect():
+        status = health()
+        labels = {'loop': name}
+        yield ('background_loop_running', 'gauge', 'Whether the background loop thread is alive', [(labels, int(bool(status.get('running'))))])
+        yield ('background_loop_iterations_total', 'counter', 'Completed background loop iterations', [(labels, status.get('iterations', 0))])
+        yield ('background_loop_errors_total', 'counter', 'Background loop iterations that failed', [(labels, status.get('errors', 0))])
+        yield ('background_loop_seconds_since_success', 'gauge', 'Seconds since the loop last succeeded', [(labels, status.get('seconds_since_success'))])
+        if 'leader' in status:
+            yield ('background_loop_leader', 'gauge', 'Whether this process holds the loop\'s leader lease', [(labels, int(bool(status['leader'])))])
+
+    REGISTRY.register_collector(collect)
@@ -0,0 +1,149 @@
+"""
+Versioned schema migrations for the mining pool database
+
+Usage:
+    python migrations.py upgrade [--target N]
+    python migrations.py current
+    python migrations.py history
+"""
+
+import argparse
+import logging
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select
+from sqlalchemy.schema import CreateTable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_version_metadata = MetaData()
+schema_version = Table(
+    'schema_version', _version_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, default=datetime.utcnow)
+)
+
+BASE_TABLES = ['user', 'worker', 'mining_session', 'payout', 'pool_stats']
+
+
+class Migration:
+    """A single numbered schema change"""
+
+    def __init__(self, version, name, upgrade):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+
+
+def _create_tables(conn, metadata, names):
+    """CREATE TABLE IF NOT EXISTS for the given tables, without their indexes"""
+    for name in names:
+        conn.execute(CreateTable(metadata.tables[name], if_not_exists=True))
+
+
+def _create_indexes(conn, metadata, names):
+    """Create the named model indexes, skipping ones that already exist"""
+    wanted = set(names)
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in wanted:
+                index.create(conn, checkfirst=True)
+                wanted.discard(index.name)
+    if wanted:
+        raise RuntimeError(f"Indexes not defined on the models: {sorted(wanted)}")
+
+
+def initial_schema(conn, metadata):
+    _create_tables(conn, metadata, BASE_TABLES)
+
+
+def hot_filter_indexes(conn, metadata):
+    _create_indexes(conn, metadata, [
+        'ix_worker_status_cryptocurrency',
+        'ix_worker_user_id_name',
+        'ix_mining_session_user_status_crypto',
+        'ix_mining_session_active',
+        'ix_payout_user_created_at'
+    ])
+
+
+def user_coin_rollups(conn, metadata):
+    _create_tables(conn, metadata, ['user_coin_rollup'])
+
+
+def pool_stats_history(conn, metadata):
+    _create_tables(conn, metadata, ['pool_stats_sample', 'pool_stats_rollup'])
+
+
+MIGRATIONS = [
+    Migration(1, 'initial_schema', initial_schema),
+    Migration(2, 'hot_filter_indexes', hot_filter_indexes),
+    Migration(3, 'user_coin_rollups', user_coin_rollups),
+    Migration(4, 'pool_stats_history', pool_stats_history),
+]
+
+
+def current_version(engine):
+    """Highest applied migration version (0 for an unversioned database)"""
+    if not inspect(engine).has_table('schema_version'):
+        return 0
+    with engine.connect() as conn:
+        versions = conn.execute(select(schema_version.c.version)).scalars().all()
+    return max(versions, default=0)
+
+
+def upgrade(engine, metadata, target=None):
+    """Apply pending migrations up to ``target`` (default: latest), one transaction each"""
+    _version_metadata.create_all(engine, checkfirst=True)
+    version = current_version(engine)
+    applied = []
+
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        if target is not None and migration.version > target:
+            break
+
+        started = datetime.utcnow()
+        with engine.begin() as conn:
+            migration.upgrade(conn, metadata)
+            conn.execute(schema_version.insert().values(
+                version=migration.version,
+                name=migration.name,
+                applied_at=datetime.utcnow()
+            ))
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        logger.info(f"Applied migration {migration.version:04d}_{migration.name} in {elapsed:.2f}s")
+        applied.append(migration.version)
+
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mining pool schema migrations')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    upgrade_parser = subparsers.add_parser('upgrade', help='Apply pending migrations')
+    upgrade_parser.add_argument('--target', type=int, default=None, help='Stop at this version')
+    subparsers.add_parser('current', help='Show the applied schema version')
+    subparsers.add_parser('history', help='List known migrations')
+    args = parser.parse_args()
+
+    from app import app, db
+
+    with app.app_context():
+        if args.command == 'upgrade':
+            applied = upgrade(db.engine, db.metadata, target=args.target)
+            print(f"Applied {len(applied)} migration(s); schema at version {current_version(db.engine)}")
+        elif args.command == 'current':
+            print(current_version(db.engine))
+        else:
+            version = current_version(db.engine)
+            for migration in MIGRATIONS:
+                marker = 'x' if migration.version <= version else ' '
+                print(f"[{marker}] {migration.version:04d}_{migration.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Bulk payout engine: turns mined balances into Payout rows and settles them via wallet RPC
+
+Usage:
+    python payout_engine.py run [--coin BTC] [--chunk-size 500] [--wallet-state wallet.json]
+    python payout_engine.py create   # only queue pending payouts
+    python payout_engine.py settle   # only settle pending/processing payouts
+
+A user's balance in a coin is the earnings of their completed sessions minus
+every payout that has not failed, so queued or in-flight payouts are never
+paid twice. Each chunk is its own transaction and settlement goes through
+``processing`` with a per-payout idempotency key, so a crashed run can simply
+be restarted.
+"""
+
+import argparse
+import json
+import logging
+import os
+import secrets
+import statistics
+import threading
+import time
+from datetime import datetime
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Minimum balance (in coins) before a payout is queued
+DEFAULT_THRESHOLDS = {
+    'BTC': 0.001,
+    'ETH': 0.01,
+    'LTC': 0.1,
+    'XMR': 0.1
+}
+
+
+class WalletError(Exception):
+    """Wallet RPC failure; ``definitive`` means the transfer certainly did not happen"""
+
+    def __init__(self, message, definitive=False):
+        super().__init__(message)
+        self.definitive = definitive
+
+
+class WalletRPC:
+    """Interface the payout engine submits transfers through"""
+
+    def send_many(self, cryptocurrency, transfers):
+        """Send ``[(key, address, amount), ...]``; returns {key: transaction_hash}
+
+        Implementations must be idempotent per key: re-sending a key that was
+        already paid returns the original transaction hash.
+        """
+        raise NotImplementedError
+
+    def lookup(self, cryptocurrency, keys):
+        """Return {key: transaction_hash} for keys the wallet has already paid"""
+        raise NotImplementedError
+
+
+class LocalWallet(WalletRPC):
+    """Stand-in wallet that records transfers in memory (optionally a JSON file)"""
+
+    def __init__(self, state_path=None, latency=0.0):
+        self.state_path = state_path
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.transfers = {}
+        if state_path and os.path.exists(state_path):
+            with open(state_path) as f:
+                self.transfers = json.load(f)
+
+    def _save(self):
+        if self.state_path:
+            tmp_path = self.state_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.transfers, f)
+            os.replace(tmp_path, self.state_path)
+
+    def send_many(self, cryptocurrency, transfers):
+        if self.latency:
+            time.sleep(self.latency)
+        # Like a real send-many, the batch is rejected as a whole before anything is sent
+        for key, address, amount in transfers:
+            if not address:
+                raise WalletError(f'Missing address for {key}', definitive=True)
+        with self._lock:
+            txid = secrets.token_hex(32)
+            result = {}
+            for key, address, amount in transfers:
+                existing = self.transfers.get(key)
+                if existing is None:
+                    existing = self.transfers[key] = {
+                        'txid': txid,
+                        'cryptocurrency': cryptocurrency,
+                        'address': address,
+                        'amount': amount
+                    }
+                result[key] = existing['txid']
+            self._save()
+            return result
+
+    def lookup(self, cryptocurrency, keys):
+        with self._lock:
+            return {key: self.transfers[key]['txid'] for key in keys if key in self.transfers}
+
+
+def payout_key(payout_id):
+    """Idempotency key sent to the wallet for a payout row"""
+    return f'payout-{payout_id}'
+
+
+class PayoutStats:
+    """Throughput and per-batch latency of a payout run"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.created = 0
+        self.settled = 0
+        self.failed = 0
+        self.batch_latencies = []
+
+    def record_batch(self, seconds):
+        self.batch_latencies.append(seconds)
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        latencies = sorted(self.batch_latencies)
+        return {
+            'created': self.created,
+            'settled': self.settled,
+            'failed': self.failed,
+            'elapsed_seconds': elapsed,
+            'payouts_per_second': self.settled / elapsed if elapsed > 0 else 0.0,
+            'batches': len(latencies),
+            'batch_latency_p50': statistics.median(latencies) if latencies else 0.0,
+            'batch_latency_p95': latencies[max(0, int(len(latencies) * 0.95) - 1)] if latencies else 0.0,
+            'batch_latency_max': latencies[-1] if latencies else 0.0
+        }
+
+
+class PayoutEngine:
+    """Queue payouts for balances above threshold and settle them in chunks"""
+
+    def __init__(self, flask_app, wallet, thresholds=None, chunk_size=500):
+        from app import db, User, MiningSession, Payout
+        self.flask_app = flask_app
+        self.wallet = wallet
+        self.thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+        self.chunk_size = chunk_size
+        self.db = db
+        self.User = User
+        self.MiningSession = MiningSession
+        self.Payout = Payout
+
+    def _user_pages(self):
+        """Yield pages of (user_id, wallet_address), keyset-paginated by id"""
+        User = self.User
+        last_id = 0
+        while True:
+            rows = self.db.session.execute(
+                self.db.select(User.id, User.wallet_address)
+                .where(User.id > last_id, User.wallet_address.isnot(None), User.wallet_address != '')
+                .order_by(User.id)
+                .limit(self.chunk_size)
+            ).all()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+
+    def _balances(self, user_ids, cryptos):
+        """Unpaid balance per (user_id, coin) for one page of users"""
+        MiningSession, Payout, func = self.MiningSession, self.Payout, self.db.func
+
+        earned = self.db.session.execute(
+            self.db.select(MiningSession.user_id, MiningSession.cryptocurrency, func.sum(MiningSession.earnings))
+            .where(MiningSession.user_id.in_(user_ids),
+                   MiningSession.status == 'completed',
+                   MiningSession.cryptocurrency.in_(cryptos))
+            .group_by(MiningSession.user_id, MiningSession.cryptocurrency)
+        ).all()
+        paid = dict(((user_id, crypto), total) for user_id, crypto, total in self.db.session.execute(
+            self.db.select(Payout.user_id, Payout.cryptocurrency, func.sum(Payout.amount))
+            .where(Payout.user_id.in_(user_ids),
+                   Payout.status != 'failed',
+                   Payout.cryptocurrency.in_(cryptos))
+            .group_by(Payout.user_id, Payout.cryptocurrency)
+        ))
+
+        return {
+            (user_id, crypto): (total or 0.0) - (paid.get((user_id, crypto)) or 0.0)
+            for user_id, crypto, total in earned
+        }
+
+    def create_payouts(self, cryptos=None, stats=None):
+        """Queue a pending Payout for every balance at or above its coin's threshold"""
+        cryptos = list(cryptos or self.thresholds)
+        stats = stats or PayoutStats()
+
+        with self.flask_app.app_context():
+            for page in self._user_pages():
+                started = time.perf_counter()
+                wallets = dict(page)
+                balances = self._balances(list(wallets), cryptos)
+
+                payouts = [
+                    {
+                        'user_id': user_id,
+                        'amount': balance,
+                        'cryptocurrency': crypto,
+                        'wallet_address': wallets[user_id],
+                        'status': 'pending',
+                        'created_at': datetime.utcnow()
+                    }
+                    for (user_id, crypto), balance in balances.items()
+                    if balance >= self.thresholds.get(crypto, float('inf'))
+                ]
+                if payouts:
+                    self.db.session.execute(self.db.insert(self.Payout), payouts)
+                self.db.session.commit()
+                stats.created += len(payouts)
+                self.db.session.expunge_all()
+                if payouts:
+                    stats.record_batch(time.perf_counter() - started)
+
+        return stats
+
+    def _payout_pages(self, status, crypto):
+        Payout = self.Payout
+        last_id = 0
+        while True:
+            rows = self.db.session.execute(
+                self.db.select(Payout.id, Payout.wallet_address, Payout.amount)
+                .where(Payout.id > last_id, Payout.status == status, Payout.cryptocurrency == crypto)
+                .order_by(Payout.id)
+                .limit(self.chunk_size)
+            ).all()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield rows
+
+    def _mark(self, payout_ids, values):
+        if payout_ids:
+            self.db.session.execute(
+                self.db.update(self.Payout).where(self.Payout.id.in_(payout_ids)).values(**values)
+            )
+
+    def _complete(self, txids):
+        """Record wallet transaction hashes for settled payouts (one UPDATE per txid)"""
+        by_txid = {}
+        for payout_id, txid in txids.items():
+            by_txid.setdefault(txid, []).append(payout_id)
+        now = datetime.utcnow()
+        for txid, payout_ids in by_txid.items():
+            self._mark(payout_ids, {'status': 'completed', 'transaction_hash': txid, 'processed_at': now})
+
+    def _recover_in_flight(self, crypto, stats):
+        """Resolve payouts left in ``processing`` by a crashed run"""
+        for rows in self._payout_pages('processing', crypto):
+            keys = {payout_key(payout_id): payout_id for payout_id, _, _ in rows}
+            paid = self.wallet.lookup(crypto, list(keys))
+            self._complete({keys[key]: txid for key, txid in paid.items()})
+            # Anything the wallet never saw goes back to the queue
+            self._mark([payout_id for key, payout_id in keys.items() if key not in paid], {'status': 'pending'})
+            self.db.session.commit()
+            stats.settled += len(paid)
+
+    def settle_payouts(self, cryptos=None, stats=None):
+        """Send pending payouts through the wallet in chunks and record the results"""
+        cryptos = list(cryptos or self.thresholds)
+        stats = stats or PayoutStats()
+
+        with self.flask_app.app_context():
+            for crypto in cryptos:
+                self._recover_in_flight(crypto, stats)
+
+                for rows in self._payout_pages('pending', crypto):
+                    started = time.perf_counter()
+                    payout_ids = [payout_id for payout_id, _, _ in rows]
+
+                    # Claim the chunk before talking to the wallet
+                    self._mark(payout_ids, {'status': 'processing'})
+                    self.db.session.commit()
+
+                    transfers = [(payout_key(payout_id), address, amount) for payout_id, address, amount in rows]
+                    try:
+                        paid = self.wallet.send_many(crypto, transfers)
+                    except WalletError as e:
+                        if e.definitive:
+                            self._mark(payout_ids, {'status': 'failed', 'processed_at': datetime.utcnow()})
+                            self.db.session.commit()
+                            stats.failed += len(payout_ids)
+                        logger.error(f"Wallet rejected {crypto} batch of {len(rows)}: {e}")
+                        continue
+                    except Exception as e:
+                        # Outcome unknown: leave the chunk in processing for recovery
+                        logger.error(f"Wallet error on {crypto} batch of {len(rows)}: {e}")
+                        continue
+
+                    keys = {payout_key(payout_id): payout_id for payout_id in payout_ids}
+                    self._complete({keys[key]: txid for key, txid in paid.items() if key in keys})
+                    self.db.session.commit()
+                    stats.settled += len(paid)
+                    stats.record_batch(time.perf_counter() - started)
+
+        return stats
+
+    def run(self, cryptos=None):
+        """Create then settle payouts; returns the run's stats"""
+        stats = PayoutStats()
+        self.create_payouts(cryptos, stats)
+        self.settle_payouts(cryptos, stats)
+        return stats
+
+
+def parse_thresholds(values):
+    thresholds = {}
+    for value in values or []:
+        coin, _, amount = value.partition('=')
+        thresholds[coin.upper()] = float(amount)
+    return thresholds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CryptoMine Pro payout engine')
+    parser.add_argument('command', choices=['run', 'create', 'settle'])
+    parser.add_argument('--coin', action='append', help='Limit to these coins (repeatable)')
+    parser.add_argument('--threshold', action='append', help='COIN=AMOUNT minimum payout (repeatable)')
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--wallet-state', default='local_wallet.json',
+                        help='State file for the local stand-in wallet')
+    args = parser.parse_args()
+
+    from app import app
+
+    engine = PayoutEngine(
+        app,
+        LocalWallet(args.wallet_state),
+        thresholds=parse_thresholds(args.threshold),
+        chunk_size=args.chunk_size
+    )
+    cryptos = [coin.upper() for coin in args.coin] if args.coin else None
+
+    if args.command == 'create':
+        stats = engine.create_payouts(cryptos)
+    elif args.command == 'settle':
+        stats = engine.settle_payouts(cryptos)
+    else:
+        stats = engine.run(cryptos)
+
+    print(json.dumps(stats.report(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Incrementally maintained pool aggregates (active miners and hashrate per coin)
+"""
+
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def worker_state(worker):
+    """Aggregate-relevant state of a worker: (crypto, hashrate) if online, else None"""
+    if worker is None or worker.status != 'online':
+        return None
+    return (worker.cryptocurrency, worker.hashrate or 0.0)
+
+
+class PoolAggregates:
+    """Per-coin counters updated on worker transitions and served as a snapshot
+
+    Writers call ``worker_changed(before, after)`` after committing a worker
+    state change; readers get a copy of the counters without touching the
+    database. A reconciliation pass periodically replaces the counters with
+    the values recomputed from the tables, correcting drift from other
+    processes, crashed requests or direct SQL updates.
+    """
+
+    def __init__(self, cryptos, load_totals, load_metadata, persist=None, reconcile_interval=60):
+        self.cryptos = list(cryptos)
+        self.load_totals = load_totals
+        self.load_metadata = load_metadata
+        self.persist = persist
+        self.reconcile_interval = reconcile_interval
+
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._totals = {crypto: {'active_miners': 0, 'pool_hashrate': 0.0} for crypto in self.cryptos}
+        self._metadata = {}
+        self._last_reconciled = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.reconcile_count = 0
+        self.reconcile_errors = 0
+        self.last_drift = {}
+        # Called with no arguments whenever the served snapshot may have changed
+        self.listeners = []
+
+    def _apply(self, state, sign):
+        if state is None:
+            return
+        crypto, hashrate = state
+        totals = self._totals.setdefault(crypto, {'active_miners': 0, 'pool_hashrate': 0.0})
+        totals['active_miners'] = max(0, totals['active_miners'] + sign)
+        totals['pool_hashrate'] = max(0.0, totals['pool_hashrate'] + sign * hashrate)
+
+    def worker_changed(self, before, after):
+        """Apply a worker transition given its ``worker_state`` before and after"""
+        if before == after:
+            return
+        with self._lock:
+            self._apply(before, -1)
+            self._apply(after, 1)
+        self._notify()
+
+    def reconcile(self, persist=True):
+        """Recompute counters from the database and replace the in-memory values"""
+        totals = self.load_totals()
+        metadata = self.load_metadata()
+
+        with self._lock:
+            drift = {}
+            for crypto in self.cryptos:
+                fresh = totals.get(crypto, {'active_miners': 0, 'pool_hashrate': 0.0})
+                current = self._totals.get(crypto, {'active_miners': 0, 'pool_hashrate': 0.0})
+                if fresh != current:
+                    drift[crypto] = {
+                        'active_miners': fresh['active_miners'] - current['active_miners'],
+                        'pool_hashrate': fresh['pool_hashrate'] - current['pool_hashrate']
+                    }
+                self._totals[crypto] = dict(fresh)
+            self._metadata = metadata
+            self._last_reconciled = time.monotonic()
+            self.reconcile_count += 1
+            self.last_drift = drift
+
+        self._notify()
+
+        if drift and self.reconcile_count > 1:
+            logger.info(f"Pool aggregate drift corrected: {drift}")
+
+        if persist and self.persist:
+            self.persist(self.totals())
+
+    def _notify(self):
+        for listener in self.listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Pool aggregate listener failed: {e}")
+
+    def totals(self):
+        """Copy of the current per-coin counters"""
+        with self._lock:
+            return {crypto: dict(values) for crypto, values in self._totals.items()}
+
+    def snapshot(self):
+        """Read-only per-coin pool stats for coins that have pool metadata"""
+        if self._last_reconciled is None:
+            # First reader seeds the counters; everyone else waits for it
+            with self._reconcile_lock:
+                if self._last_reconciled is None:
+                    self.reconcile(persist=False)
+
+        with self._lock:
+            stats = {}
+            for crypto in self.cryptos:
+                meta = self._metadata.get(crypto)
+                if meta is None:
+                    continue
+                totals = self._totals.get(crypto, {'active_miners': 0, 'pool_hashrate': 0.0})
+                stats[crypto] = dict(meta, pool_hashrate=totals['pool_hashrate'],
+                                     active_miners=totals['active_miners'])
+            return stats
+
+    def start(self, app):
+        """Start the periodic reconciliation thread (once per process)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._reconcile_loop, args=(app,), daemon=True)
+        self._thread.start()
+        logger.info("Started pool aggregate reconciliation")
+
+    def _reconcile_loop(self, app):
+        while not self._stop.wait(self.reconcile_interval):
+            try:
+                with app.app_context():
+                    with self._reconcile_lock:
+                        self.reconcile()
+            except Exception as e:
+                self.reconcile_errors += 1
+                logger.error(f"Error reconciling pool aggregates: {e}")
+
+    def health(self):
+        """Reconciliation loop status for monitoring"""
+        last = self._last_reconciled
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'iterations': self.reconcile_count,
+            'errors': self.reconcile_errors,
+            'seconds_since_success': time.monotonic() - last if last is not None else None
+        }
+
+    def stop(self):
+        """Stop the reconciliation thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,244 @@
+"""
+Pool statistics history: raw samples plus 1m/1h/1d rollups, each with its own retention
+
+Every sample is written once to the raw table and folded into one bucket
+per rollup resolution (sample count, sum, min and max of each metric) in
+the same transaction, so rollups never need a batch job. Range queries
+read the finest resolution that fits the requested number of points,
+which keeps a one-year chart to a few hundred rows.
+
+Timestamps are integer Unix seconds. Samples are aligned to the sample
+interval and inserted with ON CONFLICT DO NOTHING, so several processes
+recording the same tick write it once.
+"""
+
+import threading
+import time
+import logging
+
+from sqlalchemy import and_, delete, func, select
+
+from user_rollups import dialect_insert, executor_dialect
+
+logger = logging.getLogger(__name__)
+
+METRICS = ['pool_hashrate', 'active_miners', 'network_hashrate', 'difficulty']
+
+
+class Resolution:
+    """One storage level: bucket width and how long its points are kept (None = forever)"""
+
+    def __init__(self, name, step, retention):
+        self.name = name
+        self.step = step
+        self.retention = retention
+
+
+ROLLUPS = [
+    Resolution('1m', 60, 14 * 86400),
+    Resolution('1h', 3600, 400 * 86400),
+    Resolution('1d', 86400, None),
+]
+RAW_RETENTION = 2 * 86400
+
+
+def _least(dialect_name, a, b):
+    return func.least(a, b) if dialect_name == 'postgresql' else func.min(a, b)
+
+
+def _greatest(dialect_name, a, b):
+    return func.greatest(a, b) if dialect_name == 'postgresql' else func.max(a, b)
+
+
+class PoolTimeSeries:
+    """Reads and writes pool history through the caller's connection or session
+
+    ``sample_table`` has (cryptocurrency, ts, *METRICS); ``rollup_table`` has
+    (resolution, cryptocurrency, bucket, samples, and ``<metric>_sum``,
+    ``<metric>_min``, ``<metric>_max`` for each metric).
+    """
+
+    def __init__(self, sample_table, rollup_table, interval=30, raw_retention=RAW_RETENTION, rollups=ROLLUPS):
+        self.samples = sample_table
+        self.rollups = rollup_table
+        self.interval = interval
+        self.raw = Resolution('raw', interval, raw_retention)
+        self.resolutions = [self.raw] + list(rollups)
+        self.by_name = {resolution.name: resolution for resolution in self.resolutions}
+
+    def align(self, ts):
+        return int(ts) - int(ts) % self.interval
+
+    def record(self, executor, stats, at=None):
+        """Write one sample per coin from ``stats`` ({crypto: {metric: value}}); returns coins written"""
+        ts = self.align(at if at is not None else time.time())
+        dialect_name = executor_dialect(executor)
+        insert = dialect_insert(dialect_name)
+        written = []
+
+        for crypto, values in stats.items():
+            row = {metric: float(values.get(metric) or 0) for metric in METRICS}
+            result = executor.execute(
+                insert(self.samples).values(cryptocurrency=crypto, ts=ts, **row).on_conflict_do_nothing()
+            )
+            if result.rowcount == 0:
+                # Another process already recorded this tick
+                continue
+            written.append(crypto)
+
+            for resolution in self.resolutions[1:]:
+                bucket = ts - ts % resolution.step
+                bucket_row = dict(resolution=resolution.name, cryptocurrency=crypto, bucket=bucket, samples=1)
+                for metric in METRICS:
+                    bucket_row[f'{metric}_sum'] = row[metric]
+                    bucket_row[f'{metric}_min'] = row[metric]
+                    bucket_row[f'{metric}_max'] = row[metric]
+                statement = insert(self.rollups).values(**bucket_row)
+                excluded = statement.excluded
+                table = self.rollups.c
+                update = {'samples': table.samples + 1}
+                for metric in METRICS:
+                    update[f'{metric}_sum'] = table[f'{metric}_sum'] + excluded[f'{metric}_sum']
+                    update[f'{metric}_min'] = _least(dialect_name, table[f'{metric}_min'], excluded[f'{metric}_min'])
+                    update[f'{metric}_max'] = _greatest(dialect_name, table[f'{metric}_max'], excluded[f'{metric}_max'])
+                executor.execute(statement.on_conflict_do_update(
+                    index_elements=[table.resolution, table.cryptocurrency, table.bucket],
+                    set_=update
+                ))
+        return written
+
+    def prune(self, executor, now=None):
+        """Delete points older than each resolution's retention; returns rows deleted"""
+        now = int(now if now is not None else time.time())
+        deleted = 0
+        if self.raw.retention is not None:
+            deleted += executor.execute(
+                delete(self.samples).where(self.samples.c.ts < now - self.raw.retention)
+            ).rowcount
+        for resolution in self.resolutions[1:]:
+            if resolution.retention is None:
+                continue
+            deleted += executor.execute(delete(self.rollups).where(and_(
+                self.rollups.c.resolution == resolution.name,
+                self.rollups.c.bucket < now - resolution.retention
+            ))).rowcount
+        return deleted
+
+    def pick_resolution(self, start, end, max_points, now=None):
+        """Finest resolution that still holds ``start`` and fits the window in ``max_points``"""
+        now = now if now is not None else time.time()
+        for resolution in self.resolutions:
+            if resolution.retention is not None and start < now - resolution.retention:
+                continue
+            if (end - start) / resolution.step <= max_points:
+                return resolution
+        return self.resolutions[-1]
+
+    def query(self, executor, crypto, start, end, max_points=500, resolution=None):
+        """Points for one coin in [start, end) as columns: {'resolution', 'step', 't', 'avg', 'min', 'max'}"""
+        start, end = int(start), int(end)
+        resolution = self.by_name[resolution] if resolution else self.pick_resolution(start, end, max_points)
+        columns = {'t': [], 'avg': {metric: [] for metric in METRICS},
+                   'min': {metric: [] for metric in METRICS}, 'max': {metric: [] for metric in METRICS}}
+
+        if resolution is self.raw:
+            table = self.samples.c
+            rows = executor.execute(
+                select(table.ts, *[table[metric] for metric in METRICS])
+                .where(table.cryptocurrency == crypto, table.ts >= start, table.ts < end)
+                .order_by(table.ts)
+            )
+            for ts, *values in rows:
+                columns['t'].append(ts)
+                for metric, value in zip(METRICS, values):
+                    for kind in ('avg', 'min', 'max'):
+                        columns[kind][metric].append(value)
+        else:
+            table = self.rollups.c
+            selected = [table.bucket, table.samples]
+            for metric in METRICS:
+                selected += [table[f'{metric}_sum'], table[f'{metric}_min'], table[f'{metric}_max']]
+            rows = executor.execute(
+                select(*selected)
+                .where(table.resolution == resolution.name, table.cryptocurrency == crypto,
+                       table.bucket >= start - start % resolution.step, table.bucket < end)
+                .order_by(table.bucket)
+            )
+            for bucket, samples, *values in rows:
+                columns['t'].append(bucket)
+                for i, metric in enumerate(METRICS):
+                    total, low, high = values[3 * i:3 * i + 3]
+                    columns['avg'][metric].append(total / samples if samples else None)
+                    columns['min'][metric].append(low)
+                    columns['max'][metric].append(high)
+
+        return dict(columns, resolution=resolution.name, step=resolution.step, cryptocurrency=crypto)
+
+
+class PoolHistoryRecorder:
+    """Background thread that calls ``record(at)`` every ``interval`` seconds and ``prune(now)`` periodically
+
+    Both callbacks run inside an app context.
+    """
+
+    def __init__(self, record, prune, interval=30, prune_interval=600):
+        self.record = record
+        self.prune = prune
+        self.interval = interval
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_success = None
+        self._last_prune = None
+        self.iterations = 0
+        self.errors = 0
+
+    def start(self, app):
+        """Start the recorder thread (once per process)"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, args=(app,), daemon=True)
+        self._thread.start()
+        logger.info("Started pool history recorder")
+
+    def run_once(self, now=None):
+        now = now if now is not None else time.time()
+        self.record(now)
+        if self._last_prune is None or now - self._last_prune >= self.prune_interval:
+            self.prune(now)
+            self._last_prune = now
+
+    def _loop(self, app):
+        while True:
+            # Wake on interval boundaries so every process targets the same aligned tick
+            if self._stop.wait(self.interval - time.time() % self.interval):
+                return
+            try:
+                with app.app_context():
+                    self.run_once()
+                self.iterations += 1
+                self._last_success = time.monotonic()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error recording pool history: {e}")
+
+    def health(self):
+        """Recorder loop status for monitoring"""
+        last = self._last_success
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'iterations': self.iterations,
+            'errors': self.errors,
+            'seconds_since_success': time.monotonic() - last if last is not None else None
+        }
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
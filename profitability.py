@@ -0,0 +1,199 @@
+"""
+Profitability sweeps: whole hashrate x power x electricity-cost grids in one NumPy pass
+
+Usage:
+    python profitability.py --crypto BTC --hashrate 10:1000:100 --power 500:3500:31 \
+        --electricity 0.02:0.30:29 --rig-cost 2500 --format csv --output sweep.csv
+    python profitability.py --crypto ETH --hashrate 50,100,200 --power 1500 \
+        --electricity 0.05:0.25:5 --break-even
+
+Axes are comma-separated values or ``start:stop:num`` (inclusive, evenly
+spaced). Rows are streamed in hashrate-major, then power, then
+electricity-cost order.
+"""
+
+import argparse
+import io
+import json
+import logging
+import sys
+
+import numpy as np
+
+from earnings_engine import profitability_grid
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLUMNS = ['hashrate', 'power_watts', 'electricity_cost', 'daily_coins',
+           'daily_revenue', 'daily_cost', 'daily_profit', 'roi_days']
+CHUNK_ROWS = 20000
+
+
+def _linspace(start, stop, num, max_size):
+    num = int(num)
+    if max_size is not None and num > max_size:
+        raise ValueError(f'Axis of {num} values exceeds {max_size}')
+    return np.linspace(float(start), float(stop), num)
+
+
+def parse_axis(spec, max_size=None):
+    """Axis values from a list, a number, ``{'start', 'stop', 'num'}``, ``'a,b,c'`` or ``'start:stop:num'``"""
+    if isinstance(spec, dict):
+        values = _linspace(spec['start'], spec['stop'], spec.get('num', 50), max_size)
+    elif isinstance(spec, (list, tuple)):
+        values = np.array([float(value) for value in spec], dtype=np.float64)
+    elif isinstance(spec, (int, float)):
+        values = np.array([float(spec)])
+    elif isinstance(spec, str) and ':' in spec:
+        start, stop, num = spec.split(':')
+        values = _linspace(start, stop, num, max_size)
+    elif isinstance(spec, str):
+        values = np.array([float(value) for value in spec.split(',') if value.strip()], dtype=np.float64)
+    else:
+        raise ValueError(f'Unsupported axis: {spec!r}')
+    if max_size is not None and values.size > max_size:
+        raise ValueError(f'Axis of {values.size} values exceeds {max_size}')
+    if values.size == 0 or not np.all(np.isfinite(values)) or np.any(values < 0):
+        raise ValueError('Axes need at least one finite, non-negative value')
+    return values
+
+
+def parse_rig_cost(value):
+    """Rig price in USD for ROI; must be finite and positive or break-even days are meaningless"""
+    rig_cost = float(value)
+    if not np.isfinite(rig_cost) or rig_cost <= 0:
+        raise ValueError('rig_cost must be a finite, positive number')
+    return rig_cost
+
+
+def grid_size(grid):
+    return grid['hashrates'].size * grid['power_watts'].size * grid['electricity_costs'].size
+
+
+def iter_chunks(grid, chunk_rows=CHUNK_ROWS):
+    """Column blocks of up to ``chunk_rows`` rows: one 2-D array per chunk in COLUMNS order"""
+    shape = (grid['hashrates'].size, grid['power_watts'].size, grid['electricity_costs'].size)
+    total = grid_size(grid)
+    profit = grid['daily_profit'].ravel()
+    roi = grid['roi_days'].ravel()
+    for start in range(0, total, chunk_rows):
+        flat = np.arange(start, min(start + chunk_rows, total))
+        h, p, e = np.unravel_index(flat, shape)
+        yield np.column_stack([
+            grid['hashrates'][h],
+            grid['power_watts'][p],
+            grid['electricity_costs'][e],
+            grid['daily_coins'][h],
+            grid['daily_revenue'][h],
+            grid['daily_cost'][p, e],
+            profit[flat],
+            roi[flat]
+        ])
+
+
+def _format(block, fmt):
+    buffer = io.StringIO()
+    np.savetxt(buffer, block, fmt=fmt)
+    return buffer.getvalue()
+
+
+def iter_csv(grid, chunk_rows=CHUNK_ROWS):
+    """CSV text chunks with a header row; unprofitable rows have an empty roi_days"""
+    yield ','.join(COLUMNS) + '\n'
+    fmt = ','.join(['%.10g'] * len(COLUMNS))
+    for block in iter_chunks(grid, chunk_rows):
+        # roi_days is the last column
+        yield _format(block, fmt).replace(',inf\n', ',\n')
+
+
+def iter_ndjson(grid, chunk_rows=CHUNK_ROWS):
+    """Newline-delimited JSON chunks, one object per grid point; unprofitable rows have roi_days null"""
+    fmt = '{' + ','.join(f'"{column}":%.10g' for column in COLUMNS) + '}'
+    for block in iter_chunks(grid, chunk_rows):
+        yield _format(block, fmt).replace('"roi_days":inf}', '"roi_days":null}')
+
+
+def _finite_or_none(values):
+    return [float(value) if np.isfinite(value) else None for value in np.ravel(values)]
+
+
+def break_even_summary(grid):
+    """Break-even contours and ROI extremes, JSON-ready
+
+    ``break_even_hashrate[p][e]`` is the hashrate at which revenue covers
+    power cost; ``break_even_electricity_cost[h][p]`` the electricity price
+    at which it no longer does. ``best`` is the grid point with the
+    shortest payback.
+    """
+    roi = grid['roi_days']
+    profitable = np.isfinite(roi)
+    summary = {
+        'price': grid['price'],
+        'rig_cost': grid['rig_cost'],
+        'hashrates': grid['hashrates'].tolist(),
+        'power_watts': grid['power_watts'].tolist(),
+        'electricity_costs': grid['electricity_costs'].tolist(),
+        'points': grid_size(grid),
+        'profitable_points': int(profitable.sum()),
+        'break_even_hashrate': [_finite_or_none(row) for row in grid['break_even_hashrate']],
+        'break_even_electricity_cost': [_finite_or_none(row) for row in grid['break_even_electricity_cost']],
+        'best': None
+    }
+    if profitable.any():
+        h, p, e = np.unravel_index(int(np.argmin(roi)), roi.shape)
+        summary['best'] = {
+            'hashrate': float(grid['hashrates'][h]),
+            'power_watts': float(grid['power_watts'][p]),
+            'electricity_cost': float(grid['electricity_costs'][e]),
+            'daily_profit': float(grid['daily_profit'][h, p, e]),
+            'roi_days': float(roi[h, p, e])
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mining profitability sweep')
+    parser.add_argument('--crypto', default='BTC')
+    parser.add_argument('--hashrate', required=True, help='Hashrates (TH/s): a,b,c or start:stop:num')
+    parser.add_argument('--power', required=True, help='Rig power draw (W): a,b,c or start:stop:num')
+    parser.add_argument('--electricity', required=True, help='Electricity cost ($/kWh): a,b,c or start:stop:num')
+    parser.add_argument('--rig-cost', type=parse_rig_cost, default=1000.0, help='Rig price in USD for ROI')
+    parser.add_argument('--price', type=float, default=None, help='Coin price in USD (default: fetch once)')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    parser.add_argument('--break-even', action='store_true', help='Print break-even contours and the best ROI as JSON instead of rows')
+    parser.add_argument('--output', default='-', help='Output file (default: stdout)')
+    args = parser.parse_args()
+
+    price = args.price
+    if price is None:
+        from crypto_api import price_api
+        price = price_api.get_crypto_prices([args.crypto]).get(args.crypto, {}).get('price')
+        if not price:
+            parser.error(f'Could not fetch a {args.crypto} price; pass --price')
+
+    grid = profitability_grid(
+        args.crypto,
+        parse_axis(args.hashrate),
+        parse_axis(args.power),
+        parse_axis(args.electricity),
+        price,
+        args.rig_cost
+    )
+    logger.info(f"Evaluated {grid_size(grid)} points at {args.crypto} = ${price:,.2f}")
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        if args.break_even:
+            json.dump(break_even_summary(grid), output, indent=2)
+            output.write('\n')
+        else:
+            for chunk in (iter_csv(grid) if args.format == 'csv' else iter_ndjson(grid)):
+                output.write(chunk)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
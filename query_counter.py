@@ -0,0 +1,75 @@
+"""
+SQL statement counting for request-level query budgets
+"""
+
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_install_lock = threading.Lock()
+_installed = False
+_local = threading.local()
+
+
+class QueryCounter:
+    """Counts SQL statements executed on the current thread while active"""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def record(self, statement):
+        self.count += 1
+        self.statements.append(statement)
+
+
+def _active_counters():
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        counters = _local.counters = []
+    return counters
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """Engine event hook: bump the per-request count and any active counters"""
+    if has_app_context():
+        g._query_count = g.get('_query_count', 0) + 1
+    for counter in _active_counters():
+        counter.record(statement)
+
+
+def install_query_counter():
+    """Attach the counting hook to every SQLAlchemy engine (idempotent)"""
+    global _installed
+    with _install_lock:
+        if not _installed:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            _installed = True
+
+
+def reset_query_count():
+    """Reset the per-request statement count"""
+    if has_app_context():
+        g._query_count = 0
+
+
+def get_query_count():
+    """Number of SQL statements issued in the current app/request context"""
+    if has_app_context():
+        return g.get('_query_count', 0)
+    return 0
+
+
+@contextmanager
+def count_queries():
+    """Count statements issued inside the block, e.g. to assert a query budget"""
+    counter = QueryCounter()
+    counters = _active_counters()
+    counters.append(counter)
+    try:
+        yield counter
+    finally:
+        counters.remove(counter)
@@ -75,7 +75,7 @@ def deploy_to_heroku():
         
         # Initialize database
         print_info("Initializing database...")
-        subprocess.run(['heroku', 'run', 'python', '-c', 'from app import db; db.create_all()'], check=True)
+        subprocess.run(['heroku', 'run', 'python', 'migrations.py', 'upgrade'], check=True)
         
         # Open the app
         print_success(f"Deployment successful! Your app is live at: https://{app_name}.herokuapp.com")
@@ -129,7 +129,7 @@ def deploy_to_render():
     print("4. Connect your GitHub repository")
     print("5. Use these settings:")
     print("   - Build Command: pip install -r requirements-prod.txt")
-    print("   - Start Command: gunicorn app:app")
+    print("   - Start Command: gunicorn app:app --worker-class gthread --threads 16")
     print("   - Environment: Python 3.11")
     
     if input("Open Render in browser? (y/n): ").lower() == 'y':
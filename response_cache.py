@@ -0,0 +1,124 @@
+"""
+Short-lived cache of rendered JSON responses with strong ETags and Cache-Control
+
+A cached route renders its body once per key and TTL; every later request
+for that key gets the same bytes, a strong ETag derived from them, and a
+``Cache-Control: public`` header so a CDN or reverse proxy can answer
+repeat requests itself. GET/HEAD requests whose ``If-None-Match`` matches
+get an empty 304. Only 200 responses are cached.
+"""
+
+import functools
+import hashlib
+import threading
+import logging
+
+from flask import Response, make_response, request
+
+from metrics import REGISTRY
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse:
+    """Rendered body plus the headers needed to replay it"""
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+
+
+class ResponseCache:
+    """Keyed, size-bounded TTL cache of rendered responses"""
+
+    def __init__(self, maxsize=1024):
+        self._cache = TTLCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        # endpoint -> {'hit': n, 'miss': n, 'not_modified': n}
+        self.counts = {}
+        # Bumped by invalidate(endpoint); older entries are never read again and age out
+        self._generations = {}
+
+    def __len__(self):
+        return len(self._cache)
+
+    def _count(self, endpoint, result):
+        with self._lock:
+            counts = self.counts.setdefault(endpoint, {'hit': 0, 'miss': 0, 'not_modified': 0})
+            counts[result] += 1
+
+    def invalidate(self, endpoint=None):
+        """Forget every cached response of one view (by function name), or of all views"""
+        if endpoint is None:
+            self._cache.invalidate()
+            return
+        with self._lock:
+            self._generations[endpoint] = self._generations.get(endpoint, 0) + 1
+
+    def cached(self, ttl, key=None, max_age=None, stale_while_revalidate=0):
+        """Decorator for a view returning JSON
+
+        ``key()`` returns the request's cache key (a hashable), or None to
+        bypass the cache (e.g. for invalid input); without it the cache
+        holds one entry per view. ``max_age`` (default ``ttl``) goes into
+        Cache-Control for downstream caches on GET and HEAD responses;
+        POST answers are cached here but never marked public.
+        """
+        max_age = ttl if max_age is None else max_age
+        cache_control = f'public, max-age={int(max_age)}'
+        if stale_while_revalidate:
+            cache_control += f', stale-while-revalidate={int(stale_while_revalidate)}'
+
+        def decorator(view):
+            endpoint = view.__name__
+
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                cache_key = key() if key is not None else ()
+                if cache_key is None:
+                    return view(*args, **kwargs)
+                cache_key = (endpoint, self._generations.get(endpoint, 0), cache_key)
+
+                entry = self._cache.get(cache_key)
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    entry = CachedResponse(response.get_data(), response.mimetype)
+                    self._cache.set(cache_key, entry, ttl)
+                    result = 'miss'
+                else:
+                    result = 'hit'
+
+                response = Response(entry.body, mimetype=entry.mimetype)
+                response.set_etag(entry.etag)
+                if request.method in ('GET', 'HEAD'):
+                    response.headers['Cache-Control'] = cache_control
+                # Turns into an empty 304 when If-None-Match matches (GET/HEAD only)
+                response.make_conditional(request)
+                self._count(endpoint, 'not_modified' if response.status_code == 304 else result)
+                return response
+
+            return wrapper
+
+        return decorator
+
+    def stats(self):
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self.counts.items()}
+
+
+def register_metrics(cache):
+    """Per-endpoint hit/miss/304 counters and size for a ResponseCache"""
+
+    def collect():
+        yield ('response_cache_requests_total', 'counter', 'Cached route requests by result', [
+            ({'endpoint': endpoint, 'result': result}, count)
+            for endpoint, counts in cache.stats().items()
+            for result, count in counts.items()
+        ])
+        yield ('response_cache_entries', 'gauge', 'Rendered responses held in the cache', [({}, len(cache))])
+
+    REGISTRY.register_collector(collect)
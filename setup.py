@@ -18,7 +18,8 @@ def install_requirements():
         "Flask-Login==0.6.3",
         "requests==2.31.0",
         "python-dotenv==1.0.0",
-        "Werkzeug==2.3.7"
+        "Werkzeug==2.3.7",
+        "numpy==1.26.4"
     ]
     
     for requirement in requirements:
@@ -0,0 +1,229 @@
+"""
+Write-behind buffering for per-worker share counters
+"""
+
+import atexit
+import threading
+import time
+import logging
+from datetime import datetime
+
+from sqlalchemy import case
+
+from metrics import REGISTRY
+from user_rollups import increment_rollups
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_WORKERS = REGISTRY.histogram(
+    'share_buffer_flush_batch_workers', 'Workers written per share counter flush', (),
+    (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+
+
+class ShareBuffer:
+    """Accumulate share increments in memory and flush them as bulk UPDATEs
+
+    ``record()`` only touches a dict under a lock. Increments are written
+    with one ``UPDATE worker SET shares_submitted = shares_submitted + CASE id
+    ... END`` statement per ``chunk_size`` workers, either when
+    ``max_pending`` shares are buffered or every ``flush_interval`` seconds,
+    and once more on shutdown. With a ``rollup_table``, shares recorded with
+    their owning ``user_id``/``cryptocurrency`` are also added to the per-user
+    rollups in the same transaction.
+    """
+
+    def __init__(self, engine, worker_table, max_pending=5000, flush_interval=1.0, chunk_size=500,
+                 rollup_table=None):
+        self.engine = engine
+        self.worker_table = worker_table
+        self.rollup_table = rollup_table
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.chunk_size = chunk_size
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._pending_shares = 0
+        self._oldest_pending = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.flush_count = 0
+        self.flushed_shares = 0
+        self.last_batch_size = 0
+        self.last_flush_lag = 0.0
+        self.max_flush_lag = 0.0
+        self.last_flush_duration = 0.0
+        self.failed_flushes = 0
+
+    def record(self, worker_id, accepted=True, submitted=1, seen_at=None, user_id=None, cryptocurrency=None):
+        """Buffer one (or ``submitted``) share(s) for a worker"""
+        seen_at = seen_at or datetime.utcnow()
+        owner = (user_id, cryptocurrency) if user_id is not None and cryptocurrency else None
+        with self._lock:
+            entry = self._pending.get(worker_id)
+            if entry is None:
+                entry = self._pending[worker_id] = [0, 0, seen_at, owner]
+            elif owner is not None:
+                entry[3] = owner
+            entry[0] += submitted
+            if accepted:
+                entry[1] += submitted
+            if seen_at > entry[2]:
+                entry[2] = seen_at
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+            self._pending_shares += submitted
+            full = self._pending_shares >= self.max_pending
+
+        if full:
+            if self._thread is not None:
+                self._wakeup.set()
+            else:
+                self.flush()
+
+    def _take_pending(self):
+        with self._lock:
+            pending = self._pending
+            oldest = self._oldest_pending
+            self._pending = {}
+            self._pending_shares = 0
+            self._oldest_pending = None
+        return pending, oldest
+
+    def _restore_pending(self, pending, oldest):
+        """Merge a failed batch back so no increments are lost"""
+        with self._lock:
+            for worker_id, (submitted, accepted, seen_at, owner) in pending.items():
+                entry = self._pending.get(worker_id)
+                if entry is None:
+                    self._pending[worker_id] = [submitted, accepted, seen_at, owner]
+                else:
+                    entry[0] += submitted
+                    entry[1] += accepted
+                    entry[2] = max(entry[2], seen_at)
+                    entry[3] = entry[3] or owner
+                self._pending_shares += submitted
+            if oldest is not None and (self._oldest_pending is None or oldest < self._oldest_pending):
+                self._oldest_pending = oldest
+
+    def _update_statement(self, chunk):
+        worker = self.worker_table
+        ids = [worker_id for worker_id, _ in chunk]
+        submitted = case({worker_id: values[0] for worker_id, values in chunk}, value=worker.c.id, else_=0)
+        accepted = case({worker_id: values[1] for worker_id, values in chunk}, value=worker.c.id, else_=0)
+        last_seen = case({worker_id: values[2] for worker_id, values in chunk}, value=worker.c.id,
+                         else_=worker.c.last_seen)
+        return worker.update().where(worker.c.id.in_(ids)).values(
+            shares_submitted=worker.c.shares_submitted + submitted,
+            shares_accepted=worker.c.shares_accepted + accepted,
+            last_seen=last_seen
+        )
+
+    def _rollup_increments(self, items):
+        increments = {}
+        for _, (submitted, accepted, _, owner) in items:
+            if owner is None:
+                continue
+            totals = increments.setdefault(owner, [0, 0])
+            totals[0] += submitted
+            totals[1] += accepted
+        return [
+            {'user_id': user_id, 'cryptocurrency': crypto, 'shares_submitted': submitted, 'shares_accepted': accepted}
+            for (user_id, crypto), (submitted, accepted) in increments.items()
+        ]
+
+    def flush(self):
+        """Write all buffered increments; returns the number of workers updated"""
+        with self._flush_lock:
+            pending, oldest = self._take_pending()
+            if not pending:
+                return 0
+
+            started = time.monotonic()
+            items = list(pending.items())
+            try:
+                with self.engine.begin() as conn:
+                    for i in range(0, len(items), self.chunk_size):
+                        conn.execute(self._update_statement(items[i:i + self.chunk_size]))
+                    if self.rollup_table is not None:
+                        increment_rollups(conn, self.rollup_table, self._rollup_increments(items))
+            except Exception as e:
+                self.failed_flushes += 1
+                self._restore_pending(pending, oldest)
+                logger.error(f"Error flushing share counters for {len(items)} workers: {e}")
+                raise
+
+            finished = time.monotonic()
+            self.flush_count += 1
+            self.last_batch_size = len(items)
+            FLUSH_BATCH_WORKERS.observe(len(items))
+            self.flushed_shares += sum(values[0] for _, values in items)
+            self.last_flush_lag = finished - oldest if oldest is not None else 0.0
+            self.max_flush_lag = max(self.max_flush_lag, self.last_flush_lag)
+            self.last_flush_duration = finished - started
+            return len(items)
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Already logged and re-buffered; retry on the next tick
+                pass
+
+    def start(self):
+        """Start the background flusher and register a flush at interpreter exit"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        logger.info("Started share counter flusher")
+
+    def stop(self):
+        """Stop the flusher and write out anything still buffered"""
+        if self._thread is not None:
+            self._stop.set()
+            self._wakeup.set()
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def metrics(self):
+        """Flush lag and batch statistics"""
+        with self._lock:
+            pending_workers = len(self._pending)
+            pending_shares = self._pending_shares
+            pending_age = time.monotonic() - self._oldest_pending if self._oldest_pending else 0.0
+        return {
+            'pending_workers': pending_workers,
+            'pending_shares': pending_shares,
+            'pending_age_seconds': pending_age,
+            'flush_count': self.flush_count,
+            'flushed_shares': self.flushed_shares,
+            'failed_flushes': self.failed_flushes,
+            'last_batch_size': self.last_batch_size,
+            'last_flush_lag_seconds': self.last_flush_lag,
+            'max_flush_lag_seconds': self.max_flush_lag,
+            'last_flush_duration_seconds': self.last_flush_duration
+        }
+
+
+def register_metrics(buffer):
+    """Flush lag and backlog gauges for a ShareBuffer"""
+
+    def collect():
+        stats = buffer.metrics()
+        yield ('share_buffer_flush_lag_seconds', 'gauge', 'Age of the oldest share in the last flush when it was written', [({}, stats['last_flush_lag_seconds'])])
+        yield ('share_buffer_pending_age_seconds', 'gauge', 'Age of the oldest share still waiting to be flushed', [({}, stats['pending_age_seconds'])])
+        yield ('share_buffer_pending_shares', 'gauge', 'Shares buffered but not yet written', [({}, stats['pending_shares'])])
+        yield ('share_buffer_flushed_shares_total', 'counter', 'Shares written by the buffer', [({}, stats['flushed_shares'])])
+        yield ('share_buffer_failed_flushes_total', 'counter', 'Flushes that failed and were re-buffered', [({}, stats['failed_flushes'])])
+
+    REGISTRY.register_collector(collect)
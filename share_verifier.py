@@ -0,0 +1,292 @@
+"""
+SHA-256d share verification for the Stratum server, batched onto a process pool
+
+Each submission is rebuilt into the 80-byte block header it claims to
+solve (coinbase = coinb1 + extranonce1 + extranonce2 + coinb2, folded up
+the job's merkle branch into the merkle root, then version, prevhash,
+root, ntime, nbits and nonce), double-SHA-256 hashed and compared with the
+connection's share target and the job's network target.
+
+Shares from every connection are queued on the event loop and verified in
+batches of ``batch_size`` (or whatever arrived within ``max_delay``
+seconds) by pool processes, so hashing runs on every core while the event
+loop only parses and answers. Each connection waits for its own share's
+verdict before reading its next request, which bounds the shares in
+flight to the number of connections.
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fractions import Fraction
+
+from stratum_server import ERR_LOW_DIFFICULTY, ERR_OTHER, StratumError, structural_share_check
+
+logger = logging.getLogger(__name__)
+
+# Target of a difficulty-1 share (the "bdiff" convention used by Stratum pools)
+DIFF1_TARGET = 0xffff << 208
+
+LOW_DIFFICULTY = 0
+SHARE = 1
+BLOCK = 2
+MALFORMED = 3
+
+
+def target_from_nbits(nbits):
+    """Network target encoded in a compact ``nbits`` hex string ('1d00ffff' -> 0xffff << 208)"""
+    bits = int(nbits, 16)
+    exponent, mantissa = bits >> 24, bits & 0x7fffff
+    if exponent <= 3:
+        return mantissa >> (8 * (3 - exponent))
+    return mantissa << (8 * (exponent - 3))
+
+
+def share_target(difficulty):
+    """Largest header hash that meets ``difficulty``"""
+    difficulty = Fraction(difficulty)
+    if difficulty <= 0:
+        raise ValueError('Share difficulty must be positive')
+    return DIFF1_TARGET * difficulty.denominator // difficulty.numerator
+
+
+def _swap_words(data):
+    """Reverse the bytes of every 4-byte word (Stratum's prevhash encoding)"""
+    return b''.join(data[i:i + 4][::-1] for i in range(0, len(data), 4))
+
+
+def job_template(job):
+    """Picklable header parts of a StratumJob, already in header byte order"""
+    return (
+        bytes.fromhex(job.version)[::-1],
+        _swap_words(bytes.fromhex(job.prevhash)),
+        bytes.fromhex(job.coinb1),
+        bytes.fromhex(job.coinb2),
+        tuple(bytes.fromhex(branch) for branch in job.merkle_branch),
+        bytes.fromhex(job.nbits)[::-1],
+        target_from_nbits(job.nbits)
+    )
+
+
+def block_header(template, extranonce1, extranonce2, ntime, nonce):
+    """80-byte header for one submission (hex fields as sent over Stratum)"""
+    version, prevhash, coinb1, coinb2, branches, nbits, _ = template
+    sha256 = hashlib.sha256
+    root = sha256(sha256(coinb1 + bytes.fromhex(extranonce1 + extranonce2) + coinb2).digest()).digest()
+    for branch in branches:
+        root = sha256(sha256(root + branch).digest()).digest()
+    return version + prevhash + root + bytes.fromhex(ntime)[::-1] + nbits + bytes.fromhex(nonce)[::-1]
+
+
+def verify_batch(templates, shares):
+    """Runs in a pool process: one status byte per share (LOW_DIFFICULTY, SHARE, BLOCK or MALFORMED)
+
+    ``templates`` maps a job key to its ``job_template``; each share is
+    ``(job key, extranonce1, extranonce2, ntime, nonce, share target)``.
+    """
+    sha256 = hashlib.sha256
+    statuses = bytearray(len(shares))
+    for i, (key, extranonce1, extranonce2, ntime, nonce, target) in enumerate(shares):
+        template = templates[key]
+        try:
+            header = block_header(template, extranonce1, extranonce2, ntime, nonce)
+        except ValueError:
+            header = b''
+        if len(header) != 80:
+            statuses[i] = MALFORMED
+            continue
+        value = int.from_bytes(sha256(sha256(header).digest()).digest(), 'little')
+        if value <= template[6]:
+            statuses[i] = BLOCK
+        elif value <= target:
+            statuses[i] = SHARE
+    return bytes(statuses)
+
+
+class ShareVerifier:
+    """``validate_share`` hook for SHA-256 coins that verifies proof of work in batches
+
+    Called like ``structural_share_check``; malformed shares are rejected
+    at once, the rest return an awaitable share difficulty (or raise
+    ``StratumError`` for low-difficulty shares). ``max_workers=0`` hashes
+    inline on the event loop (for development and tests). Listeners are
+    called with ``(job, extranonce1, extranonce2, ntime, nonce)`` for
+    every share that also meets the network target.
+    """
+
+    def __init__(self, max_workers=None, batch_size=256, max_delay=0.002, max_jobs=64, max_targets=1024):
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_jobs = max_jobs
+        self.max_targets = max_targets
+        self._lock = threading.Lock()
+        self._pool = None
+        self._templates = {}
+        self._targets = {}
+        self._batch = []
+        self._batch_templates = {}
+        self._waiters = []
+        self._timer = None
+        self.listeners = []
+        self.batches = 0
+        self.verified = 0
+        self.rejected = 0
+        self.blocks = 0
+        self.inflight = 0
+        self.verify_seconds = 0.0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: never fork a process that is already running threads
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _reset_pool(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _template(self, job):
+        key = (job.job_id, job.prevhash)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = job_template(job)
+            while len(self._templates) > self.max_jobs:
+                self._templates.pop(next(iter(self._templates)))
+        return key, template
+
+    def _share_target(self, difficulty):
+        target = self._targets.get(difficulty)
+        if target is None:
+            target = self._targets[difficulty] = share_target(difficulty)
+            # Vardiff keeps producing new difficulties; keep the most recent ones
+            while len(self._targets) > self.max_targets:
+                self._targets.pop(next(iter(self._targets)))
+        return target
+
+    def __call__(self, job, extranonce1, extranonce2, ntime, nonce, difficulty, extranonce2_size):
+        difficulty = structural_share_check(job, extranonce1, extranonce2, ntime, nonce, difficulty, extranonce2_size)
+        key, template = self._template(job)
+        share = (key, extranonce1, extranonce2, ntime, nonce, self._share_target(difficulty))
+
+        if self.max_workers == 0:
+            status = verify_batch({key: template}, [share])[0]
+            self._settle(None, job, share, difficulty, status)
+            return difficulty
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._batch.append(share)
+        self._batch_templates[key] = template
+        self._waiters.append((waiter, job, difficulty))
+        if len(self._batch) >= self.batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._dispatch)
+        return waiter
+
+    def _settle(self, waiter, job, share, difficulty, status):
+        """Resolve one share's verdict; with no waiter, raise it"""
+        self.verified += 1
+        if status in (LOW_DIFFICULTY, MALFORMED):
+            self.rejected += 1
+            error = StratumError(ERR_LOW_DIFFICULTY) if status == LOW_DIFFICULTY else StratumError(ERR_OTHER, 'Malformed share')
+            if waiter is None:
+                raise error
+            if not waiter.done():
+                waiter.set_exception(error)
+            return
+        if status == BLOCK:
+            self.blocks += 1
+            logger.info(f"Block candidate on job {job.job_id}: nonce {share[4]} ntime {share[3]}")
+            for listener in self.listeners:
+                try:
+                    listener(job, *share[1:5])
+                except Exception as e:
+                    logger.error(f"Block listener failed: {e}")
+        if waiter is not None and not waiter.done():
+            waiter.set_result(difficulty)
+
+    def _submit(self, templates, shares):
+        pool = self._get_pool()
+        try:
+            return pool.submit(verify_batch, templates, shares)
+        except BrokenProcessPool:
+            # A pool process died; start a fresh pool and try once more
+            self._reset_pool(pool)
+            return self._get_pool().submit(verify_batch, templates, shares)
+
+    def _settle_inline(self, waiters, templates, shares):
+        """Verify a batch on the event loop when the pool cannot; fail its waiters if that breaks too"""
+        try:
+            statuses = verify_batch(templates, shares)
+        except Exception as e:
+            logger.error(f"Inline share verification failed: {e}")
+            for waiter, _, _ in waiters:
+                if not waiter.done():
+                    waiter.set_exception(StratumError(ERR_OTHER, 'Share verification failed'))
+            return
+        for (waiter, job, difficulty), share, status in zip(waiters, shares, statuses):
+            self._settle(waiter, job, share, difficulty, status)
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._batch:
+            return
+        shares, templates, waiters = self._batch, self._batch_templates, self._waiters
+        self._batch, self._batch_templates, self._waiters = [], {}, []
+        self.inflight += len(shares)
+        self.batches += 1
+        started = time.perf_counter()
+
+        try:
+            future = self._submit(templates, shares)
+        except Exception as e:
+            # Runs from call_later: raising here would leave every waiter in the batch unresolved
+            logger.error(f"Could not queue share verification batch, verifying inline: {e!r}")
+            self.inflight -= len(shares)
+            self._settle_inline(waiters, templates, shares)
+            return
+
+        def finished(done):
+            self.inflight -= len(shares)
+            self.verify_seconds += time.perf_counter() - started
+            try:
+                statuses = done.result()
+            except (Exception, asyncio.CancelledError) as e:
+                logger.error(f"Share verification batch failed, verifying inline: {e!r}")
+                self._settle_inline(waiters, templates, shares)
+                return
+            for (waiter, job, difficulty), share, status in zip(waiters, shares, statuses):
+                self._settle(waiter, job, share, difficulty, status)
+
+        asyncio.wrap_future(future).add_done_callback(finished)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'verified': self.verified,
+            'rejected': self.rejected,
+            'blocks': self.blocks,
+            'inflight': self.inflight,
+            'avg_batch_size': self.verified / self.batches if self.batches else 0.0,
+            'avg_batch_ms': 1000 * self.verify_seconds / self.batches if self.batches else 0.0
+        }
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
@@ -0,0 +1,179 @@
+"""
+Cross-process cache backends and leader election for multi-worker (gunicorn) deployments
+
+Backends share one interface so the app can run against Redis in production
+and a SQLite file locally or in tests:
+
+    get(key) -> value or None
+    set(key, value, ttl)
+    acquire_lock(name, owner, ttl) -> bool   (also renews a lock the owner holds)
+    release_lock(name, owner)
+
+Values must be JSON-serializable.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCacheBackend:
+    """Interface for caches visible to every process of a deployment"""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def acquire_lock(self, name, owner, ttl):
+        """Take ``name`` for ``ttl`` seconds if it is free or expired, or extend it if ``owner`` holds it"""
+        raise NotImplementedError
+
+    def release_lock(self, name, owner):
+        raise NotImplementedError
+
+
+class RedisBackend(SharedCacheBackend):
+    """Redis-backed shared cache (requires the ``redis`` package)"""
+
+    # Extend / delete the lock only while it still belongs to the caller
+    RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+    RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+    def __init__(self, url=None, client=None, prefix='cryptomine:'):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._renew = client.register_script(self.RENEW_SCRIPT)
+        self._release = client.register_script(self.RELEASE_SCRIPT)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000))
+
+    def acquire_lock(self, name, owner, ttl):
+        key = self.prefix + 'lock:' + name
+        ttl_ms = int(ttl * 1000)
+        if self.client.set(key, owner, nx=True, px=ttl_ms):
+            return True
+        return bool(self._renew(keys=[key], args=[owner, ttl_ms]))
+
+    def release_lock(self, name, owner):
+        self._release(keys=[self.prefix + 'lock:' + name], args=[owner])
+
+
+class SQLiteBackend(SharedCacheBackend):
+    """Shared cache in a local SQLite file: a stand-in for Redis on a single host and in tests"""
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)')
+
+    def _connect(self):
+        # One connection per thread; autocommit with WAL so readers never block the writer
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value FROM cache WHERE key = ? AND expires_at > ?', (key, self.clock())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, json.dumps(value), self.clock() + ttl)
+        )
+
+    def acquire_lock(self, name, owner, ttl):
+        now = self.clock()
+        cursor = self._connect().execute(
+            'INSERT INTO locks (name, owner, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+            'WHERE locks.owner = excluded.owner OR locks.expires_at <= ?',
+            (name, owner, now + ttl, now)
+        )
+        return cursor.rowcount == 1
+
+    def release_lock(self, name, owner):
+        self._connect().execute('DELETE FROM locks WHERE name = ? AND owner = ?', (name, owner))
+
+
+def backend_from_url(url):
+    """Backend for ``redis://``/``rediss://`` or ``sqlite:///path`` URLs; None when ``url`` is empty"""
+    if not url:
+        return None
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(url)
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):])
+    raise ValueError(f'Unsupported shared cache URL: {url}')
+
+
+def backend_from_env():
+    """Backend configured by SHARED_CACHE_URL, falling back to Heroku's REDIS_URL"""
+    return backend_from_url(os.environ.get('SHARED_CACHE_URL') or os.environ.get('REDIS_URL'))
+
+
+class LeaderElection:
+    """Lease-based leadership: the holder must renew within ``ttl`` seconds or another process takes over"""
+
+    def __init__(self, backend, name, ttl=30.0):
+        self.backend = backend
+        self.name = name
+        self.ttl = ttl
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.is_leader = False
+
+    def try_acquire(self):
+        """Acquire or renew the lease; returns whether this process is now the leader"""
+        try:
+            leader = self.backend.acquire_lock(self.name, self.owner, self.ttl)
+        except Exception as e:
+            logger.error(f"Leader election for {self.name} failed: {e}")
+            leader = False
+        if leader != self.is_leader:
+            logger.info(f"{self.owner} {'became' if leader else 'is no longer'} leader for {self.name}")
+        self.is_leader = leader
+        return leader
+
+    def release(self):
+        if self.is_leader:
+            try:
+                self.backend.release_lock(self.name, self.owner)
+            except Exception as e:
+                logger.error(f"Releasing leadership of {self.name} failed: {e}")
+            self.is_leader = False
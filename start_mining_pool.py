@@ -17,7 +17,8 @@ def check_dependencies():
         'flask_sqlalchemy', 
         'flask_bcrypt',
         'flask_login',
-        'requests'
+        'requests',
+        'numpy'
     ]
     
     missing_modules = []
@@ -0,0 +1,714 @@
+"""
+Stratum v1 mining server (asyncio) that feeds the pool's Worker and MiningSession tables
+
+Runs next to the Flask app as its own process, one listening port per coin:
+    python stratum_server.py --coin BTC --port 3333
+    python stratum_server.py --coin BTC:3333 --coin LTC:3335
+
+Miners authorize as ``<pool username>.<worker name>``.
+"""
+
+import argparse
+import asyncio
+import inspect
+import itertools
+import json
+import logging
+import os
+import secrets
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {
+    'BTC': 3333,
+    'ETH': 3334,
+    'LTC': 3335,
+    'XMR': 3336
+}
+
+# Stratum error codes
+ERR_OTHER = 20
+ERR_JOB_NOT_FOUND = 21
+ERR_DUPLICATE_SHARE = 22
+ERR_LOW_DIFFICULTY = 23
+ERR_UNAUTHORIZED = 24
+ERR_NOT_SUBSCRIBED = 25
+
+ERROR_MESSAGES = {
+    ERR_OTHER: 'Other/Unknown',
+    ERR_JOB_NOT_FOUND: 'Job not found (=stale)',
+    ERR_DUPLICATE_SHARE: 'Duplicate share',
+    ERR_LOW_DIFFICULTY: 'Low difficulty share',
+    ERR_UNAUTHORIZED: 'Unauthorized worker',
+    ERR_NOT_SUBSCRIBED: 'Not subscribed'
+}
+
+
+class StratumError(Exception):
+    """Error reported back to the miner as a Stratum error triple"""
+
+    def __init__(self, code, message=None):
+        super().__init__(message or ERROR_MESSAGES.get(code, 'Other/Unknown'))
+        self.code = code
+
+    def to_json(self):
+        return [self.code, str(self), None]
+
+
+class StratumJob:
+    """Work unit broadcast with mining.notify"""
+
+    def __init__(self, job_id, prevhash, coinb1, coinb2, merkle_branch, version, nbits, ntime, clean_jobs):
+        self.job_id = job_id
+        self.prevhash = prevhash
+        self.coinb1 = coinb1
+        self.coinb2 = coinb2
+        self.merkle_branch = merkle_branch
+        self.version = version
+        self.nbits = nbits
+        self.ntime = ntime
+        self.clean_jobs = clean_jobs
+        self.created_at = time.monotonic()
+        self.submissions = set()
+
+    def notify_params(self):
+        return [self.job_id, self.prevhash, self.coinb1, self.coinb2, self.merkle_branch,
+                self.version, self.nbits, self.ntime, self.clean_jobs]
+
+
+class SyntheticJobSource:
+    """Generates well-formed jobs when no node template source is configured"""
+
+    def __init__(self, nbits='1d00ffff', version='20000000'):
+        self.nbits = nbits
+        self.version = version
+        self._ids = itertools.count(1)
+        self._prevhash = secrets.token_hex(32)
+
+    def next_job(self, clean_jobs=False):
+        if clean_jobs:
+            self._prevhash = secrets.token_hex(32)
+        return StratumJob(
+            job_id=format(next(self._ids), 'x'),
+            prevhash=self._prevhash,
+            coinb1='01000000010000000000000000000000000000000000000000000000000000000000000000ffffffff',
+            coinb2='ffffffff0100f2052a010000001976a914' + '00' * 20 + '88ac00000000',
+            merkle_branch=[],
+            version=self.version,
+            nbits=self.nbits,
+            ntime=format(int(time.time()), '08x'),
+            clean_jobs=clean_jobs
+        )
+
+
+def structural_share_check(job, extranonce1, extranonce2, ntime, nonce, difficulty, extranonce2_size):
+    """Reject malformed submissions; returns the share difficulty credited"""
+    try:
+        if len(extranonce2) != extranonce2_size * 2:
+            raise ValueError('extranonce2 size')
+        bytes.fromhex(extranonce2)
+        if len(ntime) != 8 or len(nonce) != 8:
+            raise ValueError('ntime/nonce size')
+        share_time = int(ntime, 16)
+        int(nonce, 16)
+    except ValueError as e:
+        raise StratumError(ERR_OTHER, f'Malformed share: {e}')
+
+    # Allow miners to roll ntime forward a little, never backwards past the job
+    if share_time < int(job.ntime, 16) or share_time > time.time() + 7200:
+        raise StratumError(ERR_OTHER, 'ntime out of range')
+    return difficulty
+
+
+class WorkerRegistry:
+    """Maps authorized Stratum workers onto Worker rows (blocking DB calls)"""
+
+    def __init__(self, flask_app, coin):
+        from app import db, user_cache, User, Worker, MiningSession, UserCoinRollup
+        self.flask_app = flask_app
+        self.user_cache = user_cache
+        self.coin = coin
+        self.db = db
+        self.User = User
+        self.Worker = Worker
+        self.MiningSession = MiningSession
+        self.UserCoinRollup = UserCoinRollup
+
+    def authorize(self, login):
+        """Return (worker id, user id) for ``username.worker``, creating the worker if needed"""
+        username, _, worker_name = login.partition('.')
+        worker_name = (worker_name or 'default')[:50]
+
+        with self.flask_app.app_context():
+            user = self.User.query.filter_by(username=username).first()
+            if user is None:
+                return None
+
+            worker = self.Worker.query.filter_by(user_id=user.id, name=worker_name).first()
+            if worker is None:
+                worker = self.Worker(user_id=user.id, name=worker_name)
+                self.db.session.add(worker)
+            worker.status = 'online'
+            worker.cryptocurrency = self.coin
+            worker.last_seen = datetime.utcnow()
+
+            active_session = self.MiningSession.query.filter_by(
+                user_id=user.id,
+                cryptocurrency=self.coin,
+                status='active'
+            ).first()
+            if active_session is None:
+                self.db.session.add(self.MiningSession(user_id=user.id, cryptocurrency=self.coin))
+
+            self.db.session.commit()
+            return worker.id, user.id
+
+    def heartbeat(self, worker_ids, chunk_size=500):
+        """Refresh ``last_seen`` of workers with an open connection so the sweeper leaves them online
+
+        A connected miner may go longer than the sweeper timeout between
+        shares. Workers the sweeper expired anyway (e.g. while this process
+        could not reach the database) are brought back online, with a new
+        session for users left without one. Returns the number revived.
+        """
+        if not worker_ids:
+            return 0
+        now = datetime.utcnow()
+        worker_ids = list(worker_ids)
+        revived_users = set()
+        with self.flask_app.app_context():
+            Worker = self.Worker
+            for i in range(0, len(worker_ids), chunk_size):
+                chunk = worker_ids[i:i + chunk_size]
+                revived_users.update(user_id for (user_id,) in self.db.session.query(Worker.user_id).filter(
+                    Worker.id.in_(chunk), Worker.status != 'online'
+                ).distinct())
+                Worker.query.filter(Worker.id.in_(chunk)).update(
+                    {'status': 'online', 'last_seen': now}, synchronize_session=False
+                )
+            if revived_users:
+                active = {user_id for (user_id,) in self.db.session.query(self.MiningSession.user_id).filter(
+                    self.MiningSession.user_id.in_(revived_users),
+                    self.MiningSession.cryptocurrency == self.coin,
+                    self.MiningSession.status == 'active'
+                )}
+                for user_id in sorted(revived_users - active):
+                    self.db.session.add(self.MiningSession(user_id=user_id, cryptocurrency=self.coin))
+            self.db.session.commit()
+        return len(revived_users)
+
+    def mark_offline(self, worker_ids):
+        """Flag workers whose last connection closed as offline
+
+        Users left with no online worker on this coin get their active
+        session completed and credited in the same transaction, and their
+        cached rows invalidated in every web process.
+        """
+        from worker_sweeper import close_sessions
+
+        if not worker_ids:
+            return []
+        now = datetime.utcnow()
+        with self.flask_app.app_context():
+            user_ids = [user_id for (user_id,) in self.db.session.query(self.Worker.user_id).filter(
+                self.Worker.id.in_(list(worker_ids))
+            ).distinct()]
+            self.Worker.query.filter(self.Worker.id.in_(list(worker_ids))).update(
+                {'status': 'offline', 'hashrate': 0.0}, synchronize_session=False
+            )
+            closed = close_sessions(
+                self.db.session, self.Worker.__table__, self.MiningSession.__table__, self.User.__table__,
+                self.UserCoinRollup.__table__, {(user_id, self.coin): now for user_id in user_ids}, now
+            )
+            self.db.session.commit()
+        # total_mined changed: web processes must not keep serving the old row until the TTL
+        for user_id in {item['user_id'] for item in closed}:
+            self.user_cache.invalidate(user_id)
+        return closed
+
+
+class StratumConnection:
+    """Per-miner protocol state"""
+
+    def __init__(self, server, reader, writer, extranonce1):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.extranonce1 = extranonce1
+        self.subscribed = False
+        self.workers = {}
+        self.difficulty = server.difficulty
+        self.peer = writer.get_extra_info('peername')
+        self.accepted = 0
+        self.rejected = 0
+
+    def send(self, payload):
+        """Queue a JSON line; drop the miner if it stops reading"""
+        if self.writer.is_closing():
+            return
+        transport = self.writer.transport
+        if transport.get_write_buffer_size() > self.server.max_write_buffer:
+            logger.warning(f"Dropping slow miner {self.peer}")
+            self.writer.close()
+            return
+        self.writer.write(json.dumps(payload, separators=(',', ':')).encode() + b'\n')
+
+    def reply(self, msg_id, result=None, error=None):
+        self.send({'id': msg_id, 'result': result, 'error': error})
+
+    def notify(self, method, params):
+        self.send({'id': None, 'method': method, 'params': params})
+
+    async def handle(self, request):
+        method = request.get('method')
+        params = request.get('params') or []
+        msg_id = request.get('id')
+
+        try:
+            if method == 'mining.subscribe':
+                result = self.subscribe()
+            elif method == 'mining.authorize':
+                result = await self.authorize(params)
+            elif method == 'mining.submit':
+                result = await self.submit(params)
+            elif method == 'mining.extranonce.subscribe':
+                result = False
+            else:
+                raise StratumError(ERR_OTHER, f'Unknown method {method}')
+        except StratumError as e:
+            self.reply(msg_id, None, e.to_json())
+            return
+
+        self.reply(msg_id, result)
+
+        if method == 'mining.subscribe':
+            self.notify('mining.set_difficulty', [self.difficulty])
+            job = self.server.current_job
+            if job is not None:
+                self.notify('mining.notify', job.notify_params())
+
+    def subscribe(self):
+        self.subscribed = True
+        self.server.subscribers.add(self)
+        subscription_id = self.extranonce1
+        return [
+            [['mining.set_difficulty', subscription_id], ['mining.notify', subscription_id]],
+            self.extranonce1,
+            self.server.extranonce2_size
+        ]
+
+    async def authorize(self, params):
+        if not params:
+            raise StratumError(ERR_OTHER, 'Missing worker name')
+        login = str(params[0])
+        if login in self.workers:
+            return True
+        identity = await self.server.authorize(login)
+        if identity is None:
+            return False
+        self.workers[login] = identity
+        self.server.attach_worker(identity[0])
+        return True
+
+    async def submit(self, params):
+        if not self.subscribed:
+            raise StratumError(ERR_NOT_SUBSCRIBED)
+        if len(params) < 5:
+            raise StratumError(ERR_OTHER, 'Invalid submit parameters')
+
+        login = str(params[0])
+        job_id, extranonce2, ntime, nonce = (str(p).lower() for p in params[1:5])
+        identity = self.workers.get(login)
+        if identity is None:
+            raise StratumError(ERR_UNAUTHORIZED)
+        worker_id, user_id = identity
+
+        try:
+            job = self.server.jobs.get(job_id)
+            if job is None:
+                raise StratumError(ERR_JOB_NOT_FOUND)
+
+            key = (self.extranonce1, extranonce2, ntime, nonce)
+            if key in job.submissions:
+                raise StratumError(ERR_DUPLICATE_SHARE)
+
+            # Claimed before verifying so a resubmission while the first is in flight is a duplicate
+            job.submissions.add(key)
+            try:
+                share_difficulty = self.server.validate_share(
+                    job, self.extranonce1, extranonce2, ntime, nonce,
+                    self.difficulty, self.server.extranonce2_size
+                )
+                if inspect.isawaitable(share_difficulty):
+                    share_difficulty = await share_difficulty
+            except StratumError:
+                job.submissions.discard(key)
+                raise
+        except StratumError:
+            self.rejected += 1
+            self.server.record_share(worker_id, user_id, False, 0)
+            raise
+
+        self.accepted += 1
+        self.server.record_share(worker_id, user_id, True, share_difficulty)
+        return True
+
+
+class StratumServer:
+    """One coin's Stratum endpoint; a single event loop serves every connection"""
+
+    def __init__(self, coin, host='0.0.0.0', port=3333, registry=None, share_buffer=None,
+                 job_source=None, validate_share=structural_share_check, difficulty=1,
+                 job_interval=30.0, max_connections=20000, extranonce2_size=4,
+                 max_write_buffer=64 * 1024, idle_timeout=600, executor=None, estimator=None):
+        self.coin = coin
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.share_buffer = share_buffer
+        self.estimator = estimator
+        self.job_source = job_source or SyntheticJobSource()
+        # Returns the share difficulty to credit, or an awaitable of it; raises StratumError to reject
+        self.validate_share = validate_share
+        self.difficulty = difficulty
+        self.job_interval = job_interval
+        self.max_connections = max_connections
+        self.extranonce2_size = extranonce2_size
+        self.max_write_buffer = max_write_buffer
+        self.idle_timeout = idle_timeout
+        self.executor = executor or ThreadPoolExecutor(max_workers=4, thread_name_prefix='stratum-db')
+
+        self.connections = set()
+        self.subscribers = set()
+        self.jobs = {}
+        self.current_job = None
+        self.share_listeners = []
+        self._worker_refs = {}
+        self._extranonce_counter = itertools.count(secrets.randbelow(1 << 16) << 16)
+        self._server = None
+        self._job_task = None
+        self._client_tasks = set()
+
+        self.shares_accepted = 0
+        self.shares_rejected = 0
+
+    async def authorize(self, login):
+        if self.registry is None:
+            return None
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, self.registry.authorize, login)
+        except Exception as e:
+            logger.error(f"Error authorizing {login}: {e}")
+            return None
+
+    def attach_worker(self, worker_id):
+        self._worker_refs[worker_id] = self._worker_refs.get(worker_id, 0) + 1
+
+    async def heartbeat(self):
+        """Mark every worker with an open connection as seen now"""
+        worker_ids = list(self._worker_refs)
+        if not worker_ids or self.registry is None:
+            return 0
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, self.registry.heartbeat, worker_ids)
+        except Exception as e:
+            logger.error(f"Error heartbeating {self.coin} workers: {e}")
+            return 0
+
+    def record_share(self, worker_id, user_id, accepted, difficulty):
+        if accepted:
+            self.shares_accepted += 1
+        else:
+            self.shares_rejected += 1
+        if self.share_buffer is not None:
+            self.share_buffer.record(worker_id, accepted=accepted, user_id=user_id, cryptocurrency=self.coin)
+        if accepted and self.estimator is not None:
+            self.estimator.record(worker_id, difficulty)
+        for listener in self.share_listeners:
+            listener(worker_id, accepted, difficulty)
+
+    def new_job(self, clean_jobs=False):
+        """Create a job, keep a short history for late submissions and broadcast it"""
+        job = self.job_source.next_job(clean_jobs=clean_jobs)
+        if clean_jobs:
+            self.jobs.clear()
+        self.jobs[job.job_id] = job
+        while len(self.jobs) > 8:
+            self.jobs.pop(next(iter(self.jobs)))
+        self.current_job = job
+
+        params = job.notify_params()
+        for connection in list(self.subscribers):
+            connection.notify('mining.notify', params)
+        return job
+
+    async def _job_loop(self):
+        while True:
+            await asyncio.sleep(self.job_interval)
+            self.new_job()
+
+    async def _handle_client(self, reader, writer):
+        if len(self.connections) >= self.max_connections:
+            writer.close()
+            return
+
+        extranonce1 = format(next(self._extranonce_counter) & 0xffffffff, '08x')
+        connection = StratumConnection(self, reader, writer, extranonce1)
+        self.connections.add(connection)
+        task = asyncio.current_task()
+        self._client_tasks.add(task)
+
+        try:
+            while not reader.at_eof():
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except (asyncio.TimeoutError, asyncio.LimitOverrunError, ValueError):
+                    break
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    break
+                if not isinstance(request, dict):
+                    break
+                await connection.handle(request)
+                if writer.transport.get_write_buffer_size() > self.max_write_buffer:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections.discard(connection)
+            self.subscribers.discard(connection)
+            writer.close()
+            await self._release_workers(connection)
+            self._client_tasks.discard(task)
+
+    async def _release_workers(self, connection):
+        offline = []
+        for worker_id, _ in connection.workers.values():
+            refs = self._worker_refs.get(worker_id, 0) - 1
+            if refs <= 0:
+                self._worker_refs.pop(worker_id, None)
+                offline.append(worker_id)
+            else:
+                self._worker_refs[worker_id] = refs
+
+        if self.estimator is not None:
+            for worker_id in offline:
+                self.estimator.remove(worker_id)
+
+        if offline and self.registry is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self.executor, self.registry.mark_offline, offline)
+            except Exception as e:
+                logger.error(f"Error marking workers offline: {e}")
+
+    async def start(self):
+        self.new_job(clean_jobs=True)
+        self._server = await asyncio.start_server(
+            self._handle_client, self.host, self.port, limit=8192, backlog=4096
+        )
+        self._job_task = asyncio.create_task(self._job_loop())
+        logger.info(f"Stratum server for {self.coin} listening on {self.host}:{self.port}")
+
+    async def close(self):
+        if self._job_task is not None:
+            self._job_task.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for connection in list(self.connections):
+            connection.writer.close()
+        if self._client_tasks:
+            await asyncio.gather(*self._client_tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            'coin': self.coin,
+            'connections': len(self.connections),
+            'subscribers': len(self.subscribers),
+            'workers': len(self._worker_refs),
+            'shares_accepted': self.shares_accepted,
+            'shares_rejected': self.shares_rejected
+        }
+
+
+def raise_file_limit():
+    """Lift the soft fd limit to the hard limit so one process can hold 10k+ sockets"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or hard > soft:
+        target = hard if hard != resource.RLIM_INFINITY else 1048576
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        except (ValueError, OSError):
+            pass
+
+
+def parse_coin_ports(values, default_port=None):
+    """Turn ``COIN`` / ``COIN:PORT`` arguments into {coin: port}"""
+    coin_ports = {}
+    for value in values:
+        coin, _, port = value.partition(':')
+        coin = coin.upper()
+        if port:
+            coin_ports[coin] = int(port)
+        elif default_port and len(values) == 1:
+            coin_ports[coin] = default_port
+        else:
+            coin_ports[coin] = DEFAULT_PORTS.get(coin, 3333)
+    return coin_ports
+
+
+async def run(args):
+    from app import app, db, Worker, MiningSession, UserCoinRollup, SUPPORTED_CRYPTOS
+    from metrics import serve_metrics
+    from share_buffer import ShareBuffer, register_metrics as register_share_buffer_metrics
+    from share_verifier import ShareVerifier
+    from hashrate_estimator import HashrateEstimator, COIN_DIFF1_HASHES, HASHRATE_UNITS, persist_hashrates
+
+    coin_ports = parse_coin_ports(args.coin or ['BTC'], args.port)
+    unknown = set(coin_ports) - set(SUPPORTED_CRYPTOS)
+    if unknown:
+        raise SystemExit(f"Unsupported cryptocurrency: {', '.join(sorted(unknown))}")
+
+    with app.app_context():
+        engine = db.engine
+    share_buffer = ShareBuffer(engine, Worker.__table__, flush_interval=args.flush_interval,
+                               rollup_table=UserCoinRollup.__table__)
+    share_buffer.start()
+    register_share_buffer_metrics(share_buffer)
+    if args.metrics_port:
+        serve_metrics(args.host, args.metrics_port, token=os.environ.get('METRICS_TOKEN'))
+        logger.info(f"Serving metrics on {args.host}:{args.metrics_port}/metrics")
+
+    # Proof of work is checked for SHA-256 coins; other algorithms get the structural check only
+    verifier = None
+    if any(SUPPORTED_CRYPTOS[coin]['algo'] == 'SHA-256' for coin in coin_ports):
+        verifier = ShareVerifier(max_workers=args.verify_workers, batch_size=args.verify_batch,
+                                 max_delay=args.verify_delay_ms / 1000)
+
+    executor = ThreadPoolExecutor(max_workers=args.db_threads, thread_name_prefix='stratum-db')
+    servers = []
+    for coin, port in coin_ports.items():
+        server = StratumServer(
+            coin, host=args.host, port=port,
+            registry=WorkerRegistry(app, coin),
+            share_buffer=share_buffer,
+            validate_share=verifier if SUPPORTED_CRYPTOS[coin]['algo'] == 'SHA-256' else structural_share_check,
+            difficulty=args.difficulty,
+            job_interval=args.job_interval,
+            max_connections=args.max_connections,
+            executor=executor,
+            estimator=HashrateEstimator(diff1_hashes=COIN_DIFF1_HASHES.get(coin, 2 ** 32))
+        )
+        await server.start()
+        servers.append(server)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    async def report():
+        while True:
+            await asyncio.sleep(60)
+            for server in servers:
+                logger.info(f"Stratum stats: {server.stats()}")
+            logger.info(f"Share buffer stats: {share_buffer.metrics()}")
+            if verifier is not None:
+                logger.info(f"Share verifier stats: {verifier.stats()}")
+
+    async def publish_hashrates():
+        while True:
+            await asyncio.sleep(args.hashrate_interval)
+            for server in servers:
+                worker_ids, rates = server.estimator.estimate_all('5m')
+                try:
+                    await loop.run_in_executor(
+                        executor, persist_hashrates, engine, Worker.__table__, MiningSession.__table__,
+                        worker_ids, rates, server.coin, 500, HASHRATE_UNITS.get(server.coin, 1.0)
+                    )
+                except Exception as e:
+                    logger.error(f"Error writing {server.coin} hashrates: {e}")
+
+    async def heartbeat_workers():
+        # Connected miners that submit nothing for a while must not be swept offline
+        while True:
+            await asyncio.sleep(args.heartbeat_interval)
+            for server in servers:
+                revived = await server.heartbeat()
+                if revived:
+                    logger.info(f"Revived swept {server.coin} workers of {revived} users")
+
+    reporter = asyncio.create_task(report())
+    publisher = asyncio.create_task(publish_hashrates())
+    heartbeater = asyncio.create_task(heartbeat_workers())
+    await stop.wait()
+
+    heartbeater.cancel()
+    publisher.cancel()
+    reporter.cancel()
+    for server in servers:
+        await server.close()
+    share_buffer.stop()
+    executor.shutdown(wait=True)
+    if verifier is not None:
+        verifier.shutdown()
+    logger.info("Stratum server stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CryptoMine Pro Stratum v1 server')
+    parser.add_argument('--coin', action='append', help='COIN or COIN:PORT (repeatable)')
+    parser.add_argument('--host', default=os.environ.get('STRATUM_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=None, help='Port when serving a single coin')
+    parser.add_argument('--difficulty', type=float, default=1)
+    parser.add_argument('--job-interval', type=float, default=30.0)
+    parser.add_argument('--max-connections', type=int, default=20000)
+    parser.add_argument('--flush-interval', type=float, default=1.0)
+    parser.add_argument('--db-threads', type=int, default=4)
+    parser.add_argument('--hashrate-interval', type=float, default=60.0,
+                        help='Seconds between hashrate estimate writes')
+    parser.add_argument('--heartbeat-interval', type=float, default=60.0,
+                        help='Seconds between last_seen refreshes of connected workers '
+                             '(keep well below WORKER_TIMEOUT_SECONDS)')
+    parser.add_argument('--verify-workers', type=int, default=None,
+                        help='Share verification processes (default: one per core, 0 = inline)')
+    parser.add_argument('--verify-batch', type=int, default=256, help='Shares per verification batch')
+    parser.add_argument('--verify-delay-ms', type=float, default=2.0,
+                        help='Longest a share waits for its batch to fill')
+    parser.add_argument('--metrics-port', type=int, default=int(os.environ.get('STRATUM_METRICS_PORT', 9334)),
+                        help='Port for the Prometheus /metrics endpoint (0 disables)')
+    args = parser.parse_args()
+
+    raise_file_limit()
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
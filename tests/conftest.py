@@ -0,0 +1,34 @@
+"""
+Shared fixtures: the app bound to a throwaway SQLite database
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app reads its configuration from the environment at import time
+_workdir = tempfile.mkdtemp(prefix='cryptomine_tests_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ.setdefault('AUTH_WORKERS', '0')
+os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+os.environ.setdefault('POOL_HISTORY_INTERVAL', '0')
+os.environ.setdefault('WORKER_TIMEOUT_SECONDS', '0')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+@pytest.fixture()
+def app_module():
+    """The app module with a freshly migrated, empty schema"""
+    import app as app_module
+    from migrations import upgrade
+
+    with app_module.app.app_context():
+        app_module.db.drop_all()
+        with app_module.db.engine.begin() as conn:
+            conn.exec_driver_sql('DROP TABLE IF EXISTS schema_version')
+        upgrade(app_module.db.engine, app_module.db.metadata)
+        yield app_module
+        app_module.db.session.remove()
@@ -0,0 +1,32 @@
+"""
+Auth pool sizing and failures that must answer busy rather than 500
+"""
+
+import os
+
+import pytest
+
+import auth_executor
+from auth_executor import AuthBusy, AuthExecutor
+
+
+def test_default_workers_split_the_cores_between_web_workers(monkeypatch):
+    monkeypatch.setattr(auth_executor.os, 'cpu_count', lambda: 8)
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    assert auth_executor.default_workers() == 2
+    monkeypatch.setenv('WEB_CONCURRENCY', '16')
+    assert auth_executor.default_workers() == 1
+    monkeypatch.delenv('WEB_CONCURRENCY')
+    assert auth_executor.default_workers() == 8
+
+
+def test_broken_pool_answers_busy_and_recovers():
+    executor = AuthExecutor(max_workers=1, rounds=4)
+    try:
+        with pytest.raises(AuthBusy):
+            # The pool process exits mid-operation
+            executor._run('hash', os._exit, 1)
+        assert executor.pending() == 0
+        assert executor.check_password(executor.hash_password('secret'), 'secret') == (True, False)
+    finally:
+        executor.shutdown()
@@ -0,0 +1,58 @@
+"""
+The dashboard loads in a fixed number of queries, however much the user has
+"""
+
+from datetime import datetime
+
+from query_counter import count_queries
+
+
+def _make_user(app_module, username, coins, workers_per_coin, payouts):
+    db = app_module.db
+    user = app_module.User(username=username, email=f'{username}@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    for crypto in coins:
+        db.session.add(app_module.MiningSession(user_id=user.id, cryptocurrency=crypto, hashrate=10.0, status='active'))
+        db.session.add(app_module.MiningSession(user_id=user.id, cryptocurrency=crypto, hashrate=10.0,
+                                                status='completed', end_time=datetime.utcnow()))
+        for i in range(workers_per_coin):
+            db.session.add(app_module.Worker(user_id=user.id, name=f'{crypto}_{i}', status='online',
+                                             hashrate=10.0, cryptocurrency=crypto))
+    for _ in range(payouts):
+        db.session.add(app_module.Payout(user_id=user.id, amount=0.01, cryptocurrency=coins[0],
+                                                wallet_address='addr'))
+    for crypto in app_module.SUPPORTED_CRYPTOS:
+        if not app_module.PoolStats.query.filter_by(cryptocurrency=crypto).first():
+            db.session.add(app_module.PoolStats(cryptocurrency=crypto))
+    db.session.commit()
+    return user.id
+
+
+def test_dashboard_query_count_is_flat(app_module):
+    small = _make_user(app_module, 'small', ['BTC'], workers_per_coin=1, payouts=1)
+    large = _make_user(app_module, 'large', list(app_module.SUPPORTED_CRYPTOS), workers_per_coin=5, payouts=20)
+    app_module.db.session.expunge_all()
+
+    with count_queries() as small_count:
+        small_data = app_module.load_dashboard_data(small)
+    app_module.db.session.expunge_all()
+    with count_queries() as large_count:
+        large_data = app_module.load_dashboard_data(large)
+
+    assert len(small_data['workers']) == 1
+    assert len(large_data['workers']) == 5 * len(app_module.SUPPORTED_CRYPTOS)
+    assert len(large_data['recent_payouts']) == 5
+    assert small_count.count == large_count.count
+
+
+def test_dashboard_leaves_session_collection_complete(app_module):
+    user_id = _make_user(app_module, 'miner', ['BTC', 'LTC'], workers_per_coin=1, payouts=0)
+    app_module.db.session.expunge_all()
+
+    data = app_module.load_dashboard_data(user_id)
+    user = app_module.db.session.get(app_module.User, user_id)
+
+    assert {session.status for session in data['active_sessions']} == {'active'}
+    assert len(user.mining_sessions) == 4
+    assert 'user' not in data
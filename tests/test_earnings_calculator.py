@@ -0,0 +1,44 @@
+"""
+Input validation and response caching of the earnings calculator
+"""
+
+import pytest
+
+
+@pytest.mark.parametrize('hashrate', ['abc', 'nan', 'inf', '-inf'])
+def test_get_rejects_unusable_hashrate(app_module, hashrate):
+    response = app_module.app.test_client().get(f'/api/earnings_calculator?hashrate={hashrate}')
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('body', [
+    {'cryptocurrency': ['BTC'], 'hashrate': 10},
+    {'cryptocurrency': {'BTC': 1}, 'hashrate': 10},
+    {'cryptocurrency': 'BTC', 'hashrate': 10, 'time_period': ['day']},
+    {'cryptocurrency': 'BTC', 'hashrate': 'nan'}
+])
+def test_post_rejects_malformed_json(app_module, body):
+    response = app_module.app.test_client().post('/api/earnings_calculator', json=body)
+
+    assert response.status_code == 400
+
+
+def test_cache_key_skips_unhashable_input(app_module):
+    with app_module.app.test_request_context('/api/earnings_calculator', method='POST',
+                                              json={'cryptocurrency': ['BTC'], 'hashrate': 10}):
+        assert app_module.earnings_calculator_cache_key() is None
+    with app_module.app.test_request_context('/api/earnings_calculator?hashrate=10'):
+        assert app_module.earnings_calculator_cache_key() == ('BTC', 10.0, 'day')
+
+
+def test_only_get_responses_are_publicly_cacheable(app_module):
+    client = app_module.app.test_client()
+
+    get = client.get('/api/earnings_calculator?cryptocurrency=BTC&hashrate=10')
+    post = client.post('/api/earnings_calculator', json={'cryptocurrency': 'BTC', 'hashrate': 10})
+
+    assert get.status_code == post.status_code == 200
+    assert get.headers['Cache-Control'].startswith('public')
+    assert 'Cache-Control' not in post.headers
+    assert get.get_json() == post.get_json()
@@ -0,0 +1,26 @@
+"""
+Stratum hashrate estimates only touch the sessions of the workers' owners
+"""
+
+from hashrate_estimator import persist_hashrates
+
+
+def test_dashboard_sessions_keep_their_hashrate(app_module):
+    db = app_module.db
+    stratum_user = app_module.User(username='stratum', email='stratum@example.com', password_hash='x')
+    dashboard_user = app_module.User(username='dashboard', email='dashboard@example.com', password_hash='x')
+    db.session.add_all([stratum_user, dashboard_user])
+    db.session.flush()
+    worker = app_module.Worker(user_id=stratum_user.id, name='rig1', status='online', cryptocurrency='BTC')
+    db.session.add(worker)
+    db.session.add(app_module.MiningSession(user_id=stratum_user.id, cryptocurrency='BTC', hashrate=1.0, status='active'))
+    dashboard = app_module.MiningSession(user_id=dashboard_user.id, cryptocurrency='BTC', hashrate=123.0, status='active')
+    db.session.add(dashboard)
+    db.session.commit()
+
+    assert persist_hashrates(db.engine, app_module.Worker.__table__, app_module.MiningSession.__table__,
+                             [worker.id], [50e12], 'BTC', unit=1e12) == 1
+
+    db.session.expire_all()
+    sessions = {session.user_id: session.hashrate for session in app_module.MiningSession.query}
+    assert sessions == {stratum_user.id: 50.0, dashboard_user.id: 123.0}
@@ -0,0 +1,100 @@
+"""
+Payout runs are idempotent and a crashed run can be restarted without paying twice
+"""
+
+from datetime import datetime
+
+from payout_engine import LocalWallet, PayoutEngine, payout_key
+
+
+class LostReplyWallet(LocalWallet):
+    """Sends the batch, then the reply never arrives"""
+
+    def send_many(self, cryptocurrency, transfers):
+        super().send_many(cryptocurrency, transfers)
+        raise ConnectionError('wallet connection reset')
+
+
+class UnreachableWallet(LocalWallet):
+    """Fails before anything is sent, without saying so"""
+
+    def send_many(self, cryptocurrency, transfers):
+        raise ConnectionError('wallet unreachable')
+
+
+def _miners(app_module, count=3, earnings=0.01):
+    db = app_module.db
+    for i in range(count):
+        user = app_module.User(username=f'miner{i}', email=f'miner{i}@example.com', password_hash='x',
+                               wallet_address=f'wallet{i}')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(app_module.MiningSession(user_id=user.id, cryptocurrency='BTC', hashrate=10.0,
+                                                earnings=earnings, status='completed', end_time=datetime.utcnow()))
+    db.session.commit()
+
+
+def _payouts(app_module):
+    app_module.db.session.expire_all()
+    return app_module.Payout.query.order_by(app_module.Payout.id).all()
+
+
+def test_second_run_pays_nothing_more(app_module):
+    _miners(app_module)
+    wallet = LocalWallet()
+    engine = PayoutEngine(app_module.app, wallet, chunk_size=2)
+
+    first = engine.run(['BTC'])
+    second = engine.run(['BTC'])
+
+    assert (first.created, first.settled) == (3, 3)
+    assert (second.created, second.settled) == (0, 0)
+    assert len(wallet.transfers) == 3
+    assert {payout.status for payout in _payouts(app_module)} == {'completed'}
+
+
+def test_restart_after_lost_reply_records_the_original_transfers(app_module):
+    _miners(app_module)
+    crashed = LostReplyWallet()
+    PayoutEngine(app_module.app, crashed).run(['BTC'])
+    assert {payout.status for payout in _payouts(app_module)} == {'processing'}
+
+    # Same wallet state, reachable again
+    wallet = LocalWallet()
+    wallet.transfers = crashed.transfers
+    stats = PayoutEngine(app_module.app, wallet).run(['BTC'])
+
+    payouts = _payouts(app_module)
+    assert stats.created == 0
+    assert len(wallet.transfers) == 3
+    assert [payout.transaction_hash for payout in payouts] == [
+        wallet.transfers[payout_key(payout.id)]['txid'] for payout in payouts]
+    assert {payout.status for payout in payouts} == {'completed'}
+
+
+def test_restart_requeues_payouts_the_wallet_never_saw(app_module):
+    _miners(app_module)
+    PayoutEngine(app_module.app, UnreachableWallet()).run(['BTC'])
+    assert {payout.status for payout in _payouts(app_module)} == {'processing'}
+
+    wallet = LocalWallet()
+    stats = PayoutEngine(app_module.app, wallet).settle_payouts(['BTC'])
+
+    assert stats.settled == 3
+    assert len(wallet.transfers) == 3
+    assert {payout.status for payout in _payouts(app_module)} == {'completed'}
+
+
+def test_batch_with_a_missing_address_fails_without_sending(app_module):
+    _miners(app_module, count=2)
+    app_module.db.session.add(app_module.Payout(user_id=1, amount=0.01, cryptocurrency='BTC', wallet_address='',
+                                                status='pending'))
+    app_module.db.session.commit()
+    wallet = LocalWallet()
+
+    stats = PayoutEngine(app_module.app, wallet).run(['BTC'])
+
+    # The queued payout already covers user 1's balance, so only user 2 gets a new one
+    assert (stats.created, stats.failed) == (1, 2)
+    assert wallet.transfers == {}
+    assert {payout.status for payout in _payouts(app_module)} == {'failed'}
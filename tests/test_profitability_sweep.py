@@ -0,0 +1,13 @@
+"""
+Sweep parameters that would turn break-even math into NaN or inf are refused
+"""
+
+import pytest
+
+
+@pytest.mark.parametrize('rig_cost', ['nan', 'inf', '-inf', '0', '-100', 'abc'])
+def test_sweep_rejects_unusable_rig_cost(app_module, rig_cost):
+    response = app_module.app.test_client().get(
+        f'/api/profitability/sweep?hashrates=100&power_watts=3000&rig_cost={rig_cost}&format=summary')
+
+    assert response.status_code == 400
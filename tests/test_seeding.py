@@ -0,0 +1,44 @@
+"""
+The benchmark and datagen seeders load data the app can use
+"""
+
+import importlib.util
+import os
+import random
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def _load_script(path):
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_route_benchmark_seed_users_can_log_in(app_module):
+    route_benchmark = _load_script('benchmarks/route_benchmark.py')
+    route_benchmark.seed(app_module.app, users=3, workers_per_user=2, sessions=10, payouts=5, rng=random.Random(1))
+
+    client = app_module.app.test_client()
+    response = client.post('/login', json={'username': 'bench2', 'password': route_benchmark.BENCH_PASSWORD})
+
+    assert response.status_code == 200
+    assert app_module.User.query.count() == 3
+    assert app_module.Worker.query.count() == 6
+
+
+def test_datagen_opens_at_most_one_active_session_per_user_and_coin():
+    import datagen
+
+    # Few users and many sessions, so the 1% active draw collides often
+    generator = datagen.Generator(users=20, first_user_id=1, seed=7)
+    pairs = [
+        (user_id, coin)
+        for chunk in generator.sessions_chunks(chunk_size=1000, sessions=10000)
+        for user_id, coin, status in zip(chunk['user_id'], chunk['cryptocurrency'], chunk['status'])
+        if status == 'active'
+    ]
+
+    assert pairs
+    assert len(pairs) == len(set(pairs))
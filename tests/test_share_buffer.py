@@ -0,0 +1,42 @@
+"""
+ShareBuffer flush statistics reach the metrics registry
+"""
+
+import urllib.request
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, create_engine
+
+from metrics import serve_metrics
+from share_buffer import ShareBuffer, register_metrics
+
+
+def _worker_table():
+    metadata = MetaData()
+    worker = Table('worker', metadata, Column('id', Integer, primary_key=True),
+                   Column('shares_submitted', Integer, default=0), Column('shares_accepted', Integer, default=0),
+                   Column('last_seen', DateTime))
+    engine = create_engine('sqlite://')
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(worker.insert(), [{'id': i, 'shares_submitted': 0, 'shares_accepted': 0} for i in (1, 2, 3)])
+    return engine, worker
+
+
+def test_flush_lag_and_batch_size_are_scrapeable():
+    engine, worker = _worker_table()
+    buffer = ShareBuffer(engine, worker)
+    register_metrics(buffer)
+    for worker_id in (1, 2, 3):
+        buffer.record(worker_id)
+    assert buffer.flush() == 3
+
+    server = serve_metrics('127.0.0.1', 0)
+    try:
+        body = urllib.request.urlopen(f'http://127.0.0.1:{server.server_address[1]}/metrics').read().decode()
+    finally:
+        server.shutdown()
+
+    assert 'share_buffer_flush_batch_workers_bucket{le="10.0"}' in body
+    assert 'share_buffer_flush_lag_seconds' in body
+    with engine.connect() as conn:
+        assert sorted(conn.execute(worker.select().with_only_columns(worker.c.shares_submitted)).scalars()) == [1, 1, 1]
@@ -0,0 +1,75 @@
+"""
+Share verification against the Bitcoin genesis block, and batches the pool cannot take
+"""
+
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
+
+import pytest
+
+from share_verifier import BLOCK, LOW_DIFFICULTY, MALFORMED, ShareVerifier, job_template, share_target, verify_batch
+from stratum_server import StratumError
+
+# The genesis coinbase transaction, split around an 8-byte stretch of its script used as extranonce1 + extranonce2
+GENESIS_COINBASE = (
+    '01000000010000000000000000000000000000000000000000000000000000000000000000ffffffff4d04ffff001d0104455468652054'
+    '696d65732030332f4a616e2f32303039204368616e63656c6c6f72206f6e206272696e6b206f66207365636f6e64206261696c6f7574'
+    '20666f722062616e6b73ffffffff0100f2052a01000000434104678afdb0fe5548271967f1a67130b7105cd6a828e03909a67962e0ea1f'
+    '61deb649f6bc3f4cef38c4f35504e51ec112de5c384df7ba0b8d578a4c702b6bf11d5fac00000000'
+)
+SPLIT = 100
+EXTRANONCE1 = GENESIS_COINBASE[SPLIT:SPLIT + 8]
+EXTRANONCE2 = GENESIS_COINBASE[SPLIT + 8:SPLIT + 16]
+GENESIS_JOB = SimpleNamespace(
+    job_id='genesis', version='00000001', prevhash='00' * 32, nbits='1d00ffff', ntime='495fab29',
+    coinb1=GENESIS_COINBASE[:SPLIT], coinb2=GENESIS_COINBASE[SPLIT + 16:], merkle_branch=[]
+)
+GENESIS_NONCE = '7c2bac1d'
+
+
+def _share(nonce=GENESIS_NONCE, extranonce2=EXTRANONCE2, difficulty=1):
+    return ('genesis', EXTRANONCE1, extranonce2, GENESIS_JOB.ntime, nonce, share_target(difficulty))
+
+
+def test_genesis_header_meets_the_network_target():
+    templates = {'genesis': job_template(GENESIS_JOB)}
+
+    statuses = verify_batch(templates, [_share(), _share(nonce='7c2bac1e'), _share(extranonce2='zz')])
+
+    assert list(statuses) == [BLOCK, LOW_DIFFICULTY, MALFORMED]
+
+
+def test_share_targets_are_capped():
+    verifier = ShareVerifier(max_workers=0, max_targets=2)
+    for difficulty in (1, 2, 4):
+        verifier._share_target(difficulty)
+
+    assert list(verifier._targets) == [2, 4]
+
+
+class _BrokenPool:
+    def submit(self, *args):
+        raise BrokenProcessPool('pool process died')
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def test_batch_is_verified_inline_when_the_pool_cannot_take_it(monkeypatch):
+    verifier = ShareVerifier(max_workers=1, batch_size=2)
+    monkeypatch.setattr(verifier, '_get_pool', lambda: _BrokenPool())
+
+    async def submit_two():
+        waiters = [
+            verifier(GENESIS_JOB, EXTRANONCE1, EXTRANONCE2, GENESIS_JOB.ntime, nonce, 1, 4)
+            for nonce in (GENESIS_NONCE, '7c2bac1e')
+        ]
+        return await asyncio.wait_for(asyncio.gather(*waiters, return_exceptions=True), 5)
+
+    accepted, rejected = asyncio.run(submit_two())
+
+    assert accepted == 1
+    assert isinstance(rejected, StratumError)
+    assert verifier.blocks == 1
+    assert verifier.inflight == 0
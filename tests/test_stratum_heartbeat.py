@@ -0,0 +1,55 @@
+"""
+Connected Stratum workers stay online, or come back online, across sweeps
+"""
+
+from datetime import datetime, timedelta
+
+from stratum_server import WorkerRegistry
+
+
+def _miner(app_module):
+    db = app_module.db
+    user = app_module.User(username='miner', email='miner@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    registry = WorkerRegistry(app_module.app, 'BTC')
+    worker_id, user_id = registry.authorize('miner.rig1')
+    return registry, worker_id, user_id
+
+
+def _active_sessions(app_module, user_id):
+    app_module.db.session.expire_all()
+    return app_module.MiningSession.query.filter_by(user_id=user_id, cryptocurrency='BTC', status='active').count()
+
+
+def test_heartbeat_keeps_a_connected_worker_from_expiring(app_module):
+    registry, worker_id, user_id = _miner(app_module)
+    sweeper = app_module.worker_sweeper
+    later = datetime.utcnow() + sweeper.timeout + timedelta(seconds=1)
+
+    app_module.db.session.query(app_module.Worker).filter_by(id=worker_id).update(
+        {'last_seen': later - sweeper.timeout - timedelta(hours=1)})
+    app_module.db.session.commit()
+    assert registry.heartbeat([worker_id]) == 0
+
+    with app_module.db.engine.begin() as conn:
+        result = sweeper.sweep(conn, [worker_id], later - timedelta(seconds=2))
+    assert result['expired'] == []
+    assert _active_sessions(app_module, user_id) == 1
+
+
+def test_heartbeat_revives_a_swept_worker_and_reopens_its_session(app_module):
+    registry, worker_id, user_id = _miner(app_module)
+    sweeper = app_module.worker_sweeper
+
+    with app_module.db.engine.begin() as conn:
+        result = sweeper.sweep(conn, [worker_id], datetime.utcnow() + sweeper.timeout + timedelta(seconds=1))
+    assert [item['worker_id'] for item in result['expired']] == [worker_id]
+    assert _active_sessions(app_module, user_id) == 0
+
+    assert registry.heartbeat([worker_id]) == 1
+    assert app_module.db.session.get(app_module.Worker, worker_id).status == 'online'
+    assert _active_sessions(app_module, user_id) == 1
+    # Already online: nothing more to revive, and no second session
+    assert registry.heartbeat([worker_id]) == 0
+    assert _active_sessions(app_module, user_id) == 1
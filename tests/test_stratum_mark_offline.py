@@ -0,0 +1,27 @@
+"""
+Disconnecting a user's last Stratum worker closes, credits and invalidates
+"""
+
+from stratum_server import WorkerRegistry
+
+
+def test_last_disconnect_credits_the_user_and_invalidates_the_cache(app_module):
+    db = app_module.db
+    db.session.add(app_module.User(username='miner', email='miner@example.com', password_hash='x'))
+    db.session.commit()
+    registry = WorkerRegistry(app_module.app, 'BTC')
+    worker_id, user_id = registry.authorize('miner.rig1')
+    db.session.query(app_module.MiningSession).filter_by(user_id=user_id).update({'hashrate': 100.0})
+    db.session.commit()
+
+    # A cached row from before the disconnect
+    app_module.user_cache.get_or_load(user_id, lambda: app_module._load_user_row(user_id))
+    invalidations = app_module.user_cache.stats()['invalidations']
+
+    closed = registry.mark_offline([worker_id])
+
+    assert [item['user_id'] for item in closed] == [user_id]
+    assert app_module.user_cache.stats()['invalidations'] == invalidations + 1
+    db.session.expire_all()
+    assert db.session.get(app_module.User, user_id).total_mined == closed[0]['earnings']
+    assert app_module.MiningSession.query.filter_by(user_id=user_id, status='active').count() == 0
@@ -0,0 +1,166 @@
+"""
+Bounded in-process cache with per-key TTLs, stale-while-revalidate and single-flight loads
+"""
+
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One in-progress load that concurrent callers for the same key wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class TTLCache:
+    """LRU-bounded cache whose entries are fresh for ``ttl`` seconds, then stale for ``stale_ttl``
+
+    ``get_or_load()`` returns fresh entries directly. A stale entry is returned
+    as-is while a single background load refreshes it. On a miss, the first
+    caller runs the loader and every concurrent caller for the same key waits
+    for that one result instead of calling upstream itself.
+    """
+
+    def __init__(self, maxsize=256, ttl=300.0, stale_ttl=0.0, executor=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self.executor = executor or ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+        self._lock = threading.Lock()
+        # key -> (value, fresh_until, stale_until), least recently used first
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Fresh value for ``key`` without loading, else ``default``"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self.clock() >= entry[1]:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = self.clock()
+        with self._lock:
+            self._entries[key] = (value, now + ttl, now + ttl + self.stale_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when ``key`` is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _join_flight(self, key):
+        """(flight, leader) for ``key``; call with the lock held"""
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            return flight, False
+        flight = self._inflight[key] = _Flight()
+        return flight, True
+
+    def _run(self, key, flight, loader, ttl):
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                self.load_errors += 1
+                self._inflight.pop(key, None)
+            flight.error = e
+            flight.done.set()
+            raise
+
+        self.set(key, value, ttl)
+        with self._lock:
+            self.loads += 1
+            self._inflight.pop(key, None)
+        flight.value = value
+        flight.done.set()
+        return value
+
+    def _refresh_in_background(self, key, flight, loader, ttl):
+        try:
+            self._run(key, flight, loader, ttl)
+        except Exception as e:
+            # The stale entry keeps being served until it expires
+            logger.error(f"Background refresh of {key} failed: {e}")
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Cached value for ``key``, calling ``loader()`` at most once per key at a time"""
+        with self._lock:
+            entry = self._entries.get(key)
+            now = self.clock()
+            if entry is not None and now < entry[2]:
+                self._entries.move_to_end(key)
+                if now < entry[1]:
+                    self.hits += 1
+                    return entry[0]
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    flight, _ = self._join_flight(key)
+                    self.executor.submit(self._refresh_in_background, key, flight, loader, ttl)
+                return entry[0]
+            self.misses += 1
+            flight, leader = self._join_flight(key)
+
+        if leader:
+            return self._run(key, flight, loader, ttl)
+        return flight.wait()
+
+    def refresh(self, key, loader, ttl=None):
+        """Load ``key`` now regardless of freshness (joining any load already in flight)"""
+        with self._lock:
+            flight, leader = self._join_flight(key)
+        if leader:
+            return self._run(key, flight, loader, ttl)
+        return flight.wait()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'loads': self.loads,
+                'load_errors': self.load_errors,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else 0.0
+            }
@@ -0,0 +1,241 @@
+"""
+Concurrent upstream HTTP fetching with pooled connections, circuit breakers and hedging
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamError(Exception):
+    """An upstream source failed or returned unusable data"""
+
+
+class CircuitOpenError(UpstreamError):
+    """The source's circuit breaker is open; the request was not attempted"""
+
+
+class DeadlineExceeded(UpstreamError):
+    """No source answered within the deadline"""
+
+
+class Source:
+    """One upstream endpoint"""
+
+    def __init__(self, name, url, params=None, timeout=5.0, parse=None):
+        self.name = name
+        self.url = url
+        self.params = params
+        self.timeout = timeout
+        # parse(json) -> value, or raises / returns None when the payload is unusable
+        self.parse = parse
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures, half-open after ``reset_timeout``"""
+
+    def __init__(self, failure_threshold=3, reset_timeout=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Whether a request may go out now (one probe at a time while half-open)"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+
+class SourceStats:
+    """Latency and outcome counters for one source"""
+
+    def __init__(self, samples=256):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=samples)
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.last_latency = None
+        self.last_error = None
+
+    def record(self, latency, error=None):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            self.last_latency = latency
+            if error is not None:
+                self.errors += 1
+                self.last_error = str(error)
+
+    def snapshot(self):
+        with self._lock:
+            ordered = sorted(self.latencies)
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'rejected_by_breaker': self.rejected,
+                'last_latency': self.last_latency,
+                'p50_latency': ordered[len(ordered) // 2] if ordered else None,
+                'p95_latency': ordered[max(0, int(len(ordered) * 0.95) - 1)] if ordered else None,
+                'last_error': self.last_error
+            }
+
+
+class UpstreamFetcher:
+    """Issues upstream requests concurrently over keep-alive connection pools"""
+
+    def __init__(self, max_workers=8, pool_maxsize=8, failure_threshold=3, reset_timeout=60.0,
+                 session=None):
+        self.session = session or requests.Session()
+        if session is None:
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=pool_maxsize)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upstream')
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.breakers = {}
+        self.stats = {}
+        # Called as listener(source_name, seconds, error_or_None) after every attempted request
+        self.listeners = []
+
+    def _breaker(self, name):
+        with self._lock:
+            breaker = self.breakers.get(name)
+            if breaker is None:
+                breaker = self.breakers[name] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self.stats[name] = SourceStats()
+            return breaker
+
+    def fetch(self, source):
+        """Fetch and parse one source on the calling thread"""
+        breaker = self._breaker(source.name)
+        stats = self.stats[source.name]
+        if not breaker.allow():
+            stats.rejected += 1
+            raise CircuitOpenError(f'{source.name}: circuit open')
+
+        started = time.perf_counter()
+        try:
+            response = self.session.get(source.url, params=source.params, timeout=source.timeout)
+            response.raise_for_status()
+            data = response.json()
+            value = source.parse(data) if source.parse else data
+            if value is None:
+                raise UpstreamError(f'{source.name}: unusable payload')
+        except Exception as e:
+            elapsed = time.perf_counter() - started
+            stats.record(elapsed, e)
+            breaker.record_failure()
+            self._notify(source.name, elapsed, e)
+            if isinstance(e, UpstreamError):
+                raise
+            raise UpstreamError(f'{source.name}: {e}') from e
+
+        elapsed = time.perf_counter() - started
+        stats.record(elapsed)
+        breaker.record_success()
+        self._notify(source.name, elapsed, None)
+        return value
+
+    def _notify(self, name, seconds, error):
+        for listener in self.listeners:
+            try:
+                listener(name, seconds, error)
+            except Exception as e:
+                logger.error(f"Upstream fetch listener failed: {e}")
+
+    def fetch_all(self, sources, deadline=None):
+        """Fetch independent sources concurrently
+
+        Returns {name: value}; sources that fail, are circuit-broken or miss
+        the deadline map to their exception instead.
+        """
+        futures = {self.executor.submit(self.fetch, source): source.name for source in sources}
+        done, pending = wait(futures, timeout=deadline)
+
+        results = {}
+        for future in done:
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = e
+        for future in pending:
+            future.cancel()
+            results[futures[future]] = DeadlineExceeded(f'{futures[future]}: deadline exceeded')
+        return results
+
+    def fetch_first(self, sources, deadline=None):
+        """Hedge across redundant sources: return (name, value) of the first good answer"""
+        futures = {self.executor.submit(self.fetch, source): source.name for source in sources}
+        errors = []
+        expires = time.monotonic() + deadline if deadline is not None else None
+        pending = set(futures)
+
+        while pending:
+            timeout = max(0.0, expires - time.monotonic()) if expires is not None else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    value = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                for other in pending:
+                    other.cancel()
+                return futures[future], value
+
+        for future in pending:
+            future.cancel()
+        if pending:
+            raise DeadlineExceeded(f'No source answered within {deadline}s: {errors}')
+        raise UpstreamError(f'All sources failed: {errors}')
+
+    def source_stats(self):
+        """Per-source latency, error counts and breaker state"""
+        with self._lock:
+            names = list(self.stats)
+        return {
+            name: dict(self.stats[name].snapshot(), breaker=self.breakers[name].state)
+            for name in names
+        }
@@ -0,0 +1,154 @@
+"""
+Per-user, per-coin rollups (earnings, mining time, shares) maintained on write
+
+Usage:
+    python user_rollups.py backfill [--chunk-size 1000]
+"""
+
+import argparse
+import logging
+from datetime import datetime
+
+from sqlalchemy import func, literal_column
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COUNTERS = ['total_earnings', 'total_mining_seconds', 'completed_sessions', 'shares_submitted', 'shares_accepted']
+
+
+def dialect_insert(dialect_name):
+    """``insert()`` with ON CONFLICT support for the backend (SQLite or PostgreSQL)"""
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f'Rollup upserts are not implemented for {dialect_name}')
+    return insert
+
+
+def executor_dialect(executor):
+    """Dialect of a Connection or Session"""
+    if hasattr(executor, 'dialect'):
+        return executor.dialect.name
+    return executor.get_bind().dialect.name
+
+
+def increment_rollups(executor, table, increments, chunk_size=500):
+    """Add counter increments to rollup rows, creating them as needed
+
+    ``increments`` is a list of dicts with ``user_id``, ``cryptocurrency`` and
+    any of the COUNTERS. Runs as INSERT ... ON CONFLICT DO UPDATE statements on
+    the caller's connection or session, i.e. inside the caller's transaction.
+    """
+    if not increments:
+        return
+    now = datetime.utcnow()
+    rows = [
+        dict({counter: row.get(counter, 0) for counter in COUNTERS},
+             user_id=row['user_id'], cryptocurrency=row['cryptocurrency'], updated_at=now)
+        for row in increments
+    ]
+
+    insert = dialect_insert(executor_dialect(executor))
+    for i in range(0, len(rows), chunk_size):
+        statement = insert(table).values(rows[i:i + chunk_size])
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.cryptocurrency],
+            set_=dict(
+                {counter: table.c[counter] + statement.excluded[counter] for counter in COUNTERS},
+                updated_at=statement.excluded.updated_at
+            )
+        )
+        executor.execute(statement)
+
+
+def session_seconds(dialect_name, start, end):
+    """SQL expression for ``end - start`` in seconds"""
+    if dialect_name == 'postgresql':
+        return func.extract('epoch', end - start)
+    if dialect_name == 'sqlite':
+        return (func.julianday(end) - func.julianday(start)) * literal_column('86400.0')
+    raise NotImplementedError(f'Session durations are not implemented for {dialect_name}')
+
+
+def backfill(flask_app, chunk_size=1000):
+    """Rebuild every rollup row from MiningSession and Worker, one user chunk per transaction
+
+    Safe to re-run; each chunk replaces its users' rows. Run it while
+    stop_mining() traffic is low, as a session stopped mid-chunk may be
+    counted by both the live path and the rebuild.
+    """
+    from app import db, User, Worker, MiningSession, UserCoinRollup
+
+    rebuilt_users = 0
+    with flask_app.app_context():
+        dialect_name = db.engine.dialect.name
+        duration = session_seconds(dialect_name, MiningSession.start_time, MiningSession.end_time)
+        last_id = 0
+
+        while True:
+            user_ids = db.session.execute(
+                db.select(User.id).where(User.id > last_id).order_by(User.id).limit(chunk_size)
+            ).scalars().all()
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            totals = {}
+            for user_id, crypto, earnings, seconds, sessions in db.session.execute(
+                db.select(
+                    MiningSession.user_id,
+                    MiningSession.cryptocurrency,
+                    func.sum(MiningSession.earnings),
+                    func.sum(duration),
+                    func.count(MiningSession.id)
+                ).where(MiningSession.user_id.in_(user_ids), MiningSession.status == 'completed')
+                .group_by(MiningSession.user_id, MiningSession.cryptocurrency)
+            ):
+                totals[(user_id, crypto)] = {
+                    'total_earnings': earnings or 0.0,
+                    'total_mining_seconds': seconds or 0.0,
+                    'completed_sessions': sessions
+                }
+
+            for user_id, crypto, submitted, accepted in db.session.execute(
+                db.select(
+                    Worker.user_id,
+                    Worker.cryptocurrency,
+                    func.sum(Worker.shares_submitted),
+                    func.sum(Worker.shares_accepted)
+                ).where(Worker.user_id.in_(user_ids))
+                .group_by(Worker.user_id, Worker.cryptocurrency)
+            ):
+                row = totals.setdefault((user_id, crypto), {})
+                row['shares_submitted'] = submitted or 0
+                row['shares_accepted'] = accepted or 0
+
+            db.session.execute(db.delete(UserCoinRollup).where(UserCoinRollup.user_id.in_(user_ids)))
+            increment_rollups(db.session, UserCoinRollup.__table__, [
+                dict(values, user_id=user_id, cryptocurrency=crypto)
+                for (user_id, crypto), values in totals.items()
+            ])
+            db.session.commit()
+            rebuilt_users += len(user_ids)
+            logger.info(f"Backfilled rollups for {rebuilt_users} users")
+
+    return rebuilt_users
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-user rollup maintenance')
+    parser.add_argument('command', choices=['backfill'])
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    from app import app
+
+    users = backfill(app, chunk_size=args.chunk_size)
+    print(f"Rebuilt rollups for {users} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""
+Stale-worker sweeper: marks workers offline once ``last_seen`` is older than the timeout
+
+Each process keeps the online workers' deadlines (``last_seen + timeout``)
+in a min-heap, so a sweep pops only the workers that may have expired
+instead of scanning the worker table. The heap is a hint, not the truth:
+``last_seen`` is also written by other processes (stratum servers, share
+flushes, heartbeats), so popped workers are re-read by primary key and
+the ones seen since are pushed back with their new deadline. The rest are
+moved offline in one bulk UPDATE, and their active mining sessions are
+closed and credited like ``stop_mining`` does, all in one transaction.
+
+Workers brought online by other processes are picked up by a periodic
+resync that reloads the online set through the status index.
+"""
+
+import heapq
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, or_, select
+
+from earnings_engine import batch_earnings
+from metrics import REGISTRY
+from ttl_cache import TTLCache
+from user_rollups import increment_rollups
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineHeap:
+    """Min-heap of (deadline, key) with lazy deletion
+
+    Rescheduling a key pushes a new entry and leaves the old one in place;
+    entries that no longer match the key's current deadline are skipped
+    when popped and compacted away once they outnumber the live ones.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def schedule(self, key, deadline):
+        if self._deadlines.get(key) == deadline:
+            return
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(deadline, key) for key, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def discard(self, key):
+        self._deadlines.pop(key, None)
+
+    def clear(self):
+        self._heap = []
+        self._deadlines = {}
+
+    def pop_expired(self, now):
+        """Remove and return every key whose deadline is at or before ``now``"""
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, key = heapq.heappop(self._heap)
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                expired.append(key)
+        return expired
+
+
+def _chunks(values, size):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def close_sessions(executor, worker_table, session_table, user_table, rollup_table, ended, now, chunk_size=500):
+    """Complete and credit the active sessions of (user, coin) pairs left with no online worker
+
+    ``ended`` maps ``(user_id, cryptocurrency)`` to the session end time.
+    Earnings, user totals and rollups are computed as ``stop_mining`` does,
+    in the caller's transaction. Returns the closed sessions (id, user,
+    coin, end time, mining seconds, earnings).
+    """
+    worker, session, user = worker_table, session_table, user_table
+    ended = dict(ended)
+    user_ids = sorted({user_id for user_id, _ in ended})
+
+    for chunk in _chunks(user_ids, chunk_size):
+        still_online = executor.execute(
+            select(worker.c.user_id, worker.c.cryptocurrency).distinct()
+            .where(worker.c.user_id.in_(chunk), worker.c.status == 'online')
+        ).all()
+        for key in still_online:
+            ended.pop(tuple(key), None)
+    if not ended:
+        return []
+
+    sessions, premium = [], {}
+    user_ids = sorted({user_id for user_id, _ in ended})
+    for chunk in _chunks(user_ids, chunk_size):
+        sessions.extend(
+            row for row in executor.execute(
+                select(session.c.id, session.c.user_id, session.c.cryptocurrency,
+                       session.c.start_time, session.c.hashrate)
+                .where(session.c.user_id.in_(chunk), session.c.status == 'active')
+                .with_for_update()
+            ).all()
+            if (row.user_id, row.cryptocurrency) in ended
+        )
+        premium.update(executor.execute(
+            select(user.c.id, user.c.is_premium).where(user.c.id.in_(chunk))
+        ).all())
+    if not sessions:
+        return []
+
+    end_times = [max(ended[(row.user_id, row.cryptocurrency)], row.start_time or now) for row in sessions]
+    seconds = [(end - (row.start_time or end)).total_seconds() for row, end in zip(sessions, end_times)]
+    earnings = batch_earnings(
+        [row.cryptocurrency for row in sessions],
+        [row.hashrate or 0.0 for row in sessions],
+        [value / 3600 for value in seconds],
+        [bool(premium.get(row.user_id)) for row in sessions]
+    )
+
+    closed = [
+        {'session_id': row.id, 'user_id': row.user_id, 'cryptocurrency': row.cryptocurrency,
+         'end_time': end, 'mining_seconds': value, 'earnings': float(amount)}
+        for row, end, value, amount in zip(sessions, end_times, seconds, earnings)
+    ]
+    # executemany: one compiled statement for every row
+    executor.execute(
+        session.update()
+        .where(session.c.id == bindparam('session_id'), session.c.status == 'active')
+        .values(status='completed', end_time=bindparam('end_time'), earnings=bindparam('earnings')),
+        [{'session_id': item['session_id'], 'end_time': item['end_time'], 'earnings': item['earnings']}
+         for item in closed]
+    )
+
+    credited = {}
+    for item in closed:
+        credited[item['user_id']] = credited.get(item['user_id'], 0.0) + item['earnings']
+    executor.execute(
+        user.update()
+        .where(user.c.id == bindparam('user_id'))
+        .values(total_mined=user.c.total_mined + bindparam('credit')),
+        [{'user_id': user_id, 'credit': credit} for user_id, credit in credited.items()]
+    )
+
+    if rollup_table is not None:
+        increment_rollups(executor, rollup_table, [
+            {'user_id': item['user_id'], 'cryptocurrency': item['cryptocurrency'],
+             'total_earnings': item['earnings'], 'total_mining_seconds': item['mining_seconds'],
+             'completed_sessions': 1}
+            for item in closed
+        ])
+    return closed
+
+
+class WorkerSweeper:
+    """Background thread that expires silent workers every ``interval`` seconds
+
+    ``begin()`` opens a transaction and yields a connection (e.g.
+    ``engine.begin``); it is called inside an app context. Listeners are
+    called after each committed sweep that expired workers, with the
+    sweep result (see ``sweep``).
+    """
+
+    def __init__(self, begin, worker_table, session_table, user_table, rollup_table=None,
+                 timeout=600, interval=30, resync_interval=300, chunk_size=500):
+        self.begin = begin
+        self.worker_table = worker_table
+        self.session_table = session_table
+        self.user_table = user_table
+        self.rollup_table = rollup_table
+        self.timeout = timedelta(seconds=timeout)
+        self.interval = interval
+        self.resync_interval = resync_interval
+        self.chunk_size = chunk_size
+
+        self._lock = threading.Lock()
+        self._heap = DeadlineHeap()
+        self._last_resync = None
+        # user_id -> True while a heartbeat for that user is recent enough
+        self._heartbeats = TTLCache(maxsize=100000, ttl=max(timeout / 4, 1))
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_success = None
+        self.listeners = []
+        self.iterations = 0
+        self.errors = 0
+        self.expired_workers = 0
+        self.closed_sessions = 0
+        self.rescheduled = 0
+        self.last_sweep_duration = 0.0
+
+    def schedule(self, worker_id, last_seen):
+        """Track an online worker seen at ``last_seen`` (naive UTC)"""
+        with self._lock:
+            self._heap.schedule(worker_id, (last_seen or datetime.min) + self.timeout)
+
+    def discard(self, worker_id):
+        with self._lock:
+            self._heap.discard(worker_id)
+
+    def tracked(self):
+        with self._lock:
+            return len(self._heap)
+
+    def resync(self, executor):
+        """Replace the heap with the deadlines of every online worker"""
+        worker = self.worker_table
+        rows = executor.execute(
+            select(worker.c.id, worker.c.last_seen).where(worker.c.status == 'online')
+        ).all()
+        with self._lock:
+            self._heap.clear()
+            for worker_id, last_seen in rows:
+                self._heap.schedule(worker_id, (last_seen or datetime.min) + self.timeout)
+        self._last_resync = time.monotonic()
+        return len(rows)
+
+    def heartbeat(self, executor, user_ids, now=None):
+        """Refresh ``last_seen`` of the users' online workers, at most once per timeout/4 per user
+
+        For miners with no share stream of their own (sessions started from
+        the dashboard), an open dashboard is the sign of life. Returns the
+        number of users written; the caller commits.
+        """
+        due = [user_id for user_id in set(user_ids) if self._heartbeats.get(user_id) is None]
+        if not due:
+            return 0
+        now = now or datetime.utcnow()
+        worker = self.worker_table
+        executor.execute(
+            worker.update()
+            .where(worker.c.user_id.in_(due), worker.c.status == 'online')
+            .values(last_seen=now)
+        )
+        for user_id in due:
+            self._heartbeats.set(user_id, True)
+        return len(due)
+
+    def sweep(self, executor, candidates, now):
+        """Expire the ``candidates`` whose ``last_seen`` is still older than the timeout
+
+        Runs in the caller's transaction and returns ``{'expired': [...],
+        'closed_sessions': [...]}``: the workers moved offline (id, user,
+        coin and the hashrate they had) and the sessions closed for users
+        left with no online worker on that coin (id, user, coin, earnings).
+        """
+        worker = self.worker_table
+        cutoff = now - self.timeout
+        result = {'expired': [], 'closed_sessions': []}
+        if not candidates:
+            return result
+
+        rows = []
+        for chunk in _chunks(candidates, self.chunk_size):
+            # Row locks on PostgreSQL keep concurrent sweepers from expiring the same worker twice
+            rows.extend(executor.execute(
+                select(worker.c.id, worker.c.user_id, worker.c.cryptocurrency, worker.c.hashrate,
+                       worker.c.status, worker.c.last_seen)
+                .where(worker.c.id.in_(chunk))
+                .with_for_update()
+            ).all())
+
+        expired = []
+        with self._lock:
+            for row in rows:
+                if row.status != 'online':
+                    continue
+                if row.last_seen is not None and row.last_seen >= cutoff:
+                    # Seen since it was scheduled (possibly by another process)
+                    self._heap.schedule(row.id, row.last_seen + self.timeout)
+                    self.rescheduled += 1
+                else:
+                    expired.append(row)
+        if not expired:
+            return result
+
+        for chunk in _chunks([row.id for row in expired], self.chunk_size):
+            executor.execute(
+                worker.update()
+                .where(worker.c.id.in_(chunk), worker.c.status == 'online',
+                       or_(worker.c.last_seen.is_(None), worker.c.last_seen < cutoff))
+                .values(status='offline', hashrate=0.0)
+            )
+        result['expired'] = [
+            {'worker_id': row.id, 'user_id': row.user_id, 'cryptocurrency': row.cryptocurrency,
+             'hashrate': row.hashrate or 0.0}
+            for row in expired
+        ]
+        result['closed_sessions'] = self._close_sessions(executor, expired, now)
+        return result
+
+    def _close_sessions(self, executor, expired, now):
+        # A session ends when its last worker was last heard from
+        ended = {}
+        for row in expired:
+            key = (row.user_id, row.cryptocurrency)
+            last_seen = row.last_seen or now
+            ended[key] = max(ended.get(key, last_seen), last_seen)
+        return close_sessions(executor, self.worker_table, self.session_table, self.user_table,
+                              self.rollup_table, ended, now, self.chunk_size)
+
+    def run_once(self, now=None):
+        """Resync if due, then sweep the expired deadlines in one transaction"""
+        now = now or datetime.utcnow()
+        if self._last_resync is None or time.monotonic() - self._last_resync >= self.resync_interval:
+            with self.begin() as conn:
+                self.resync(conn)
+
+        started = time.monotonic()
+        with self._lock:
+            candidates = self._heap.pop_expired(now)
+        try:
+            with self.begin() as conn:
+                result = self.sweep(conn, candidates, now)
+        except Exception:
+            # Retry these workers on the next sweep
+            for worker_id in candidates:
+                self.schedule(worker_id, now - self.timeout)
+            raise
+        self.last_sweep_duration = time.monotonic() - started
+
+        self.expired_workers += len(result['expired'])
+        self.closed_sessions += len(result['closed_sessions'])
+        if result['expired']:
+            logger.info(f"Marked {len(result['expired'])} stale workers offline and closed "
+                        f"{len(result['closed_sessions'])} mining sessions")
+            self._notify(result)
+        return result
+
+    def _notify(self, result):
+        for listener in self.listeners:
+            try:
+                listener(result)
+            except Exception as e:
+                logger.error(f"Worker sweeper listener failed: {e}")
+
+    def start(self, app):
+        """Start the sweeper thread (once per process)"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, args=(app,), daemon=True)
+        self._thread.start()
+        logger.info(f"Started stale-worker sweeper (timeout {self.timeout.total_seconds():.0f}s)")
+
+    def _loop(self, app):
+        while not self._stop.wait(self.interval):
+            try:
+                with app.app_context():
+                    self.run_once()
+                self.iterations += 1
+                self._last_success = time.monotonic()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error sweeping stale workers: {e}")
+
+    def health(self):
+        """Sweeper loop status for monitoring"""
+        last = self._last_success
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'iterations': self.iterations,
+            'errors': self.errors,
+            'seconds_since_success': time.monotonic() - last if last is not None else None
+        }
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+def register_metrics(sweeper):
+    """Expiry counters, heap size and sweep duration for a WorkerSweeper"""
+
+    def collect():
+        yield ('worker_sweeper_expired_total', 'counter', 'Workers marked offline after going silent',
+               [({}, sweeper.expired_workers)])
+        yield ('worker_sweeper_closed_sessions_total', 'counter', 'Mining sessions closed for silent workers',
+               [({}, sweeper.closed_sessions)])
+        yield ('worker_sweeper_rescheduled_total', 'counter', 'Expired deadlines found to have been seen since',
+               [({}, sweeper.rescheduled)])
+        yield ('worker_sweeper_tracked_workers', 'gauge', 'Online workers with a deadline in this process',
+               [({}, sweeper.tracked())])
+        yield ('worker_sweeper_last_sweep_seconds', 'gauge', 'Duration of the last sweep',
+               [({}, sweeper.last_sweep_duration)])
+
+    REGISTRY.register_collector(collect)